@@ -0,0 +1,162 @@
+# archive.py
+import time
+from datetime import date, datetime, timedelta
+
+from config import ARCHIVE_CONFIG
+
+
+# ============= HISTORY READS =============
+
+# What get_user_transactions returns per row, from either table
+HISTORY_COLUMNS = """t.transaction_id, t.user_id, t.book_isbn, t.copy_id, t.transaction_type,
+                     t.transaction_date, t.due_date, t.return_date, t.status, t.fine_amount,
+                     b.title, b.author"""
+
+
+def history_query(user_id, after=None, limit=None):
+    """
+    A user's transactions from transactions and transactions_archive, newest
+    first, as one statement. Returns (query, params).
+    - after: (transaction_date, transaction_id) of the last row already seen
+    - Each table is read through its own (user_id, transaction_date,
+      transaction_id) index and cut to limit rows before the two short
+      branches are merged, so a page costs the same however much is archived
+    """
+    branches, params = [], []
+    for table, alias in (('transactions', 'hot'), ('transactions_archive', 'cold')):
+        # Archived loans may outlive their book
+        join = "JOIN" if alias == 'hot' else "LEFT JOIN"
+        query = f"""SELECT {HISTORY_COLUMNS}
+                   FROM {table} t
+                   {join} books b ON t.book_isbn = b.isbn
+                   WHERE t.user_id = %s"""
+        params.append(user_id)
+        if after:
+            query += """ AND (t.transaction_date < %s
+                        OR (t.transaction_date = %s AND t.transaction_id < %s))"""
+            params += [after[0], after[0], after[1]]
+        if limit is not None:
+            query += " ORDER BY t.transaction_date DESC, t.transaction_id DESC LIMIT %s"
+            params.append(limit)
+        branches.append(f"SELECT * FROM ({query}) {alias}")
+
+    query = (f"SELECT * FROM ({' UNION ALL '.join(branches)}) history"
+             " ORDER BY transaction_date DESC, transaction_id DESC")
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+# ============= ARCHIVING =============
+
+class TransactionArchiver:
+    """
+    Moves completed loans returned more than min_age_days ago, with their
+    fines, into transactions_archive / fines_archive.
+    - Only loans whose fine (if any) is settled move; a pending fine keeps
+      its loan in the hot table until it is paid or waived
+    - Candidates are found with a plain read keyed on (return_date,
+      transaction_id), then each batch is re-checked, copied and deleted in
+      one short transaction, so row locks last one batch and a crash leaves
+      every loan in exactly one table
+    - pause seconds between batches give live traffic and replicas room
+    """
+
+    CANDIDATES_QUERY = """SELECT t.transaction_id, t.return_date FROM transactions t
+                          WHERE t.status = 'completed' AND t.return_date < %s
+                          AND (t.return_date, t.transaction_id) > (%s, %s)
+                          AND NOT EXISTS (SELECT 1 FROM fines f
+                                          WHERE f.transaction_id = t.transaction_id
+                                          AND f.status = 'pending')
+                          ORDER BY t.return_date, t.transaction_id LIMIT %s"""
+
+    TRANSACTION_COLUMNS = ("transaction_id, user_id, book_isbn, copy_id, transaction_type, "
+                           "transaction_date, due_date, return_date, status, fine_amount")
+    FINE_COLUMNS = "fine_id, user_id, transaction_id, amount, issue_date, paid_date, status"
+
+    def __init__(self, db_manager, min_age_days=None, batch_size=None, pause=None):
+        self.db = db_manager
+        self.min_age_days = min_age_days if min_age_days is not None else ARCHIVE_CONFIG['min_age_days']
+        self.batch_size = batch_size or ARCHIVE_CONFIG['batch_size']
+        self.pause = pause if pause is not None else ARCHIVE_CONFIG['pause']
+
+    def run(self, as_of=None, max_batches=None):
+        """Archive everything old enough as of as_of (default today); returns a report dict"""
+        cutoff = (as_of or date.today()) - timedelta(days=self.min_age_days)
+        report = {'cutoff': cutoff.isoformat(), 'transactions': 0, 'fines': 0, 'batches': 0}
+        started = time.perf_counter()
+
+        after = (date.min, 0)
+        while max_batches is None or report['batches'] < max_batches:
+            rows = self.db.execute_query(
+                self.CANDIDATES_QUERY, (cutoff, after[0], after[1], self.batch_size),
+                fetch=True)
+            if not rows:
+                break
+            last = rows[-1]
+            after = (last['return_date'], last['transaction_id'])
+            self._move([row['transaction_id'] for row in rows], cutoff, report)
+            if len(rows) < self.batch_size:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+
+        report['elapsed_s'] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _move(self, transaction_ids, cutoff, report):
+        placeholders = ", ".join(["%s"] * len(transaction_ids))
+        archived_at = datetime.now().replace(microsecond=0)
+        with self.db.transaction() as tx:
+            # Re-check under lock: a fine may have been reopened since the read
+            locked = tx.execute(
+                f"""SELECT t.transaction_id FROM transactions t
+                   WHERE t.transaction_id IN ({placeholders})
+                   AND t.status = 'completed' AND t.return_date < %s
+                   AND NOT EXISTS (SELECT 1 FROM fines f
+                                   WHERE f.transaction_id = t.transaction_id
+                                   AND f.status = 'pending')
+                   FOR UPDATE""", transaction_ids + [cutoff], fetch=True)
+            ids = [row['transaction_id'] for row in locked]
+            if not ids:
+                return
+            placeholders = ", ".join(["%s"] * len(ids))
+
+            tx.execute(f"""INSERT INTO fines_archive ({self.FINE_COLUMNS}, archived_at)
+                          SELECT {self.FINE_COLUMNS}, %s FROM fines
+                          WHERE transaction_id IN ({placeholders})""", [archived_at] + ids)
+            fines = tx.rowcount
+            tx.execute(f"DELETE FROM fines WHERE transaction_id IN ({placeholders})", ids)
+            tx.execute(f"""INSERT INTO transactions_archive ({self.TRANSACTION_COLUMNS}, archived_at)
+                          SELECT {self.TRANSACTION_COLUMNS}, %s FROM transactions
+                          WHERE transaction_id IN ({placeholders})""", [archived_at] + ids)
+            tx.execute(f"DELETE FROM transactions WHERE transaction_id IN ({placeholders})", ids)
+
+        report['transactions'] += len(ids)
+        report['fines'] += fines
+        report['batches'] += 1
+
+# Test function
+
+
+def test_archive():
+    print("🧪 Testing Transaction Archiving...")
+    from database import DatabaseManager
+    from library_manager import LibraryManager
+
+    db = DatabaseManager()
+    library = LibraryManager(db)
+    before, _ = library.get_user_transactions_page(1, limit=10)
+
+    report = TransactionArchiver(db, batch_size=500).run()
+    print(f"✅ Archive run: {report}")
+
+    after, _ = library.get_user_transactions_page(1, limit=10)
+    same = [t['transaction_id'] for t in before] == [t['transaction_id'] for t in after]
+    print(f"✅ History unchanged for user 1: {same}")
+    library.close()
+
+
+if __name__ == "__main__":
+    test_archive()
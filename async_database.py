@@ -0,0 +1,549 @@
+# async_database.py
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+try:
+    from mysql.connector import aio as mysql_aio
+except ImportError:  # mysql-connector-python < 9 (or SQLite-only installs)
+    mysql_aio = None
+
+from config import POOL_CONFIG
+from database import DatabaseManager, PoolExhaustedError
+from db_backends import MySQLBackend, create_backend
+
+
+def _rows(cursor, rows, dictionary):
+    columns = tuple(column[0] for column in cursor.description)
+    if dictionary:
+        rows = [dict(zip(columns, row)) for row in rows]
+    return rows, columns
+
+
+class _AsyncConnection:
+    """
+    One connection driven from the event loop. Each driver implements:
+    open, ping, begin, commit, rollback, run, run_many, fetch_batches, close
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.raw = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class _MySQLConnection(_AsyncConnection):
+    """Native asyncio MySQL connection (mysql.connector.aio)"""
+
+    async def open(self):
+        self.raw = await mysql_aio.connect(**self.backend.db_config)
+        await self.raw.set_autocommit(True)
+
+    async def ping(self):
+        await self.raw.ping(reconnect=False)
+
+    async def begin(self):
+        await self.raw.start_transaction()
+
+    async def commit(self):
+        await self.raw.commit()
+
+    async def rollback(self):
+        await self.raw.rollback()
+
+    async def run(self, sql, params, fetch, dictionary=True):
+        """Returns (rows or None, rowcount, lastrowid, column_names)"""
+        cursor = await self.raw.cursor()
+        try:
+            await cursor.execute(sql, params or ())
+            if not fetch:
+                return None, cursor.rowcount, cursor.lastrowid, ()
+            rows, columns = _rows(cursor, await cursor.fetchall(), dictionary)
+            return rows, len(rows), None, columns
+        finally:
+            await cursor.close()
+
+    async def run_many(self, sql, seq_params):
+        cursor = await self.raw.cursor()
+        try:
+            await cursor.executemany(sql, seq_params)
+            return cursor.rowcount
+        finally:
+            await cursor.close()
+
+    async def fetch_batches(self, sql, params, batch_size, dictionary):
+        cursor = await self.raw.cursor(dictionary=dictionary)
+        try:
+            await cursor.execute(sql, params or ())
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await cursor.close()
+
+    async def close(self):
+        try:
+            await self.raw.close()
+        except self.backend.errors:
+            pass
+
+
+class _SQLiteConnection(_AsyncConnection):
+    """
+    sqlite3 has no async API: each connection gets one worker thread and
+    every call on it runs there, so the event loop never waits on the file
+    """
+
+    def __init__(self, backend):
+        super().__init__(backend)
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, fn, *args)
+
+    async def open(self):
+        self.raw = await self._call(self.backend.connect)
+
+    async def ping(self):
+        await self._call(self.backend.ping, self.raw)
+
+    async def begin(self):
+        await self._call(self.backend.begin, self.raw)
+
+    async def commit(self):
+        await self._call(self.raw.commit)
+
+    async def rollback(self):
+        await self._call(self.raw.rollback)
+
+    def _run(self, sql, params, fetch, dictionary):
+        cursor = self.raw.cursor()
+        try:
+            cursor.execute(sql, params or ())
+            if not fetch:
+                return None, cursor.rowcount, cursor.lastrowid, ()
+            rows, columns = _rows(cursor, cursor.fetchall(), dictionary)
+            return rows, len(rows), None, columns
+        finally:
+            cursor.close()
+
+    async def run(self, sql, params, fetch, dictionary=True):
+        """Returns (rows or None, rowcount, lastrowid, column_names)"""
+        return await self._call(self._run, sql, params, fetch, dictionary)
+
+    def _run_many(self, sql, seq_params):
+        cursor = self.raw.cursor()
+        try:
+            cursor.executemany(sql, seq_params)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    async def run_many(self, sql, seq_params):
+        return await self._call(self._run_many, sql, seq_params)
+
+    async def fetch_batches(self, sql, params, batch_size, dictionary):
+        cursor = await self._call(self.backend.cursor, self.raw, dictionary)
+        try:
+            await self._call(cursor.execute, sql, params or ())
+            while True:
+                rows = await self._call(cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await self._call(cursor.close)
+
+    async def close(self):
+        try:
+            await self._call(self.raw.close)
+        finally:
+            self._thread.shutdown(wait=False)
+
+
+def _connection_class(backend):
+    if backend.name == 'sqlite':
+        return _SQLiteConnection
+    if mysql_aio is None:
+        raise ImportError("mysql-connector-python 9+ is required for async MySQL (mysql.connector.aio)")
+    return _MySQLConnection
+
+
+class AsyncConnectionPool:
+    """
+    ConnectionPool for asyncio: same sizing, validation and recycling rules,
+    but a checkout that has to wait suspends the coroutine instead of a thread.
+    Thousands of requests can share a handful of connections on one loop.
+    """
+
+    def __init__(self, backend, pool_size=10, checkout_timeout=30,
+                 max_idle_time=300, max_lifetime=3600, validation_interval=5,
+                 statement_cache_size=0):
+        # statement_cache_size is accepted for POOL_CONFIG compatibility; the
+        # async drivers keep their own per-connection statement caches
+        self.backend = backend
+        self.connection_class = _connection_class(backend)
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_time = max_idle_time
+        self.max_lifetime = max_lifetime
+        self.validation_interval = validation_interval
+
+        self._idle = deque()
+        self._open_count = 0
+        self._cond = asyncio.Condition()
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+
+    def _is_stale(self, conn, now):
+        return (now - conn.last_used > self.max_idle_time or
+                now - conn.created_at > self.max_lifetime)
+
+    async def _is_alive(self, conn, now):
+        if now - conn.last_used < self.validation_interval:
+            return True
+        try:
+            await conn.ping()
+            return True
+        except self.backend.errors:
+            return False
+
+    async def get_connection(self, timeout=None):
+        """Check out a live connection, waiting (without blocking the loop) at capacity"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        conn = None
+
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolExhaustedError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open_count < self.pool_size:
+                    self._open_count += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        f"No free connection after {timeout}s (pool size {self.pool_size})")
+                waited = True
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            wait_time = time.monotonic() - started
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+
+        if conn is not None:
+            now = time.monotonic()
+            if self._is_stale(conn, now) or not await self._is_alive(conn, now):
+                await conn.close()
+                conn = None
+                self._recycled += 1
+
+        if conn is None:
+            conn = self.connection_class(self.backend)
+            try:
+                await conn.open()
+            except BaseException:
+                async with self._cond:
+                    self._open_count -= 1
+                    self._cond.notify()
+                raise
+            self._created += 1
+
+        return conn
+
+    async def release(self, conn, discard=False):
+        """Return a connection to the pool (or close it if it is broken)"""
+        async with self._cond:
+            if discard or self._closed:
+                self._open_count -= 1
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            await conn.close()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """Check out a connection for the duration of an async with-block"""
+        conn = await self.get_connection(timeout)
+        discard = False
+        try:
+            yield conn
+        except self.backend.connection_errors:
+            discard = True
+            raise
+        except asyncio.CancelledError:
+            discard = True  # Cancelled mid-statement: the connection state is unknown
+            raise
+        finally:
+            await self.release(conn, discard)
+
+    def stats(self):
+        """Snapshot of pool size and checkout wait times"""
+        return {
+            'pool_size': self.pool_size,
+            'open': self._open_count,
+            'idle': len(self._idle),
+            'in_use': self._open_count - len(self._idle),
+            'checkouts': self._checkouts,
+            'waits': self._waits,
+            'timeouts': self._timeouts,
+            'avg_wait_ms': (self._total_wait / self._waits * 1000) if self._waits else 0.0,
+            'max_wait_ms': self._max_wait * 1000,
+            'created': self._created,
+            'recycled': self._recycled
+        }
+
+    async def close(self):
+        """Close idle connections; checked-out ones are closed on release"""
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._open_count -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            await conn.close()
+
+
+class AsyncDatabaseTransaction:
+    """Statements inside AsyncDatabaseManager.transaction(), all on one connection"""
+
+    def __init__(self, conn, db_manager):
+        self.conn = conn
+        self.db_manager = db_manager
+        self.backend = db_manager.backend
+        self.rowcount = 0
+
+    async def execute(self, query, params=None, fetch=False):
+        """Run one statement; returns rows if fetch else the last inserted id"""
+        started = time.perf_counter()
+        error = None
+        try:
+            rows, self.rowcount, last_id, _ = await self.conn.run(
+                self.backend.translate(query), params, fetch)
+            return rows if fetch else last_id
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await self.db_manager._record(query, params, started, self.rowcount, error)
+
+    async def executemany(self, query, seq_params):
+        """Run one statement for every parameter tuple (batched by the driver)"""
+        started = time.perf_counter()
+        error = None
+        try:
+            self.rowcount = await self.conn.run_many(self.backend.translate(query), seq_params)
+            return self.rowcount
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await self.db_manager._record(query, None, started, self.rowcount, error)
+
+
+class AsyncDatabaseManager:
+    """
+    DatabaseManager for asyncio code: same methods, awaited.
+    - MySQL uses the driver's native asyncio API (mysql.connector.aio)
+    - SQLite runs each connection on its own worker thread
+    Reads and writes go to the primary; read replicas are a DatabaseManager
+    feature for now.
+    """
+
+    def __init__(self, db_config=None, backend=None, query_stats=None, **pool_options):
+        if backend is None:
+            backend = MySQLBackend(db_config) if db_config else create_backend()
+        self.backend = backend
+        self.errors = backend.errors + (PoolExhaustedError,)
+        self.query_stats = query_stats
+
+        options = dict(POOL_CONFIG)
+        options.update(pool_options)
+        self.pool = AsyncConnectionPool(backend, **options)
+        self._background = None
+
+    def background(self):
+        """
+        Small blocking DatabaseManager on the same database, for work that
+        runs on its own threads (write-behind flushes, copy syncs)
+        """
+        if self._background is None:
+            self._background = DatabaseManager(backend=self.backend, pool_size=2)
+        return self._background
+
+    async def execute_query(self, query, params=None, fetch=False):
+        """Execute a SQL query; rows if fetch, else the last inserted id (None on error)"""
+        started = time.perf_counter()
+        rows = 0
+        error = None
+        try:
+            async with self.pool.connection() as conn:
+                result, rows, last_id, _ = await conn.run(
+                    self.backend.translate(query), params, fetch)
+                return result if fetch else last_id
+
+        except self.errors as e:
+            error = e
+            print(f"❌ Database error: {e}")
+            return None
+        finally:
+            await self._record(query, params, started, rows, error)
+
+    async def fetch_rows(self, query, params=None):
+        """Run a SELECT and return (column_names, rows) with rows as plain tuples"""
+        started = time.perf_counter()
+        rows = []
+        error = None
+        try:
+            async with self.pool.connection() as conn:
+                rows, _, _, columns = await conn.run(
+                    self.backend.translate(query), params, True, dictionary=False)
+                return columns, rows
+
+        except self.errors as e:
+            error = e
+            print(f"❌ Database error: {e}")
+            return (), []
+        finally:
+            await self._record(query, params, started, len(rows), error)
+
+    async def stream_query(self, query, params=None, batch_size=1000, dictionary=True):
+        """
+        Async generator over a large result set, batch_size rows in memory at
+        a time. Errors are raised, not printed.
+        """
+        conn = await self.pool.get_connection()
+        discard = True
+        started = time.perf_counter()
+        streamed = 0
+        error = None
+        try:
+            async for rows in conn.fetch_batches(self.backend.translate(query), params,
+                                                 batch_size, dictionary):
+                streamed += len(rows)
+                for row in rows:
+                    yield row
+            discard = False
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await self.pool.release(conn, discard)
+            await self._record(query, params, started, streamed, error)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Several statements as one transaction with a single commit:
+            async with db.transaction() as tx:
+                await tx.execute(...)
+        Commits when the block ends, rolls back if it raises.
+        """
+        async with self.pool.connection() as conn:
+            await conn.begin()
+            try:
+                yield AsyncDatabaseTransaction(conn, self)
+                await conn.commit()
+            except BaseException:
+                try:
+                    await conn.rollback()
+                except self.backend.errors:
+                    pass
+                raise
+
+    async def _record(self, query, params, started, rows, error):
+        """Feed one execution into query_stats; EXPLAIN it if it was slow"""
+        if self.query_stats is None:
+            return
+        needs_explain = self.query_stats.record(
+            query, params, time.perf_counter() - started, rows, error)
+        if needs_explain:
+            await self._explain(query, params)
+
+    async def _explain(self, query, params):
+        try:
+            conn = await self.pool.get_connection(timeout=1)
+        except self.errors:
+            return
+        try:
+            plan, _, _, _ = await conn.run(
+                self.backend.translate(self.backend.explain_prefix + query), params, True)
+            self.query_stats.attach_explain(query, plan)
+        except self.backend.errors:
+            pass
+        finally:
+            await self.pool.release(conn)
+
+    def pool_stats(self):
+        """Connection pool size and wait-time stats"""
+        return self.pool.stats()
+
+    async def test_connection(self):
+        """Test if database connection works"""
+        try:
+            async with self.pool.connection() as conn:
+                await conn.ping()
+            print("✅ Database connection is active!")
+            return True
+        except self.errors:
+            print("❌ Database connection failed!")
+            return False
+
+    async def close(self):
+        """Close all pooled connections"""
+        await self.pool.close()
+        if self._background is not None:
+            self._background.close()
+        print("✅ Database connection pool closed.")
+
+# Test function
+
+
+def test_async_database():
+    """Many concurrent queries sharing a small async pool"""
+    print("🧪 Testing Async Database Manager...")
+
+    async def main():
+        db = AsyncDatabaseManager(pool_size=4)
+        if not await db.test_connection():
+            return
+        results = await asyncio.gather(
+            *(db.execute_query("SELECT 1 as test", fetch=True) for _ in range(200)))
+        print(f"✅ {sum(1 for r in results if r)} of 200 concurrent queries answered "
+              f"by {db.pool_stats()['created']} connections")
+        print(f"✅ Pool stats: {db.pool_stats()}")
+        await db.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_async_database()
@@ -0,0 +1,554 @@
+# async_managers.py
+import asyncio
+from datetime import date, datetime, timedelta
+
+from archive import history_query
+from crud_manager import Catalog
+from database import decode_cursor, encode_cursor
+from fine_accrual import UPSERT_FINES, FinePolicy
+from inventory import REFRESH_BOOK_COUNTERS, CopyInventory
+from library_manager import Circulation
+from models import RowMapper, User
+from password_hasher import HasherBusyError, default_hasher
+from session_store import default_session_store
+from write_behind import default_last_login_buffer
+
+
+# asyncio counterparts of Authentication, CRUDManager and LibraryManager for
+# the web front end: same SQL and post-commit bookkeeping (inherited from
+# crud_manager.Catalog and library_manager.Circulation), same (success,
+# message) results, awaited on an AsyncDatabaseManager. They share the
+# in-memory pieces (caches, search and overdue indexes, session store,
+# bcrypt pool) with the blocking managers, and offer the same patron-facing
+# methods (borrow_many/return_many, overdue lists, fines, search included).
+# One instance serves every request, so nothing per-patron (current_user) is
+# kept on it; sessions carry that. Batch jobs (imports, fine accrual,
+# counter repairs) stay on the blocking managers.
+
+
+class AsyncAuthentication:
+    def __init__(self, db_manager, hasher=None, session_store=None, last_logins=None):
+        self.db_manager = db_manager
+        # bcrypt runs on the hasher's worker threads; the loop only awaits it
+        self.hasher = hasher or default_hasher()
+        self.session_store = session_store if session_store is not None else default_session_store()
+        # last_login is written in batches from a background thread
+        # (one shared buffer per database unless the caller passes its own)
+        self.last_logins = last_logins if last_logins is not None else \
+            default_last_login_buffer(db_manager.background())
+
+    async def login(self, username, password):
+        """Check credentials; returns (user, message), user is None on failure"""
+        columns, rows = await self.db_manager.fetch_rows(
+            "SELECT * FROM users WHERE username = %s", (username,))
+        if not rows:
+            return None, "User not found"
+
+        mapper = RowMapper.for_columns(columns)
+        row = rows[0]
+        stored_hash = mapper.get(row, 'password')
+        try:
+            if not await self.hasher.verify_async(password, stored_hash):
+                return None, "Invalid password"
+        except HasherBusyError:
+            return None, "Too many logins in progress, please try again"
+
+        if not mapper.get(row, 'is_active'):
+            return None, "Account is deactivated"
+
+        user_id = mapper.get(row, 'user_id')
+        self.last_logins.add(user_id, datetime.now().replace(microsecond=0))
+        if self.hasher.needs_rehash(stored_hash):
+            await self._rehash(user_id, password)
+
+        user = mapper.user(row)
+        user.password = None
+        return user, "Login successful"
+
+    async def _rehash(self, user_id, password):
+        try:
+            new_hash = await self.hasher.hash_async(password)
+        except HasherBusyError:
+            return
+        await self.db_manager.execute_query("UPDATE users SET password = %s WHERE user_id = %s",
+                                            (new_hash, user_id))
+
+    # ============= SESSIONS =============
+
+    async def start_session(self, username, password):
+        """Log in and return (session token, message); token is None on failure"""
+        user, message = await self.login(username, password)
+        if user is None:
+            return None, message
+        # The session store may be a proxy to another process (service.py):
+        # its calls are blocking round trips, so they run off the loop
+        return await asyncio.to_thread(self.session_store.create, user), message
+
+    def validate_session(self, token):
+        """User behind a session token, or None (blocking; await it via a thread)"""
+        return self.session_store.get(token)
+
+    async def end_session(self, token):
+        return await asyncio.to_thread(self.session_store.revoke, token)
+
+    async def validate_role(self, required_role, token=None):
+        """Check the role of a session's user (no current_user here: False without a token)"""
+        if not token:
+            return False
+        user = await asyncio.to_thread(self.validate_session, token)
+        return user is not None and user.role == required_role
+
+    async def register_user(self, username, password, name, email, phone, role="user"):
+        existing = await self.db_manager.execute_query(
+            "SELECT user_id FROM users WHERE username = %s OR email = %s",
+            (username, email), fetch=True)
+        if existing:
+            return None, "Username or email already exists"
+
+        try:
+            hashed_pw = await self.hasher.hash_async(password)
+        except HasherBusyError:
+            return None, "Too many registrations in progress, please try again"
+        insert_query = """INSERT INTO users (username, password, name, email, phone, role, membership_type, is_active)
+                         VALUES (%s, %s, %s, %s, %s, %s, 'Standard', TRUE)"""
+        user_id = await self.db_manager.execute_query(
+            insert_query, (username, hashed_pw, name, email, phone, role))
+
+        if user_id:
+            columns, rows = await self.db_manager.fetch_rows(
+                "SELECT * FROM users WHERE user_id = %s", (user_id,))
+            if rows:
+                return RowMapper.for_columns(columns).user(rows[0]), "Registration successful"
+        return None, "Registration failed"
+
+    def close(self):
+        self.last_logins.flush()  # Shared with other logins; it stops at exit
+
+
+class AsyncCRUDManager(Catalog):
+    def __init__(self, db_manager, search_index=None, cache=None, session_store=None,
+                 view_counts=None, hasher=None, event_bus=None):
+        self.db = db_manager
+        self.search_index = search_index
+        self.cache = cache
+        self.session_store = session_store if session_store is not None else default_session_store()
+        self.view_counts = view_counts
+        self.hasher = hasher or default_hasher()
+        self.event_bus = event_bus
+        # Copy syncs are rare admin work; they run blocking, off the loop
+        self.inventory = CopyInventory(db_manager.background())
+
+    # ============= BOOK OPERATIONS =============
+
+    async def add_book(self, book, added_by=None):
+        """Add a new book to database"""
+        result = await self.db.execute_query(self.INSERT_BOOK, self._book_params(book, added_by))
+        if result is not None:
+            await asyncio.to_thread(self.inventory.sync_copies, [book.isbn])
+            self._book_added(book)
+        return result
+
+    async def get_book(self, isbn):
+        """Get a book by ISBN"""
+        if self.view_counts is not None:
+            self.view_counts.add(isbn, 1)
+        if self.cache is not None:
+            book = self.cache.get_book(isbn)
+            if book is not None:
+                return book
+            generation = self.cache.generation()
+
+        columns, rows = await self.db.fetch_rows(self.BOOK_QUERY, (isbn,))
+        if rows:
+            book = RowMapper.for_columns(columns).book(rows[0])
+            if self.cache is not None:
+                self.cache.put_book(book, generation)
+            return book
+        return None
+
+    async def get_books_page(self, cursor=None, limit=50):
+        """One page of books ordered by title; returns (books, next_cursor)"""
+        query, params = self._books_page_query(cursor, limit)
+        columns, rows = await self.db.fetch_rows(query, params)
+        books = RowMapper.for_columns(columns).books(rows)
+        next_cursor = None
+        if len(books) == limit:
+            next_cursor = encode_cursor((books[-1].title, books[-1].isbn))
+        return books, next_cursor
+
+    async def update_book(self, isbn, **updates):
+        """Update book information"""
+        updates.pop('available_copies', None)  # Derived from book_copies
+        if not updates:
+            return False
+
+        query, values = self._update_query('books', 'isbn', updates, isbn)
+        result = await self.db.execute_query(query, values)
+        if result is not None and 'total_copies' in updates:
+            available = await asyncio.to_thread(self.inventory.sync_copies, [isbn])
+            if isbn in available:
+                updates['available_copies'] = available[isbn]
+        self._book_updated(isbn, updates, result)
+        return result
+
+    async def delete_book(self, isbn):
+        """Delete a book from database"""
+        on_loan = await self.db.execute_query(CopyInventory.ON_LOAN_QUERY, (isbn,), fetch=True)
+        if on_loan and on_loan[0]['on_loan'] > 0:
+            return False, "Cannot delete: Book is currently borrowed"
+
+        try:
+            async with self.db.transaction() as tx:
+                for statement in self.DELETE_BOOK:
+                    await tx.execute(statement, (isbn,))
+        except Exception as e:
+            return False, f"Error deleting book: {str(e)}"
+        self._book_deleted(isbn)
+        return True, "Book deleted successfully"
+
+    async def search_books(self, title=None, author=None, genre=None, available_only=False, text=None):
+        """Search books with filters (ranked from the search index when one is loaded)"""
+        if self.search_index is not None:
+            return self._indexed_search(title, author, genre, available_only, text)
+
+        query, params = self._search_query(title, author, genre, available_only, text)
+        columns, rows = await self.db.fetch_rows(query, params)
+        return RowMapper.for_columns(columns).books(rows)
+
+    # ============= USER OPERATIONS =============
+
+    async def add_user(self, user):
+        """Add a new user (bcrypt on the hashing pool)"""
+        hashed_password = await self.hasher.hash_async(user.password)
+        return await self.db.execute_query(self.INSERT_USER,
+                                           self._user_params(user, hashed_password))
+
+    async def get_user(self, user_id):
+        """Get user by ID"""
+        if self.cache is not None:
+            user = self.cache.get_user(user_id)
+            if user is not None:
+                return user
+            generation = self.cache.generation()
+
+        columns, rows = await self.db.fetch_rows(self.USER_QUERY, (user_id,))
+        if rows:
+            user = RowMapper.for_columns(columns).user(rows[0])
+            if self.cache is not None:
+                self.cache.put_user(user, generation)
+            return user
+        return None
+
+    async def get_user_by_username(self, username):
+        """Get user by username"""
+        if self.cache is not None:
+            user = self.cache.get_user_by_username(username)
+            if user is not None:
+                return user
+            generation = self.cache.generation()
+
+        columns, rows = await self.db.fetch_rows(self.USER_BY_USERNAME_QUERY, (username,))
+        if rows:
+            user = RowMapper.for_columns(columns).user(rows[0])
+            if self.cache is not None:
+                self.cache.put_user(user, generation)
+            return user
+        return None
+
+    async def get_users_page(self, cursor=None, limit=50):
+        """One page of users ordered by name; returns (users, next_cursor)"""
+        query, params = self._users_page_query(cursor, limit)
+        columns, rows = await self.db.fetch_rows(query, params)
+        users = RowMapper.for_columns(columns).users(rows)
+        next_cursor = None
+        if len(users) == limit:
+            next_cursor = encode_cursor((users[-1].name, users[-1].user_id))
+        return users, next_cursor
+
+    async def update_user(self, user_id, **updates):
+        """Update user information"""
+        if not updates:
+            return False
+
+        query, values = self._update_query('users', 'user_id', updates, user_id)
+        result = await self.db.execute_query(query, values)
+        # Refreshes or revokes the user's sessions: blocking, off the loop
+        await asyncio.to_thread(self._user_updated, user_id, updates, result)
+        return result
+
+    async def delete_user(self, user_id):
+        """Delete a user"""
+        result = await self.db.execute_query(self.USER_LOANS_QUERY, (user_id,), fetch=True)
+        if result and result[0]['active_loans'] > 0:
+            return False, "Cannot delete: User has active book borrowings"
+
+        await self.db.execute_query(self.DELETE_USER, (user_id,))
+        await asyncio.to_thread(self._user_deleted, user_id)
+        return True, "User deleted successfully"
+
+
+class AsyncLibraryManager(Circulation):
+    def __init__(self, db_manager, search_index=None, cache=None, fine_policy=None,
+                 overdue_index=None, event_bus=None):
+        self.db_manager = db_manager
+        self.fine_policy = fine_policy or FinePolicy.from_config()
+        self.search_index = search_index
+        self.cache = cache
+        self.overdue_index = overdue_index
+        self.event_bus = event_bus
+
+    def close(self):
+        """Nothing to flush: circulation writes its counters before committing"""
+
+    async def borrow_book(self, user_id, book_isbn):
+        """Borrow a book for a user (one transaction, one commit)"""
+        try:
+            async with self.db_manager.transaction() as tx:
+                check_result = await tx.execute(self.BORROW_CHECK_QUERY, (book_isbn, user_id),
+                                                fetch=True)
+                if not check_result:
+                    return False, "User not found or inactive"
+
+                user = check_result[0]
+                if user['title'] is None:
+                    return False, "Book not found or not available"
+
+                max_books = User.loan_limit(user['membership_type'])
+                if user['active_loans'] >= max_books:
+                    return False, f"Borrowing limit reached. Maximum {max_books} books allowed."
+
+                copies = await tx.execute(CopyInventory.ALLOCATE_QUERY, (book_isbn,), fetch=True)
+                if not copies:
+                    return False, "Book not found or not available"
+                copy_id = copies[0]['copy_id']
+                await tx.execute(CopyInventory.CLAIM_QUERY, (copy_id,))
+
+                due_date = self._due_date()
+                transaction_id = await tx.execute(self.INSERT_LOAN,
+                                                  (user_id, book_isbn, copy_id, due_date))
+                await tx.execute(self.ADJUST_ACTIVE_LOANS, (1, user_id))
+                await tx.execute(REFRESH_BOOK_COUNTERS, (book_isbn,))
+
+            self._borrowed(user_id, book_isbn, copy_id, transaction_id, due_date)
+            return True, self._borrow_message(user['title'], due_date)
+
+        except Exception as e:
+            return False, f"Error borrowing book: {str(e)}"
+
+    async def return_book(self, user_id, book_isbn):
+        """Return a borrowed book (one transaction, one commit)"""
+        try:
+            async with self.db_manager.transaction() as tx:
+                transaction_result = await tx.execute(self.RETURN_LOOKUP_QUERY,
+                                                      (user_id, book_isbn), fetch=True)
+                if not transaction_result:
+                    return False, "No active borrow transaction found"
+
+                transaction = transaction_result[0]
+                transaction_id = transaction['transaction_id']
+                return_date = datetime.now().date()
+                fine_amount = self.fine_policy.fine(transaction['due_date'], return_date)
+
+                await tx.execute(self.COMPLETE_LOAN, (return_date, fine_amount, transaction_id))
+                if transaction['copy_id'] is not None:
+                    await tx.execute(CopyInventory.RELEASE_QUERY.format(placeholders="%s"),
+                                     (transaction['copy_id'],))
+                await tx.execute(REFRESH_BOOK_COUNTERS, (book_isbn,))
+                await tx.execute(self.ADJUST_ACTIVE_LOANS, (-1, user_id))
+                if fine_amount > 0:
+                    await tx.execute(UPSERT_FINES,
+                                     (user_id, transaction_id, fine_amount, return_date))
+
+            self._returned(user_id, book_isbn, transaction['copy_id'], transaction_id, fine_amount)
+            return True, self._return_message(transaction['title'], fine_amount)
+
+        except Exception as e:
+            return False, f"Error returning book: {str(e)}"
+
+    async def borrow_many(self, user_id, isbns):
+        """LibraryManager.borrow_many, awaited: one transaction for the whole stack"""
+        results = []
+        try:
+            async with self.db_manager.transaction() as tx:
+                user_result = await tx.execute(self.BORROWER_QUERY, (user_id,), fetch=True)
+                if not user_result:
+                    return [(isbn, False, "User not found or inactive") for isbn in isbns]
+
+                user = user_result[0]
+                max_books = User.loan_limit(user['membership_type'])
+                slots_left = max_books - user['active_loans']
+
+                unique_isbns = list(dict.fromkeys(isbns))
+                books = {row['isbn']: row['title'] for row in await tx.execute(
+                    self._in_list(self.BOOK_TITLES_QUERY, unique_isbns), unique_isbns,
+                    fetch=True)} if unique_isbns else {}
+
+                due_date = self._due_date()
+                accepted = []
+                copy_ids = []
+                for isbn in isbns:
+                    refusal = self._borrow_refusal(isbn, books, accepted, slots_left, max_books)
+                    copies = None if refusal else await tx.execute(
+                        CopyInventory.ALLOCATE_QUERY, (isbn,), fetch=True)
+                    if not copies:
+                        results.append((isbn, False, refusal or "Book not found or not available"))
+                        continue
+                    copy_id = copies[0]['copy_id']
+                    await tx.execute(CopyInventory.CLAIM_QUERY, (copy_id,))
+                    accepted.append(isbn)
+                    copy_ids.append(copy_id)
+                    results.append((isbn, True, self._borrow_message(books[isbn], due_date)))
+
+                new_loans = []
+                if accepted:
+                    await tx.executemany(self.INSERT_LOAN,
+                                         [(user_id, isbn, copy_id, due_date)
+                                          for isbn, copy_id in zip(accepted, copy_ids)])
+                    await tx.execute(self.ADJUST_ACTIVE_LOANS, (len(accepted), user_id))
+                    await tx.executemany(REFRESH_BOOK_COUNTERS,
+                                         [(isbn,) for isbn in dict.fromkeys(accepted)])
+                    if self.overdue_index is not None or self.event_bus is not None:
+                        new_loans = await tx.execute(
+                            self._in_list(self.NEW_LOANS_QUERY, copy_ids), copy_ids, fetch=True)
+
+            loan_ids = {row['copy_id']: row['transaction_id'] for row in new_loans}
+            for isbn, copy_id in zip(accepted, copy_ids):
+                self._borrowed(user_id, isbn, copy_id, loan_ids.get(copy_id), due_date)
+            return results
+
+        except Exception as e:
+            return [(isbn, False, f"Error borrowing book: {str(e)}") for isbn in isbns]
+
+    async def return_many(self, user_id, isbns):
+        """LibraryManager.return_many, awaited: one transaction for the whole stack"""
+        try:
+            async with self.db_manager.transaction() as tx:
+                unique_isbns = list(dict.fromkeys(isbns))
+                if not unique_isbns:
+                    return []
+
+                open_loans = {}
+                for row in await tx.execute(self._in_list(self.RETURN_MANY_QUERY, unique_isbns),
+                                            [user_id] + unique_isbns, fetch=True):
+                    open_loans.setdefault(row['book_isbn'], row)  # Newest loan per book
+
+                return_date = datetime.now().date()
+                results, returned, fines = self._plan_returns(user_id, isbns, open_loans,
+                                                              return_date)
+                if returned:
+                    await tx.executemany(self.COMPLETE_LOAN,
+                                         [(return_date, fine_amount, transaction_id)
+                                          for _, _, transaction_id, fine_amount in returned])
+                    copy_ids = [copy_id for _, copy_id, _, _ in returned if copy_id is not None]
+                    if copy_ids:
+                        await tx.execute(self._in_list(CopyInventory.RELEASE_QUERY, copy_ids),
+                                         copy_ids)
+                    await tx.executemany(REFRESH_BOOK_COUNTERS,
+                                         [(isbn,) for isbn, _, _, _ in returned])
+                    await tx.execute(self.ADJUST_ACTIVE_LOANS, (-len(returned), user_id))
+
+                if fines:
+                    await tx.executemany(UPSERT_FINES, fines)
+
+            for isbn, copy_id, transaction_id, fine_amount in returned:
+                self._returned(user_id, isbn, copy_id, transaction_id, fine_amount)
+            return results
+
+        except Exception as e:
+            return [(isbn, False, f"Error returning book: {str(e)}") for isbn in isbns]
+
+    async def get_user_transactions(self, user_id):
+        """Get all transactions for a user (archived ones included)"""
+        query, params = history_query(user_id)
+        return await self.db_manager.execute_query(query, params, fetch=True)
+
+    async def get_user_transactions_page(self, user_id, cursor=None, limit=50):
+        """One page of a user's history, newest first; returns (transactions, next_cursor)"""
+        query, params = history_query(user_id, decode_cursor(cursor) if cursor else None, limit)
+        transactions = await self.db_manager.execute_query(query, params, fetch=True) or []
+        return transactions, self._history_cursor(transactions, limit)
+
+    async def get_overdue_books(self, user_id=None):
+        """Every overdue loan (optionally for one user), most overdue first"""
+        loans, _ = await self._open_loans_page(None, date.today(), user_id, None, None)
+        return loans
+
+    async def get_overdue_page(self, cursor=None, limit=50, user_id=None):
+        """One page of overdue loans, most overdue first; returns (loans, next_cursor)"""
+        return await self._open_loans_page(None, date.today(), user_id, cursor, limit)
+
+    async def get_due_soon(self, days=3, cursor=None, limit=50, user_id=None):
+        """One page of open loans due today or within the next days days"""
+        today = date.today()
+        return await self._open_loans_page(today, today + timedelta(days=days + 1),
+                                           user_id, cursor, limit)
+
+    async def _open_loans_page(self, start, end, user_id, cursor, limit):
+        """LibraryManager._open_loans_page, awaited"""
+        after = decode_cursor(cursor) if cursor else None
+        if self.overdue_index is not None:
+            keys = self.overdue_index.range(start, end, user_id, after, limit)
+            loans = await self._loans_by_id([transaction_id for _, transaction_id in keys])
+        else:
+            query, params = self._open_loans_query(start, end, user_id, after, limit)
+            loans = await self.db_manager.execute_query(query, params, fetch=True) or []
+        return self._loans_page(loans, limit)
+
+    async def _loans_by_id(self, transaction_ids):
+        """LibraryManager._loans_by_id, awaited"""
+        found = {}
+        for query, chunk in self._loan_chunks(transaction_ids):
+            for row in await self.db_manager.execute_query(query, chunk, fetch=True) or []:
+                found[row['transaction_id']] = row
+        return [found[t] for t in transaction_ids if t in found]
+
+    async def search_books(self, title=None, author=None, genre=None, available_only=False, text=None):
+        """Search for books with filters (ranked from the search index when one is loaded)"""
+        try:
+            if self.search_index is not None:
+                return self.search_index.search(text, title, author, genre, available_only)
+
+            query, params = Catalog._search_query(title, author, genre, available_only, text)
+            return await self.db_manager.execute_query(query, params, fetch=True)
+
+        except Exception as e:
+            print(f"Error searching books: {e}")
+            return []
+
+    async def calculate_fine(self, transaction_id):
+        """Calculate fine for a specific transaction"""
+        # Archived loans are all returned, so their fine is final
+        for table in ('transactions', 'transactions_archive'):
+            result = await self.db_manager.execute_query(
+                self.LOAN_FINE_QUERY.format(table=table), (transaction_id,), fetch=True)
+            if result:
+                return self._loan_fine(result[0])
+        return 0.00
+
+
+# Test function
+
+
+def test_async_managers():
+    """Concurrent patron requests on one event loop"""
+    print("🧪 Testing Async Managers...")
+    from async_database import AsyncDatabaseManager
+
+    async def main():
+        db = AsyncDatabaseManager(pool_size=4)
+        crud = AsyncCRUDManager(db)
+        library = AsyncLibraryManager(db)
+        books, _ = await crud.get_books_page(limit=20)
+        found = await asyncio.gather(*(crud.get_book(book.isbn) for book in books))
+        print(f"✅ {len(found)} concurrent book lookups")
+        pages = await asyncio.gather(*(library.get_user_transactions_page(user_id)
+                                       for user_id in range(1, 51)))
+        print(f"✅ {len(pages)} concurrent history pages, pool: {db.pool_stats()}")
+        library.close()
+        await db.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_async_managers()
@@ -1,91 +1,121 @@
 # authentication.py
-import bcrypt
-from models import User, Admin
+from models import RowMapper
 from database import DatabaseManager
+from password_hasher import HasherBusyError, default_hasher
+from session_store import default_session_store
+from write_behind import default_last_login_buffer
+from datetime import datetime
 
 
 class Authentication:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, hasher=None, session_store=None, last_logins=None):
         self.db_manager = db_manager
         self.current_user = None
+        self.current_token = None
+        # bcrypt runs on the hasher's worker pool (shared process-wide by default)
+        self.hasher = hasher or default_hasher()
+        # Sessions let many patrons stay logged in without re-checking passwords
+        self.session_store = session_store if session_store is not None else default_session_store()
+        # last_login is written in batches, off the login path
+        # (one shared buffer per database unless the caller passes its own)
+        self.last_logins = last_logins if last_logins is not None else \
+            default_last_login_buffer(db_manager)
 
     def hash_password(self, password):
         # return hashlib.sha256(password.encode()).hexdigest()
         """Hash password using bcrypt (same as in CRUDManager)"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode(), salt)
-        return hashed.decode()
+        return self.hasher.hash(password)
 
     def verify_password(self, plain_password, hashed_password):
         """Verify password against hash"""
-        try:
-            # Convert string back to bytes for bcrypt
-            return bcrypt.checkpw(
-                plain_password.encode('utf-8'),
-                hashed_password.encode('utf-8')
-            )
-        except Exception as e:
-            print(f"Password verification error: {e}")
-            return False
+        return self.hasher.verify(plain_password, hashed_password)
 
     def login(self, username, password):
         query = "SELECT * FROM users WHERE username = %s"
-        user_data = self.db_manager.execute_query(
-            query, (username,), fetch=True)
+        columns, rows = self.db_manager.fetch_rows(query, (username,))
 
-        if not user_data:
+        if not rows:
             return None, "User not found"
 
-        user_data = user_data[0]
+        mapper = RowMapper.for_columns(columns)
+        row = rows[0]
 
         # hashed_password = self.hash_password(password)
 
         # if user_data['password'] != hashed_password:
         #     return None, "Invalid password"
         # Verify password using bcrypt
-        if not self.verify_password(password, user_data['password']):
-            return None, "Invalid password"
+        stored_hash = mapper.get(row, 'password')
+        try:
+            if not self.verify_password(password, stored_hash):
+                return None, "Invalid password"
+        except HasherBusyError:
+            return None, "Too many logins in progress, please try again"
 
-        if not user_data['is_active']:
+        if not mapper.get(row, 'is_active'):
             return None, "Account is deactivated"
 
-        # Update last login
-        update_query = "UPDATE users SET last_login = NOW() WHERE user_id = %s"
-        self.db_manager.execute_query(update_query, (user_data['user_id'],))
-
-        # Create appropriate user object
-        if user_data['role'] == 'admin':
-            self.current_user = Admin(
-                user_data['user_id'],
-                user_data['username'],
-                user_data['name'],
-                user_data['email'],
-                user_data['phone'],
-                user_data.get('department', 'General'),
-                user_data['is_active']
-            )
-        else:
-            self.current_user = User(
-                user_data['user_id'],
-                user_data['username'],
-                user_data['name'],
-                user_data['email'],
-                user_data['phone'],
-                user_data['role'],
-                user_data['membership_type'],
-                user_data['is_active']
-            )
+        # Update last login (buffered, flushed in batches)
+        user_id = mapper.get(row, 'user_id')
+        self.last_logins.add(user_id, datetime.now().replace(microsecond=0))
+
+        # Bcrypt cost changed since this hash was made: upgrade it while we
+        # still have the plain password
+        if self.hasher.needs_rehash(stored_hash):
+            self._rehash(user_id, password)
+
+        # Create appropriate user object (Admin or User, by role)
+        self.current_user = mapper.user(row)
+        self.current_user.password = None  # Don't keep the hash in sessions
+        self.current_token = self.session_store.create(self.current_user)
 
         return self.current_user, "Login successful"
 
+    # ============= SESSIONS =============
+
+    def start_session(self, username, password):
+        """Log in and return (session token, message); token is None on failure"""
+        user, message = self.login(username, password)
+        if user is None:
+            return None, message
+        return self.current_token, message
+
+    def validate_session(self, token):
+        """User behind a session token, or None (no database or bcrypt work)"""
+        return self.session_store.get(token)
+
+    def end_session(self, token):
+        """Log a session out"""
+        if token == self.current_token:
+            self.current_user = None
+            self.current_token = None
+        return self.session_store.revoke(token)
+
+    def _rehash(self, user_id, password):
+        try:
+            new_hash = self.hash_password(password)
+        except HasherBusyError:
+            return  # Try again on a later login
+        self.db_manager.execute_query("UPDATE users SET password = %s WHERE user_id = %s",
+                                      (new_hash, user_id))
+
     def logout(self):
+        if self.current_token:
+            self.session_store.revoke(self.current_token)
         self.current_user = None
+        self.current_token = None
         return "Logout successful"
 
-    def validate_role(self, required_role):
-        if not self.current_user:
+    def validate_role(self, required_role, token=None):
+        """Check the role of a session's user, or of current_user without a token"""
+        user = self.validate_session(token) if token else self.current_user
+        if not user:
             return False
-        return self.current_user.role == required_role
+        return user.role == required_role
+
+    def close(self):
+        """Flush buffered last_login updates (the buffer itself is shared; it stops at exit)"""
+        self.last_logins.flush()
 
     def register_user(self, username, password, name, email, phone, role="user"):
         # Check if username exists
@@ -99,39 +129,20 @@ class Authentication:
         # Insert new user
         insert_query = """INSERT INTO users (username, password, name, email, phone, role, membership_type, is_active) 
                          VALUES (%s, %s, %s, %s, %s, %s, 'Standard', TRUE)"""
-        hashed_pw = self.hash_password(password)
+        try:
+            hashed_pw = self.hash_password(password)
+        except HasherBusyError:
+            return None, "Too many registrations in progress, please try again"
         user_id = self.db_manager.execute_query(insert_query,
                                                 (username, hashed_pw, name, email, phone, role))
 
         if user_id:
             # Get the newly created user
             user_query = "SELECT * FROM users WHERE user_id = %s"
-            new_user_data = self.db_manager.execute_query(
-                user_query, (user_id,), fetch=True)[0]
-
-            if new_user_data['role'] == 'admin':
-                user = Admin(
-                    user_id,
-                    new_user_data['username'],
-                    new_user_data['name'],
-                    new_user_data['email'],
-                    new_user_data['phone'],
-                    new_user_data['role'],
-                    new_user_data['membership_type'],
-                    new_user_data['is_active']
-                )
-            else:
-                user = User(
-                    user_id,
-                    new_user_data['username'],
-                    new_user_data['name'],
-                    new_user_data['email'],
-                    new_user_data['phone'],
-                    new_user_data['role'],
-                    new_user_data['membership_type'],
-                    new_user_data['is_active']
-                )
-            return user, "Registration successful"
+            columns, rows = self.db_manager.fetch_rows(user_query, (user_id,))
+            if rows:
+                user = RowMapper.for_columns(columns).user(rows[0])
+                return user, "Registration successful"
         return None, "Registration failed"
         #     return User(user_id, username, name, email, phone, role), "Registration successful"
         # return None, "Registration failed"
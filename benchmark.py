@@ -0,0 +1,304 @@
+# benchmark.py
+"""
+End-to-end benchmark of the circulation, search and auth hot paths.
+
+Seeds a synthetic library, times each operation and writes a JSON report
+that can be compared against an earlier run to catch regressions:
+
+    python benchmark.py --books 20000 --users 2000 --history 100000 -o bench.json
+    python benchmark.py -o new.json --compare bench.json --threshold 0.20
+
+Runs on an embedded SQLite file by default, so it needs no MySQL server.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from authentication import Authentication
+from crud_manager import CRUDManager
+from database import DatabaseManager
+from db_backends import SQLiteBackend, create_backend
+from inventory import CopyInventory
+from library_manager import LibraryManager
+
+WORDS = ("river night garden code shadow winter empire stone silent light "
+         "history python data ocean forest machine dream city war peace "
+         "secret journey star iron glass kingdom mind world fire song").split()
+GENRES = ["Fiction", "Programming", "History", "Science", "Fantasy", "Biography"]
+PASSWORD = "benchmark-pass"
+
+
+# ============= SEEDING =============
+
+def seed_library(db, auth, rng, books, users, history, batch_size=1000):
+    """Fill an empty database with synthetic books, users and past loans"""
+    print(f"🌱 Seeding {books} books, {users} users, {history} transactions...")
+    # One real bcrypt hash shared by every user keeps seeding fast while
+    # login still pays the full verification cost
+    password_hash = auth.hash_password(PASSWORD)
+
+    isbns = [f"978{n:010d}" for n in range(books)]
+    rows = []
+    for isbn in isbns:
+        title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))
+        copies = rng.randint(1, 5)
+        rows.append((isbn, title, f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+                     rng.randint(1950, 2024), copies, copies, rng.choice(GENRES),
+                     round(rng.uniform(5, 60), 2),
+                     " ".join(rng.choice(WORDS) for _ in range(12))))
+    _insert_batches(db, """INSERT INTO books (isbn, title, author, publication_year,
+                           total_copies, available_copies, genre, price, description)
+                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""", rows, batch_size)
+    # Raw inserts create no book_copies rows; number the copies in one pass
+    CopyInventory(db).sync_copies()
+
+    rows = [(f"user{n}", password_hash, f"User {n}", f"user{n}@example.com", "555-0100",
+             'user', rng.choice(['Standard', 'Premium']), True)
+            for n in range(users)]
+    _insert_batches(db, """INSERT INTO users (username, password, name, email, phone, role,
+                           membership_type, is_active)
+                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""", rows, batch_size)
+    user_ids = [row['user_id'] for row in
+                db.execute_query("SELECT user_id FROM users ORDER BY user_id", fetch=True)]
+
+    # Completed loans spread over the last two years
+    now = datetime.now()
+    rows = []
+    for _ in range(history):
+        borrowed = now - timedelta(days=rng.randint(20, 730), minutes=rng.randint(0, 1440))
+        due = borrowed + timedelta(days=14)
+        returned = borrowed + timedelta(days=rng.randint(1, 30))
+        fine = max(0, (returned.date() - due.date()).days) * 2.00
+        rows.append((rng.choice(user_ids), rng.choice(isbns), borrowed,
+                     due.date(), returned.date(), fine))
+    _insert_batches(db, """INSERT INTO transactions (user_id, book_isbn, transaction_type,
+                           transaction_date, due_date, return_date, status, fine_amount)
+                           VALUES (%s, %s, 'borrow', %s, %s, %s, 'completed', %s)""",
+                    rows, batch_size)
+    return isbns, user_ids
+
+
+def _insert_batches(db, query, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        with db.transaction() as tx:
+            tx.executemany(query, rows[start:start + batch_size])
+
+
+def seed_open_loans(db, library, rng, isbns, user_ids, count):
+    """Open loans (some overdue) so overdue and return paths have work to do"""
+    opened = []
+    for _ in range(count):
+        user_id, isbn = rng.choice(user_ids), rng.choice(isbns)
+        success, _ = library.borrow_book(user_id, isbn)
+        if success:
+            opened.append((user_id, isbn))
+    # Backdate a third of them past their due date
+    overdue = (datetime.now() - timedelta(days=rng.randint(1, 30))).date()
+    for user_id, isbn in opened[::3]:
+        db.execute_query("""UPDATE transactions SET due_date = %s
+                           WHERE user_id = %s AND book_isbn = %s AND return_date IS NULL""",
+                         (overdue, user_id, isbn))
+    return opened
+
+
+# ============= MEASUREMENT =============
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(name, operation, iterations, warmup=5):
+    """Call operation(i) iterations times and summarise latencies in ms"""
+    for i in range(min(warmup, iterations)):
+        operation(i)
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        try:
+            ok = operation(i)
+        except Exception:
+            ok = False
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if ok is False:
+            failed += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        'iterations': iterations,
+        'failed': failed,
+        'throughput_ops': iterations / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+    }
+    print(f"⏱️  {name:<28} {result['throughput_ops']:>9.1f} ops/s  "
+          f"p50 {result['p50_ms']:.3f}  p95 {result['p95_ms']:.3f}  "
+          f"p99 {result['p99_ms']:.3f} ms  failed {failed}")
+    return result
+
+
+def run_benchmarks(db, args):
+    rng = random.Random(args.seed)
+    auth = Authentication(db)
+    library = LibraryManager(db)
+    crud = CRUDManager(db)
+    indexed = None
+
+    try:
+        isbns, user_ids = seed_library(db, auth, rng, args.books, args.users, args.history)
+        open_loans = seed_open_loans(db, library, rng, isbns, user_ids, args.open_loans)
+        iterations = args.iterations
+        results = {}
+
+        # Borrow then return the same pairs so stock levels stay stable
+        pairs = [(rng.choice(user_ids), rng.choice(isbns)) for _ in range(iterations)]
+        results['borrow_book'] = measure(
+            'borrow_book', lambda i: library.borrow_book(*pairs[i])[0], iterations, warmup=0)
+        results['return_book'] = measure(
+            'return_book', lambda i: library.return_book(*pairs[i])[0], iterations, warmup=0)
+
+        queries = [rng.choice(WORDS) for _ in range(iterations)]
+        results['search_books'] = measure(
+            'search_books', lambda i: library.search_books(title=queries[i]) is not None,
+            iterations)
+
+        crud.build_search_index()
+        indexed = LibraryManager(db, search_index=crud.search_index)
+        results['search_books_indexed'] = measure(
+            'search_books (index)', lambda i: indexed.search_books(title=queries[i]) is not None,
+            iterations)
+
+        results['get_overdue_books'] = measure(
+            'get_overdue_books', lambda i: library.get_overdue_books() is not None,
+            max(1, iterations // 10))
+
+        users = [rng.choice(user_ids) for _ in range(iterations)]
+        results['get_user_transactions'] = measure(
+            'get_user_transactions', lambda i: library.get_user_transactions(users[i]) is not None,
+            iterations)
+
+        logins = [f"user{rng.randrange(args.users)}" for _ in range(args.login_iterations)]
+        results['login'] = measure(
+            'Authentication.login', lambda i: auth.login(logins[i], PASSWORD)[0] is not None,
+            args.login_iterations, warmup=1)
+
+        for user_id, isbn in open_loans:
+            library.return_book(user_id, isbn)
+        return results
+    finally:
+        # Write out buffered updates (last_login, ...) while the pool is still open
+        for manager in (library, indexed, auth):
+            if manager is not None:
+                manager.close()
+
+
+# ============= REPORTING =============
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path, threshold):
+    """Print p95 changes against a baseline report; return names that regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 Compared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    regressions = []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if not old or not old['p95_ms']:
+            continue
+        change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms']
+        flag = "❌" if change > threshold else "✅"
+        print(f"   {flag} {name:<28} p95 {old['p95_ms']:.3f} -> {result['p95_ms']:.3f} ms "
+              f"({change:+.0%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Library hot-path benchmark")
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--db', default='bench_library.db', help="SQLite file (recreated)")
+    parser.add_argument('--wipe', action='store_true',
+                        help="Required with --backend mysql: deletes all library data")
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--history', type=int, default=20000)
+    parser.add_argument('--open-loans', type=int, default=300)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--login-iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--compare', help="Baseline JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help="Allowed p95 slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    if args.backend == 'sqlite':
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        db = DatabaseManager(backend=SQLiteBackend(args.db))
+    else:
+        if not args.wipe:
+            parser.error("--backend mysql deletes all library data; pass --wipe to confirm")
+        db = DatabaseManager(backend=create_backend('mysql'))
+        # Children before parents, or the foreign keys reject the deletes
+        for table in ('fines_archive', 'transactions_archive', 'fines', 'transactions',
+                      'book_copies', 'books', 'users'):
+            db.execute_query(f"DELETE FROM {table}")
+
+    results = run_benchmarks(db, args)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'books': args.books,
+            'users': args.users,
+            'history': args.history,
+            'open_loans': args.open_loans,
+            'iterations': args.iterations,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    db.close()
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# cache.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU cache with a per-entry time to live.
+    - max_size: entries kept before the least recently used is evicted
+    - ttl: seconds an entry stays valid (None = until evicted or invalidated)
+    Staleness is tracked per key: put() with a generation is refused only if
+    that key (or everything, via invalidate_where/clear) was invalidated
+    since the generation was taken, so writes to one book don't make loads
+    of every other book uncacheable.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # Ticks on every invalidation. _invalidated remembers the tick of
+        # each key's last invalidation (as many keys as the cache holds);
+        # keys it has forgotten, and every key after a bulk invalidation,
+        # count as invalidated at _floor
+        self._clock = 0
+        self._invalidated = OrderedDict()   # key -> tick, oldest first
+        self._floor = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self):
+        """Take before a database read, pass to put() afterwards"""
+        return self._clock
+
+    def _stale(self, key, generation):
+        """Was key invalidated after generation was taken? (lock held)"""
+        return generation is not None and \
+            self._invalidated.get(key, self._floor) > generation
+
+    def _mark_invalidated(self, key):
+        self._clock += 1
+        self._invalidated[key] = self._clock
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.max_size:
+            _, tick = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, tick)
+
+    def _evicted(self, key, value):
+        """Hook: an entry left by LRU eviction or expiry (lock held)"""
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                self._evicted(key, value)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """
+        Store a value. If generation is given and key was invalidated since
+        it was taken, the value may be stale and is not stored.
+        """
+        with self._lock:
+            if self._stale(key, generation):
+                return False
+            self._store(key, value)
+            return True
+
+    def _store(self, key, value):
+        """Insert and evict down to max_size (lock held)"""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            evicted_key, (_, evicted) = self._data.popitem(last=False)
+            self._evicted(evicted_key, evicted)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._mark_invalidated(key)
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """
+        Drop every entry for which predicate(key, value) is true. Loads in
+        flight for keys not yet cached can't be matched, so every put with
+        an older generation is refused.
+        """
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._invalidated.clear()
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._invalidated.clear()
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+class EntityCache(LRUCache):
+    """
+    Read-through cache for Book and User objects.
+    Callers get copies, so mutating a returned model never changes the cache.
+    A user is cached under its id and its username; both entries are guarded
+    by the id's generation, and a user_id -> username map lets
+    invalidate_user drop them without scanning the cache.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        super().__init__(max_size, ttl)
+        self._usernames = {}   # user_id -> username of its cached ('username', ...) entry
+
+    def get_book(self, isbn):
+        book = self.get(('book', isbn))
+        return copy.copy(book) if book is not None else None
+
+    def put_book(self, book, generation=None):
+        return self.put(('book', book.isbn), copy.copy(book), generation)
+
+    def invalidate_book(self, isbn):
+        self.invalidate(('book', isbn))
+
+    def invalidate_books(self):
+        self.invalidate_where(lambda key, value: key[0] == 'book')
+
+    def get_user(self, user_id):
+        user = self.get(('user', user_id))
+        return copy.copy(user) if user is not None else None
+
+    def get_user_by_username(self, username):
+        user = self.get(('username', username))
+        return copy.copy(user) if user is not None else None
+
+    def put_user(self, user, generation=None):
+        """Cache a user under both its id and its username"""
+        cached = copy.copy(user)
+        with self._lock:
+            if self._stale(('user', user.user_id), generation):
+                return False
+            self._store(('user', user.user_id), cached)
+            self._store(('username', user.username), cached)
+            self._usernames[user.user_id] = user.username
+            return True
+
+    def invalidate_user(self, user_id):
+        """Drop a user's entries, whichever key they were cached under"""
+        with self._lock:
+            username = self._usernames.pop(user_id, None)
+        self.invalidate(('user', user_id))
+        if username is not None:
+            self.invalidate(('username', username))
+
+    def _evicted(self, key, value):
+        if key[0] == 'username' and self._usernames.get(value.user_id) == key[1]:
+            del self._usernames[value.user_id]
+
+    def clear(self):
+        with self._lock:
+            self._usernames.clear()
+        super().clear()
+
+# Test function
+
+
+def test_cache():
+    print("🧪 Testing Entity Cache...")
+    from models import Book
+
+    cache = EntityCache(max_size=2, ttl=60)
+    cache.put_book(Book("1", "Clean Code", "Robert C. Martin", 2008))
+    print(f"✅ Hit: {cache.get_book('1').title}")
+    print(f"✅ Miss: {cache.get_book('2')}")
+
+    generation = cache.generation()
+    cache.invalidate_book("1")
+    stored = cache.put_book(Book("1", "Stale", "Nobody", 2000), generation)
+    print(f"✅ Stale put rejected: {not stored}")
+    generation = cache.generation()
+    cache.invalidate_book("9")
+    stored = cache.put_book(Book("1", "Clean Code", "Robert C. Martin", 2008), generation)
+    print(f"✅ Another book's invalidation doesn't block it: {stored}")
+
+    for isbn in ("2", "3", "4"):
+        cache.put_book(Book(isbn, "Book " + isbn, "Author", 2020))
+    print(f"✅ Stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_cache()
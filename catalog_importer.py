@@ -0,0 +1,266 @@
+# catalog_importer.py
+import csv
+import json
+import os
+import time
+from models import Book
+
+
+# ============= SOURCE READERS =============
+# Each reader yields (position, record_dict) one record at a time, so memory
+# use does not depend on the size of the file.
+
+def read_csv(path):
+    """Yield rows of a CSV file with a header line"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, {k.strip().lower(): v for k, v in row.items() if k}
+
+
+def read_jsonl(path):
+    """Yield one JSON object per line"""
+    with open(path, encoding='utf-8') as f:
+        for line_num, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {'_error': f"Invalid JSON: {e}"}
+            else:
+                if not isinstance(record, dict):
+                    record = {'_error': f"Expected a JSON object, got {type(record).__name__}"}
+            yield line_num, record
+
+
+# MARC 21 tags we map onto Book fields: tag -> (field, subfields)
+MARC_FIELDS = {
+    '020': ('isbn', 'a'),
+    '245': ('title', 'ab'),
+    '100': ('author', 'a'),
+    '110': ('author', 'a'),
+    '260': ('publication_year', 'c'),
+    '264': ('publication_year', 'c'),
+    '650': ('genre', 'a'),
+    '520': ('description', 'a'),
+}
+
+
+def _parse_marc_record(data):
+    """Decode one ISO 2709 record into a flat dict of Book fields"""
+    base_address = int(data[12:17])
+    directory = data[24:base_address - 1]
+    record = {}
+    for i in range(0, len(directory) - 11, 12):
+        tag = directory[i:i + 3].decode('ascii')
+        length = int(directory[i + 3:i + 7])
+        start = int(directory[i + 7:i + 12])
+        if tag not in MARC_FIELDS:
+            continue
+        field, wanted = MARC_FIELDS[tag]
+        if field in record:
+            continue  # First occurrence wins (e.g. first ISBN, first subject)
+        raw = data[base_address + start:base_address + start + length - 1]
+        parts = []
+        for subfield in raw.split(b'\x1f')[1:]:
+            if subfield[:1].decode('ascii', 'replace') in wanted:
+                parts.append(subfield[1:].decode('utf-8', 'replace').strip())
+        value = " ".join(parts).strip(" /:;,.")
+        if field == 'isbn':
+            value = value.split(" ")[0]
+        elif field == 'publication_year':
+            digits = "".join(c for c in value if c.isdigit())
+            value = digits[:4]
+        if value:
+            record[field] = value
+    return record
+
+
+def read_marc(path):
+    """Yield records of a binary MARC 21 (ISO 2709) file"""
+    with open(path, 'rb') as f:
+        position = 0
+        while True:
+            header = f.read(5)
+            if len(header) < 5:
+                break
+            position += 1
+            try:
+                length = int(header)
+                data = header + f.read(length - 5)
+                yield position, _parse_marc_record(data)
+            except (ValueError, IndexError) as e:
+                yield position, {'_error': f"Invalid MARC record: {e}"}
+                break  # Lost the record boundaries, can't continue safely
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+    'marc': read_marc,
+}
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.mrc': 'marc',
+    '.marc': 'marc',
+}
+
+
+def record_to_book(record):
+    """Build a Book from a source record, raising ValueError if it is unusable"""
+    if '_error' in record:
+        raise ValueError(record['_error'])
+
+    isbn = str(record.get('isbn') or '').strip()
+    title = str(record.get('title') or '').strip()
+    author = str(record.get('author') or '').strip()
+    if not isbn:
+        raise ValueError("Missing ISBN")
+    if not title:
+        raise ValueError("Missing title")
+    if not author:
+        raise ValueError("Missing author")
+
+    year = record.get('publication_year')
+    year = int(year) if year not in (None, '') else None
+    copies = record.get('total_copies')
+    copies = int(copies) if copies not in (None, '') else 1
+    if copies < 1:
+        raise ValueError("total_copies must be at least 1")
+    price = record.get('price')
+    price = float(price) if price not in (None, '') else 0.00
+
+    return Book(isbn, title, author, year, copies,
+                record.get('genre') or None, price,
+                record.get('description') or "")
+
+
+class CatalogImporter:
+    """
+    Streams a catalog export into the books table.
+    - Rows are inserted in executemany batches, one commit per batch
+    - If a batch fails, its rows are retried one at a time, so only the bad
+      rows are rejected (with their line or record number)
+    - Existing ISBNs are updated in place (available copies follow total copies)
+    """
+
+    UPSERT_QUERY = """INSERT INTO books
+                      (isbn, title, author, publication_year, total_copies,
+                       available_copies, genre, price, description, added_by)
+                      VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                      ON DUPLICATE KEY UPDATE
+                       available_copies = CASE
+                           WHEN available_copies + VALUES(total_copies) - total_copies < 0 THEN 0
+                           ELSE available_copies + VALUES(total_copies) - total_copies END,
+                       total_copies = VALUES(total_copies),
+                       title = VALUES(title),
+                       author = VALUES(author),
+                       publication_year = VALUES(publication_year),
+                       genre = VALUES(genre),
+                       price = VALUES(price),
+                       description = VALUES(description)"""
+
+    def __init__(self, db_manager, batch_size=1000, added_by=None, max_rejects_kept=100):
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.added_by = added_by
+        self.max_rejects_kept = max_rejects_kept  # Keeps the report bounded too
+
+    def _flush(self, batch, positions, report):
+        """Write one batch in its own transaction, or row by row if it fails"""
+        report['batches'] += 1
+        try:
+            with self.db_manager.transaction() as tx:
+                tx.executemany(self.UPSERT_QUERY, batch)
+            report['imported'] += len(batch)
+            return
+        except Exception:
+            pass  # Some row in it is bad: find out which
+
+        for row, position in zip(batch, positions):
+            try:
+                with self.db_manager.transaction() as tx:
+                    tx.execute(self.UPSERT_QUERY, row)
+                report['imported'] += 1
+            except Exception as e:
+                report['rejected'] += 1
+                self._reject(report, position, str(e))
+
+    def _reject(self, report, position, reason):
+        if len(report['rejects']) < self.max_rejects_kept:
+            report['rejects'].append((position, reason))
+
+    def import_file(self, path, file_format=None, progress_every=0):
+        """
+        Import a CSV, JSONL or MARC file.
+        Returns a report dict with counts, throughput and the first rejected rows.
+        """
+        if file_format is None:
+            file_format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if file_format not in READERS:
+            raise ValueError(f"Unsupported catalog format: {file_format or path}")
+
+        report = {'processed': 0, 'imported': 0, 'rejected': 0, 'batches': 0,
+                  'elapsed_s': 0.0, 'rows_per_sec': 0.0, 'rejects': []}
+        started = time.perf_counter()
+        batch = []
+        positions = []
+
+        for position, record in READERS[file_format](path):
+            report['processed'] += 1
+            try:
+                book = record_to_book(record)
+            except (ValueError, TypeError) as e:
+                report['rejected'] += 1
+                self._reject(report, position, str(e))
+                continue
+
+            batch.append((book.isbn, book.title, book.author, book.publication_year,
+                          book.total_copies, book.available_copies, book.genre,
+                          book.price, book.description, self.added_by))
+            positions.append(position)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, positions, report)
+                batch = []
+                positions = []
+
+            if progress_every and report['processed'] % progress_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"📦 {report['processed']} rows read, "
+                      f"{report['processed'] / elapsed:.0f} rows/s")
+
+        if batch:
+            self._flush(batch, positions, report)
+
+        report['elapsed_s'] = time.perf_counter() - started
+        if report['elapsed_s'] > 0:
+            report['rows_per_sec'] = report['processed'] / report['elapsed_s']
+        return report
+
+# Test function
+
+
+def test_importer(path):
+    """Import a catalog file and print the report"""
+    print(f"🧪 Importing catalog from {path}...")
+
+    from database import DatabaseManager
+    importer = CatalogImporter(DatabaseManager())
+    report = importer.import_file(path, progress_every=10000)
+
+    print(f"✅ Imported {report['imported']} of {report['processed']} rows "
+          f"in {report['elapsed_s']:.1f}s ({report['rows_per_sec']:.0f} rows/s)")
+    if report['rejected']:
+        print(f"⚠️ Rejected {report['rejected']} rows, first few:")
+        for position, reason in report['rejects'][:10]:
+            print(f"   {position}: {reason}")
+
+
+if __name__ == "__main__":
+    import sys
+    test_importer(sys.argv[1])
@@ -7,3 +7,87 @@ DB_CONFIG = {
     'password': 'mim145565',
     'auth_plugin': 'mysql_native_password'
 }
+
+# Storage backend used by DatabaseManager: 'mysql' or 'sqlite' (embedded, no server)
+DB_BACKEND = 'mysql'
+
+SQLITE_CONFIG = {
+    'path': 'library.db'
+}
+
+# Connection pool settings used by DatabaseManager
+POOL_CONFIG = {
+    'pool_size': 10,             # max open connections (idle + in use)
+    'checkout_timeout': 30,      # seconds to wait for a free connection
+    'max_idle_time': 300,        # recycle connections idle longer than this
+    'max_lifetime': 3600,        # recycle connections older than this
+    'validation_interval': 5,    # ping idle connections older than this on checkout
+    'statement_cache_size': 64   # prepared statements kept per connection (0 = off)
+}
+
+# Read replicas. Each entry overrides DB_CONFIG keys, e.g. {'host': 'replica1'};
+# reads go to a replica, writes and a session's reads right after its own
+# writes go to the primary (see database.ReplicaSet)
+REPLICA_CONFIG = {
+    'replicas': [],
+    'max_lag': 2,                # seconds behind the primary before a replica is ejected
+    'sticky_window': 5,          # seconds a session reads from the primary after writing (> max_lag)
+    'check_interval': 1.0        # seconds between replica lag checks
+}
+
+# Password hashing (bcrypt runs on a bounded worker pool, see password_hasher.py)
+AUTH_CONFIG = {
+    'bcrypt_rounds': 12,         # cost factor; older hashes are upgraded on login
+    'hash_workers': 4,           # threads doing bcrypt work
+    'hash_queue_size': 32,       # requests waiting for a worker before new ones are refused
+    'hash_queue_timeout': 2      # seconds to wait for a queue slot
+}
+
+# Login sessions (see session_store.py)
+SESSION_CONFIG = {
+    'secret': None,              # HMAC key for tokens; None = random per process
+    'idle_timeout': 1800,        # seconds of inactivity before a session expires
+    'absolute_timeout': 43200,   # hard cap on a session's age, however active
+    'max_sessions': 10000        # least recently used sessions are evicted beyond this
+}
+
+# Write-behind buffers for low-value updates (last_login, view counts)
+WRITE_BEHIND_CONFIG = {
+    'flush_interval': 2.0,       # seconds between background flushes
+    'max_pending': 500           # distinct keys buffered before an early flush
+}
+
+# Overdue fines (see fine_accrual.py)
+FINE_CONFIG = {
+    'daily_rate': 2.00,          # charged per day overdue
+    'grace_days': 0,             # days after the due date that are not charged
+    'max_fine': None,            # cap per loan (None = uncapped)
+    'batch_size': 10000          # loans per vectorized batch / bulk upsert
+}
+
+# HTTP/JSON service (see service.py)
+SERVICE_CONFIG = {
+    'host': '0.0.0.0',
+    'port': 8080,
+    'workers': 0,                # worker processes (0 = one per CPU core)
+    'pool_size': 4,              # database connections per worker
+    'cache_ttl': 5,              # seconds a worker may serve a book/user another worker changed
+    'search_refresh': 300,       # seconds between each worker's full search index rebuilds
+    'keepalive_timeout': 15,     # idle seconds before a keep-alive connection is closed
+    'graceful_timeout': 30,      # seconds a stopping worker gets to finish in-flight requests
+    'max_body': 1048576          # largest accepted request body, in bytes
+}
+
+# Change events published after each commit (see events.py)
+EVENT_CONFIG = {
+    'log_path': 'library_events.jsonl',   # append-only event log (None = in-process only)
+    'fsync': False,              # fsync every append (durable, slower)
+    'poll_interval': 1.0         # seconds between service workers' reads of the log
+}
+
+# Archiving of old loan history (see archive.py)
+ARCHIVE_CONFIG = {
+    'min_age_days': 365,         # completed loans returned longer ago than this are archived
+    'batch_size': 1000,          # loans moved per transaction (keeps row locks short)
+    'pause': 0.05                # seconds between batches, so live traffic and replicas keep up
+}
@@ -1,114 +1,298 @@
 # crud_manager.py
-from database import DatabaseManager
-from models import Book, User, Admin
+from database import DatabaseManager, encode_cursor, decode_cursor
+from models import Book, RowMapper
+from search_index import SearchIndex, STORED_FIELDS
+from catalog_importer import CatalogImporter
+from events import (BOOK_ADDED, BOOK_DELETED, BOOK_UPDATED, USER_UPDATED, book_payload,
+                    user_changes)
+from inventory import CopyInventory
+from password_hasher import default_hasher
+from session_store import default_session_store
 from datetime import datetime
-# Using bcrypt library
-import bcrypt
 
 
-class CRUDManager:
-    def __init__(self):
-        self.db = DatabaseManager()  # Connect to database
+class Catalog:
+    """
+    What CRUDManager and async_managers.AsyncCRUDManager share: the book and
+    user SQL, and the bookkeeping once a write commits (entity cache, search
+    index, login sessions, events)
+    """
+
+    INSERT_BOOK = """INSERT INTO books 
+                     (isbn, title, author, publication_year, total_copies, 
+                      available_copies, genre, price, description, added_by) 
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+    INSERT_USER = """INSERT INTO users 
+                     (username, password, name, email, phone, role, membership_type, is_active) 
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+    BOOK_QUERY = "SELECT * FROM books WHERE isbn = %s"
+    USER_QUERY = "SELECT * FROM users WHERE user_id = %s"
+    USER_BY_USERNAME_QUERY = "SELECT * FROM users WHERE username = %s"
+    DELETE_BOOK = ("DELETE FROM book_copies WHERE isbn = %s",
+                   "DELETE FROM books WHERE isbn = %s")
+    USER_LOANS_QUERY = "SELECT active_loans FROM users WHERE user_id = %s"
+    DELETE_USER = "DELETE FROM users WHERE user_id = %s"
+
+    @staticmethod
+    def _book_params(book, added_by):
+        return (book.isbn, book.title, book.author, book.publication_year,
+                book.total_copies, book.available_copies, book.genre,
+                book.price, book.description, added_by)
+
+    @staticmethod
+    def _user_params(user, hashed_password):
+        return (user.username, hashed_password, user.name,
+                user.email, user.phone, user.role,
+                user.membership_type, user.is_active)
+
+    @staticmethod
+    def _update_query(table, key, updates, key_value):
+        """(query, params) setting every column in updates on one row"""
+        set_clause = ", ".join([f"{column} = %s" for column in updates.keys()])
+        values = list(updates.values())
+        values.append(key_value)
+        return f"UPDATE {table} SET {set_clause} WHERE {key} = %s", values
+
+    @staticmethod
+    def _books_page_query(cursor, limit):
+        """(query, params) for one page of books ordered by title (keyset pagination)"""
+        query = "SELECT * FROM books"
+        params = []
+        if cursor:
+            last_title, last_isbn = decode_cursor(cursor)
+            query += " WHERE title > %s OR (title = %s AND isbn > %s)"
+            params = [last_title, last_title, last_isbn]
+        query += " ORDER BY title, isbn LIMIT %s"
+        params.append(limit)
+        return query, params
+
+    @staticmethod
+    def _users_page_query(cursor, limit):
+        """(query, params) for one page of users ordered by name (keyset pagination)"""
+        query = "SELECT * FROM users"
+        params = []
+        if cursor:
+            last_name, last_id = decode_cursor(cursor)
+            query += " WHERE name > %s OR (name = %s AND user_id > %s)"
+            params = [last_name, last_name, last_id]
+        query += " ORDER BY name, user_id LIMIT %s"
+        params.append(limit)
+        return query, params
+
+    @staticmethod
+    def _search_query(title, author, genre, available_only, text):
+        """(query, params) for search_books without a search index"""
+        query = "SELECT * FROM books WHERE 1=1"
+        params = []
+
+        if text:
+            query += " AND (title LIKE %s OR author LIKE %s OR genre LIKE %s OR description LIKE %s)"
+            params.extend([f"%{text}%"] * 4)
+        if title:
+            query += " AND title LIKE %s"
+            params.append(f"%{title}%")
+        if author:
+            query += " AND author LIKE %s"
+            params.append(f"%{author}%")
+        if genre:
+            query += " AND genre = %s"
+            params.append(genre)
+        if available_only:
+            query += " AND available_copies > 0"
+
+        query += " ORDER BY title"
+        return query, params
+
+    def _indexed_search(self, title, author, genre, available_only, text):
+        mapper = RowMapper.for_columns(STORED_FIELDS, by_name=True)
+        return mapper.books(self.search_index.search(text, title, author, genre, available_only))
+
+    def _book_added(self, book):
+        """Bookkeeping after add_book commits"""
+        if self.search_index is not None:
+            self.search_index.add_book(book)
+        if self.event_bus is not None:
+            self.event_bus.publish(BOOK_ADDED, isbn=book.isbn, book=book_payload(book))
+
+    def _book_updated(self, isbn, updates, result):
+        """Bookkeeping after update_book (result is None if the UPDATE failed)"""
+        if self.cache is not None:
+            self.cache.invalidate_book(isbn)
+        if result is not None and self.search_index is not None:
+            self.search_index.update_book(isbn, **updates)
+        if result is not None and self.event_bus is not None:
+            self.event_bus.publish(BOOK_UPDATED, isbn=isbn, changes=updates)
+
+    def _book_deleted(self, isbn):
+        if self.cache is not None:
+            self.cache.invalidate_book(isbn)
+        if self.search_index is not None:
+            self.search_index.remove_book(isbn)
+        if self.event_bus is not None:
+            self.event_bus.publish(BOOK_DELETED, isbn=isbn)
+
+    def _user_updated(self, user_id, updates, result):
+        """Bookkeeping after update_user (result is None if the UPDATE failed)"""
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
+        if result is not None:
+            # Deactivation or a credential/role change ends the user's sessions;
+            # anything else just refreshes what the sessions hold
+            if ('is_active' in updates and not updates['is_active']) or \
+                    set(updates) & {'password', 'role', 'username'}:
+                self.session_store.revoke_user(user_id)
+            else:
+                self.session_store.update_user(user_id, **updates)
+            if self.event_bus is not None:
+                self.event_bus.publish(USER_UPDATED, user_id=user_id, **user_changes(updates))
+
+    def _user_deleted(self, user_id):
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
+        self.session_store.revoke_user(user_id)
+
+
+class CRUDManager(Catalog):
+    def __init__(self, db_manager=None, search_index=None, cache=None, session_store=None,
+                 view_counts=None, inventory=None, event_bus=None):
+        # Share the caller's DatabaseManager (and its connection pool) if given
+        self.db = db_manager or DatabaseManager()
+        # Optional in-memory SearchIndex; kept in step with book writes below
+        self.search_index = search_index
+        # Optional EntityCache for get_book/get_user lookups, invalidated on writes
+        self.cache = cache
+        # Login sessions to revoke or refresh when an account changes
+        self.session_store = session_store if session_store is not None else default_session_store()
+        # Optional WriteBehindBuffer (write_behind.view_count_buffer) counting get_book views
+        self.view_counts = view_counts
+        # Physical copies behind books.total_copies / available_copies
+        self.inventory = inventory or CopyInventory(self.db)
+        # Optional EventBus told about every committed book/user change
+        self.event_bus = event_bus
 
     # ============= BOOK OPERATIONS =============
 
     def add_book(self, book, added_by=None):
         """Add a new book to database"""
-        query = """INSERT INTO books 
-                   (isbn, title, author, publication_year, total_copies, 
-                    available_copies, genre, price, description, added_by) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        params = (book.isbn, book.title, book.author, book.publication_year,
-                  book.total_copies, book.available_copies, book.genre,
-                  book.price, book.description, added_by)
-        return self.db.execute_query(query, params)
+        result = self.db.execute_query(self.INSERT_BOOK, self._book_params(book, added_by))
+        if result is not None:
+            self.inventory.sync_copies([book.isbn])
+            self._book_added(book)
+        return result
+
+    def import_books(self, path, file_format=None, batch_size=1000, added_by=None):
+        """Bulk import/upsert books from a CSV, JSONL or MARC file (streamed)"""
+        importer = CatalogImporter(self.db, batch_size, added_by)
+        report = importer.import_file(path, file_format)
+        if report['imported']:
+            self.inventory.sync_copies()
+            # Rows were upserted behind the index's and cache's back
+            if self.cache is not None:
+                self.cache.invalidate_books()
+            if self.search_index is not None:
+                self.build_search_index()
+        return report
 
     def get_book(self, isbn):
         """Get a book by ISBN"""
-        query = "SELECT * FROM books WHERE isbn = %s"
-        result = self.db.execute_query(query, (isbn,), fetch=True)
-
-        if result and len(result) > 0:
-            data = result[0]
-            book = Book(data['isbn'], data['title'], data['author'],
-                        data['publication_year'], data['total_copies'],
-                        data.get('genre'), data.get('price', 0.00),
-                        data.get('description', ''))
-            book.available_copies = data['available_copies']
+        if self.view_counts is not None:
+            self.view_counts.add(isbn, 1)
+        if self.cache is not None:
+            book = self.cache.get_book(isbn)
+            if book is not None:
+                return book
+            generation = self.cache.generation()
+
+        columns, rows = self.db.fetch_rows(self.BOOK_QUERY, (isbn,))
+
+        if rows:
+            book = RowMapper.for_columns(columns).book(rows[0])
+            if self.cache is not None:
+                self.cache.put_book(book, generation)
             return book
         return None
 
     def get_all_books(self):
         """Get all books from database"""
         query = "SELECT * FROM books ORDER BY title"
-        results = self.db.execute_query(query, fetch=True)
-
-        books = []
-        for data in results:
-            book = Book(data['isbn'], data['title'], data['author'],
-                        data['publication_year'], data['total_copies'],
-                        data.get('genre'), data.get('price', 0.00),
-                        data.get('description', ''))
-            book.available_copies = data['available_copies']
-            books.append(book)
-        return books
+        columns, rows = self.db.fetch_rows(query)
+        return RowMapper.for_columns(columns).books(rows)
+
+    def get_books_page(self, cursor=None, limit=50):
+        """
+        One page of books ordered by title (keyset pagination).
+        Returns (books, next_cursor); next_cursor is None on the last page.
+        """
+        query, params = self._books_page_query(cursor, limit)
+        columns, rows = self.db.fetch_rows(query, params)
+        books = RowMapper.for_columns(columns).books(rows)
+        next_cursor = None
+        if len(books) == limit:
+            next_cursor = encode_cursor((books[-1].title, books[-1].isbn))
+        return books, next_cursor
+
+    def iter_books(self, page_size=500):
+        """Yield every book ordered by title, one page in memory at a time"""
+        cursor = None
+        while True:
+            books, cursor = self.get_books_page(cursor, page_size)
+            yield from books
+            if cursor is None:
+                break
 
     def update_book(self, isbn, **updates):
         """Update book information"""
+        # available_copies is derived from book_copies, not set directly
+        updates.pop('available_copies', None)
         if not updates:
             return False
 
-        set_clause = ", ".join([f"{key} = %s" for key in updates.keys()])
-        query = f"UPDATE books SET {set_clause} WHERE isbn = %s"
-
-        values = list(updates.values())
-        values.append(isbn)
-
-        return self.db.execute_query(query, values)
+        query, values = self._update_query('books', 'isbn', updates, isbn)
+        result = self.db.execute_query(query, values)
+        if result is not None and 'total_copies' in updates:
+            # Add or withdraw copies to match the new total
+            available = self.inventory.sync_copies([isbn])
+            if isbn in available:
+                updates['available_copies'] = available[isbn]
+        self._book_updated(isbn, updates, result)
+        return result
 
     def delete_book(self, isbn):
         """Delete a book from database"""
         # Check if book is currently borrowed
-        check_query = """SELECT COUNT(*) as active_borrows FROM transactions 
-                        WHERE book_isbn = %s AND return_date IS NULL"""
-        result = self.db.execute_query(check_query, (isbn,), fetch=True)
-
-        if result and result[0]['active_borrows'] > 0:
+        if self.inventory.on_loan(isbn) > 0:
             return False, "Cannot delete: Book is currently borrowed"
 
-        delete_query = "DELETE FROM books WHERE isbn = %s"
-        self.db.execute_query(delete_query, (isbn,))
+        try:
+            with self.db.transaction() as tx:
+                for statement in self.DELETE_BOOK:
+                    tx.execute(statement, (isbn,))
+        except Exception as e:
+            return False, f"Error deleting book: {str(e)}"
+        self._book_deleted(isbn)
         return True, "Book deleted successfully"
 
-    def search_books(self, title=None, author=None, genre=None, available_only=False):
-        """Search books with filters"""
-        query = "SELECT * FROM books WHERE 1=1"
-        params = []
-
-        if title:
-            query += " AND title LIKE %s"
-            params.append(f"%{title}%")
-        if author:
-            query += " AND author LIKE %s"
-            params.append(f"%{author}%")
-        if genre:
-            query += " AND genre = %s"
-            params.append(genre)
-        if available_only:
-            query += " AND available_copies > 0"
-
-        query += " ORDER BY title"
-        results = self.db.execute_query(query, params, fetch=True)
-
-        books = []
-        for data in results:
-            book = Book(data['isbn'], data['title'], data['author'],
-                        data['publication_year'], data['total_copies'],
-                        data.get('genre'), data.get('price', 0.00),
-                        data.get('description', ''))
-            book.available_copies = data['available_copies']
-            books.append(book)
-        return books
+    def build_search_index(self, search_index=None):
+        """Load every book into the search index (call once at startup)"""
+        if search_index is not None:
+            self.search_index = search_index
+        elif self.search_index is None:
+            self.search_index = SearchIndex()
+        self.search_index.build(self.get_all_books())
+        return self.search_index
+
+    def search_books(self, title=None, author=None, genre=None, available_only=False, text=None):
+        """
+        Search books with filters.
+        - text: free-text query over title, author, genre and description
+        Served by the search index (ranked by relevance) when one is loaded.
+        """
+        if self.search_index is not None:
+            return self._indexed_search(title, author, genre, available_only, text)
+
+        query, params = self._search_query(title, author, genre, available_only, text)
+        columns, rows = self.db.fetch_rows(query, params)
+        return RowMapper.for_columns(columns).books(rows)
 
     # ============= USER OPERATIONS =============
 
@@ -117,100 +301,94 @@ class CRUDManager:
         """Add a new user with SECURE password hashing"""
         # 1. Hash the password
         hashed_password = self._hash_password(user.password)
-        query = """INSERT INTO users 
-                   (username, password, name, email, phone, role, membership_type, is_active) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-        params = (user.username, hashed_password, user.name,
-                  user.email, user.phone, user.role,
-                  user.membership_type, user.is_active)
-        return self.db.execute_query(query, params)
+        return self.db.execute_query(self.INSERT_USER, self._user_params(user, hashed_password))
 
     def _hash_password(self, plain_password):
-        """Hash a password for security"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(plain_password.encode(), salt)
-        return hashed.decode()  # Convert bytes to string for database
+        """Hash a password for security (bcrypt on the shared hashing pool)"""
+        return default_hasher().hash(plain_password)
 
     def get_user(self, user_id):
         """Get user by ID"""
-        query = "SELECT * FROM users WHERE user_id = %s"
-        result = self.db.execute_query(query, (user_id,), fetch=True)
-
-        if result and len(result) > 0:
-            data = result[0]
-            if data['role'] == 'admin':
-                return Admin(data['user_id'], data['username'], data['name'],
-                             data['email'], data['phone'],
-                             data.get('department', 'General'),
-                             data['is_active'])
-            else:
-                return User(data['user_id'], data['username'], data['name'],
-                            data['email'], data['phone'], data['role'],
-                            data['membership_type'], data['is_active'])
+        if self.cache is not None:
+            user = self.cache.get_user(user_id)
+            if user is not None:
+                return user
+            generation = self.cache.generation()
+
+        columns, rows = self.db.fetch_rows(self.USER_QUERY, (user_id,))
+
+        if rows:
+            user = RowMapper.for_columns(columns).user(rows[0])
+            if self.cache is not None:
+                self.cache.put_user(user, generation)
+            return user
         return None
 
     def get_user_by_username(self, username):
         """Get user by username (for login)"""
-        query = "SELECT * FROM users WHERE username = %s"
-        result = self.db.execute_query(query, (username,), fetch=True)
-
-        if result and len(result) > 0:
-            data = result[0]
-            if data['role'] == 'admin':
-                return Admin(data['user_id'], data['username'], data['name'],
-                             data['email'], data['phone'],
-                             data.get('department', 'General'),
-                             data['is_active'])
-            else:
-                return User(data['user_id'], data['username'], data['name'],
-                            data['email'], data['phone'], data['role'],
-                            data['membership_type'], data['is_active'])
+        if self.cache is not None:
+            user = self.cache.get_user_by_username(username)
+            if user is not None:
+                return user
+            generation = self.cache.generation()
+
+        columns, rows = self.db.fetch_rows(self.USER_BY_USERNAME_QUERY, (username,))
+
+        if rows:
+            user = RowMapper.for_columns(columns).user(rows[0])
+            if self.cache is not None:
+                self.cache.put_user(user, generation)
+            return user
         return None
 
     def get_all_users(self):
         """Get all users"""
         query = "SELECT * FROM users ORDER BY name"
-        results = self.db.execute_query(query, fetch=True)
-
-        users = []
-        for data in results:
-            if data['role'] == 'admin':
-                user = Admin(data['user_id'], data['username'], data['name'],
-                             data['email'], data['phone'],
-                             data.get('department', 'General'),
-                             data['is_active'])
-            else:
-                user = User(data['user_id'], data['username'], data['name'],
-                            data['email'], data['phone'], data['role'],
-                            data['membership_type'], data['is_active'])
-            users.append(user)
-        return users
+        columns, rows = self.db.fetch_rows(query)
+        return RowMapper.for_columns(columns).users(rows)
+
+    def get_users_page(self, cursor=None, limit=50):
+        """
+        One page of users ordered by name (keyset pagination).
+        Returns (users, next_cursor); next_cursor is None on the last page.
+        """
+        query, params = self._users_page_query(cursor, limit)
+        columns, rows = self.db.fetch_rows(query, params)
+        users = RowMapper.for_columns(columns).users(rows)
+        next_cursor = None
+        if len(users) == limit:
+            next_cursor = encode_cursor((users[-1].name, users[-1].user_id))
+        return users, next_cursor
+
+    def iter_users(self, page_size=500):
+        """Yield every user ordered by name, one page in memory at a time"""
+        cursor = None
+        while True:
+            users, cursor = self.get_users_page(cursor, page_size)
+            yield from users
+            if cursor is None:
+                break
 
     def update_user(self, user_id, **updates):
         """Update user information"""
         if not updates:
             return False
 
-        set_clause = ", ".join([f"{key} = %s" for key in updates.keys()])
-        query = f"UPDATE users SET {set_clause} WHERE user_id = %s"
-
-        values = list(updates.values())
-        values.append(user_id)
-
-        return self.db.execute_query(query, values)
+        query, values = self._update_query('users', 'user_id', updates, user_id)
+        result = self.db.execute_query(query, values)
+        self._user_updated(user_id, updates, result)
+        return result
 
     def delete_user(self, user_id):
         """Delete a user"""
         # Check if user has active borrowings
-        check_query = """SELECT COUNT(*) as active_borrows FROM transactions 
-                        WHERE user_id = %s AND return_date IS NULL"""
-        result = self.db.execute_query(check_query, (user_id,), fetch=True)
+        result = self.db.execute_query(self.USER_LOANS_QUERY, (user_id,), fetch=True)
 
-        if result and result[0]['active_borrows'] > 0:
+        if result and result[0]['active_loans'] > 0:
             return False, "Cannot delete: User has active book borrowings"
 
-        delete_query = "DELETE FROM users WHERE user_id = %s"
-        self.db.execute_query(delete_query, (user_id,))
+        self.db.execute_query(self.DELETE_USER, (user_id,))
+        self._user_deleted(user_id)
         return True, "User deleted successfully"
 
 # Test function
@@ -1,34 +1,604 @@
 # database.py
-import mysql.connector
-from mysql.connector import Error
-from config import DB_CONFIG
+import base64
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from config import DB_CONFIG, POOL_CONFIG, REPLICA_CONFIG
+from db_backends import MySQLBackend, create_backend
 
 
 class DatabaseConnection:
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
         self.connection = None
 
     def connect(self):
-        """Establish connection to MySQL database"""
+        """Establish a single connection to the configured database"""
         try:
-            self.connection = mysql.connector.connect(**DB_CONFIG)
+            self.connection = self.backend.connect()
             print("✅ Database connection established successfully!")
             return self.connection
-        except Error as e:
+        except self.backend.errors as e:
             print(f"❌ Error connecting to database: {e}")
             return None
 
     def disconnect(self):
         """Close the database connection"""
-        if self.connection and self.connection.is_connected():
+        if self.connection:
             self.connection.close()
+            self.connection = None
             print("✅ Database connection closed.")
 
 
-class DatabaseManager:
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes free before the checkout timeout"""
+
+
+class StatementCacheStats:
+    """Hit/miss/eviction counters shared by every connection's StatementCache"""
+
     def __init__(self):
-        self.db = DatabaseConnection()
-        self.connection = self.db.connect()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def count(self, hit=False, miss=False, evicted=False):
+        with self._lock:
+            self.hits += hit
+            self.misses += miss
+            self.evictions += evicted
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': (self.hits / lookups) if lookups else 0.0}
+
+
+class StatementCache:
+    """
+    LRU of prepared cursors for one connection, keyed by SQL text.
+    Re-running a cached statement skips the server-side parse/prepare;
+    evicted cursors are closed, which deallocates the server statement.
+    Only used by the thread that has the connection checked out.
+    """
+
+    def __init__(self, backend, raw, max_size, stats):
+        self.backend = backend
+        self.raw = raw
+        self.max_size = max_size
+        self.stats = stats
+        self._cursors = OrderedDict()
+
+    def cursor_for(self, sql):
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            self.stats.count(hit=True)
+            return cursor
+
+        cursor = self.backend.prepared_cursor(self.raw)
+        self._cursors[sql] = cursor
+        evicted = len(self._cursors) > self.max_size
+        if evicted:
+            _, oldest = self._cursors.popitem(last=False)
+            self._close(oldest)
+        self.stats.count(miss=True, evicted=evicted)
+        return cursor
+
+    def discard(self, sql):
+        """Drop a cursor whose last execution failed"""
+        cursor = self._cursors.pop(sql, None)
+        if cursor is not None:
+            self._close(cursor)
+
+    def close(self):
+        while self._cursors:
+            self._close(self._cursors.popitem()[1])
+
+    def _close(self, cursor):
+        try:
+            cursor.close()
+        except Exception:
+            pass  # Connection already gone
+
+
+class PooledConnection:
+    """A raw driver connection plus the timestamps the pool uses to recycle it"""
+
+    def __init__(self, raw, statements=None):
+        self.raw = raw
+        self.statements = statements  # StatementCache, or None when disabled
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def close(self):
+        if self.statements is not None:
+            self.statements.close()
+        try:
+            self.raw.close()
+        except Exception:
+            pass  # Already broken, nothing left to close
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections (any backend).
+    - Connections are opened lazily, up to pool_size
+    - Checkout blocks (up to checkout_timeout) when every connection is in use
+    - Idle connections are pinged before reuse and recycled when stale
+    """
+
+    def __init__(self, backend, pool_size=10, checkout_timeout=30,
+                 max_idle_time=300, max_lifetime=3600, validation_interval=5,
+                 statement_cache_size=64):
+        self.backend = backend
+        self.statement_cache_size = statement_cache_size
+        self.statement_stats = StatementCacheStats()
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_time = max_idle_time
+        self.max_lifetime = max_lifetime
+        self.validation_interval = validation_interval
+
+        self._idle = deque()              # Free connections, most recent on the right
+        self._open_count = 0              # Idle + checked out
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Stats
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+
+    def _open(self):
+        """Open a new connection (autocommit on, transactions are explicit)"""
+        raw = self.backend.connect()
+        statements = None
+        if self.statement_cache_size > 0:
+            statements = StatementCache(self.backend, raw, self.statement_cache_size,
+                                        self.statement_stats)
+        return PooledConnection(raw, statements)
+
+    def _is_stale(self, conn, now):
+        return (now - conn.last_used > self.max_idle_time or
+                now - conn.created_at > self.max_lifetime)
+
+    def _is_alive(self, conn, now):
+        """Ping connections that sat idle long enough to have been dropped"""
+        if now - conn.last_used < self.validation_interval:
+            return True
+        try:
+            self.backend.ping(conn.raw)
+            return True
+        except self.backend.errors:
+            return False
+
+    def get_connection(self, timeout=None):
+        """Check out a live connection, waiting if the pool is at capacity"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        conn = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolExhaustedError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()   # LIFO keeps warm connections in use
+                    break
+                if self._open_count < self.pool_size:
+                    self._open_count += 1     # Reserve a slot, open it outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        f"No free connection after {timeout}s (pool size {self.pool_size})")
+                waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.monotonic() - started
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+
+        # Validate a reused connection, replace it if stale or dead
+        if conn is not None:
+            now = time.monotonic()
+            if self._is_stale(conn, now) or not self._is_alive(conn, now):
+                conn.close()
+                conn = None
+                with self._cond:
+                    self._recycled += 1
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except self.backend.errors:
+                with self._cond:
+                    self._open_count -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._created += 1
+
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool (or close it if it is broken)"""
+        with self._cond:
+            if discard or self._closed:
+                self._open_count -= 1
+                conn.close()
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the duration of a with-block"""
+        conn = self.get_connection(timeout)
+        discard = False
+        try:
+            yield conn
+        except self.backend.connection_errors:
+            discard = True  # Connection-level failure, don't hand it out again
+            raise
+        finally:
+            self.release(conn, discard)
+
+    def in_use(self):
+        """Connections currently checked out"""
+        with self._cond:
+            return self._open_count - len(self._idle)
+
+    def stats(self):
+        """Snapshot of pool size and checkout wait times"""
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'open': self._open_count,
+                'idle': len(self._idle),
+                'in_use': self._open_count - len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': (self._total_wait / self._waits * 1000) if self._waits else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+                'created': self._created,
+                'recycled': self._recycled,
+                'statement_cache': self.statement_stats.as_dict()
+            }
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed on release"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._open_count -= 1
+            self._cond.notify_all()
+
+
+# Statements a replica can answer: plain reads, not locking ones
+_READ_STATEMENT = re.compile(r"^\s*(SELECT|WITH)\b", re.I)
+_LOCKING_READ = re.compile(r"\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.I)
+
+
+@lru_cache(maxsize=1024)
+def is_read_only(query):
+    return bool(_READ_STATEMENT.match(query)) and not _LOCKING_READ.search(query)
+
+
+# Session key for read-your-writes, set by DatabaseManager.read_session();
+# without one, each thread is its own session
+_read_session = ContextVar('read_session', default=None)
+
+
+class Replica:
+    """One read replica: its backend, its own pool and its last health check"""
+
+    def __init__(self, name, backend, pool):
+        self.name = name
+        self.backend = backend
+        self.pool = pool
+        self.healthy = True
+        self.lag = 0.0
+        self.last_error = None
+        self.reads = 0
+        self.ejections = 0
+
+
+class ReplicaSet:
+    """
+    Routes reads across read replicas.
+    - Load balancing: the healthy replica with the fewest connections in use
+      (round robin among ties)
+    - Lag-aware: a background check ejects replicas more than max_lag seconds
+      behind, or unreachable, and brings them back once they catch up
+    - Read-your-writes: a session that wrote in the last sticky_window
+      seconds reads from the primary (keep sticky_window above max_lag)
+    """
+
+    MAX_SESSIONS = 10000  # Remembered writers before expired ones are pruned
+
+    def __init__(self, replicas, max_lag=2, sticky_window=5, check_interval=1.0):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.sticky_window = sticky_window
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._last_write = {}        # session key -> monotonic time of its last write
+        self._turn = 0
+        self._primary_reads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, name="replica-monitor",
+                                        daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def session_key():
+        key = _read_session.get()
+        return key if key is not None else threading.get_ident()
+
+    def note_write(self):
+        """The current session wrote: keep its reads on the primary for a while"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[self.session_key()] = now
+            if len(self._last_write) > self.MAX_SESSIONS:
+                cutoff = now - self.sticky_window
+                self._last_write = {key: wrote for key, wrote in self._last_write.items()
+                                    if wrote > cutoff}
+
+    def choose(self):
+        """Replica for the current session's next read, or None for the primary"""
+        key = self.session_key()
+        with self._lock:
+            wrote = self._last_write.get(key)
+            if wrote is not None and time.monotonic() - wrote < self.sticky_window:
+                self._primary_reads += 1
+                return None
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                self._primary_reads += 1
+                return None
+            self._turn += 1
+            start = self._turn % len(healthy)
+            healthy = healthy[start:] + healthy[:start]
+        replica = min(healthy, key=lambda replica: replica.pool.in_use())
+        with self._lock:
+            replica.reads += 1
+        return replica
+
+    def eject(self, replica, error):
+        """Stop routing to a replica until the next check finds it healthy"""
+        with self._lock:
+            was_healthy = replica.healthy
+            replica.healthy = False
+            replica.last_error = str(error)
+            if was_healthy:
+                replica.ejections += 1
+        if was_healthy:
+            print(f"❌ Replica {replica.name} ejected: {error}")
+
+    def check(self):
+        """Measure every replica's lag, ejecting or restoring it"""
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection(timeout=self.check_interval) as conn:
+                    lag = replica.backend.replication_lag(conn.raw)
+                error = "replication stopped" if lag is None else None
+            except replica.backend.errors + (PoolExhaustedError,) as e:
+                lag, error = None, e
+            if lag is not None and lag > self.max_lag:
+                error = f"{lag:.1f}s behind the primary (max {self.max_lag}s)"
+            if error is not None:
+                self.eject(replica, error)
+                continue
+            with self._lock:
+                restored = not replica.healthy
+                replica.healthy = True
+                replica.lag = lag
+                replica.last_error = None
+            if restored:
+                print(f"✅ Replica {replica.name} back in rotation")
+
+    def _monitor(self):
+        while True:
+            self.check()
+            if self._stop.wait(self.check_interval):
+                return
+
+    def stats(self):
+        with self._lock:
+            return {
+                'primary_reads': self._primary_reads,
+                'replicas': [{'name': replica.name, 'healthy': replica.healthy,
+                              'lag': replica.lag, 'reads': replica.reads,
+                              'ejections': replica.ejections,
+                              'last_error': replica.last_error}
+                             for replica in self.replicas]
+            }
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        for replica in self.replicas:
+            replica.pool.close()
+
+
+def encode_cursor(values):
+    """Opaque page cursor for keyset pagination (the sort key of the last row)"""
+    raw = json.dumps(list(values), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+
+
+class DatabaseTransaction:
+    """
+    Statements run on one pooled connection and committed together.
+    Obtained from DatabaseManager.transaction(); errors are raised, not printed,
+    so the surrounding with-block can roll everything back.
+    """
+
+    def __init__(self, conn, db_manager):
+        self.conn = conn
+        self.db_manager = db_manager
+        self.backend = db_manager.backend
+        self.rowcount = 0  # Rows matched/affected by the last statement
+
+    def execute(self, query, params=None, fetch=False):
+        """Same contract as DatabaseManager.execute_query, minus the commit"""
+        started = time.perf_counter()
+        error = None
+        try:
+            rows, self.rowcount, last_id, _ = self.db_manager._run(
+                self.conn, query, params, fetch)
+            return rows if fetch else last_id
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.db_manager._record(query, params, started, self.rowcount, error)
+
+    def executemany(self, query, seq_params):
+        """Run one statement for every parameter tuple (batched INSERTs go in one round trip)"""
+        started = time.perf_counter()
+        error = None
+        cursor = self.backend.cursor(self.conn.raw)
+        try:
+            cursor.executemany(self.backend.translate(query), seq_params)
+            self.rowcount = cursor.rowcount
+            return self.rowcount
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            cursor.close()
+            self.db_manager._record(query, None, started, self.rowcount, error)
+
+
+class DatabaseManager:
+    def __init__(self, db_config=None, backend=None, query_stats=None, replicas=None,
+                 replica_options=None, **pool_options):
+        """
+        - db_config: MySQL connection settings (defaults to config.DB_CONFIG)
+        - backend: a db_backends backend, e.g. SQLiteBackend('kiosk.db');
+          defaults to config.DB_BACKEND
+        - query_stats: optional query_stats.QueryStats to record every statement
+        - replicas: read replica backends of the same engine, or dicts of
+          db_config overrides; defaults to config.REPLICA_CONFIG for a
+          backend taken from config
+        - replica_options: max_lag / sticky_window / check_interval overrides
+        """
+        if replicas is None and backend is None and not db_config:
+            replicas = REPLICA_CONFIG['replicas']
+        if backend is None:
+            backend = MySQLBackend(db_config) if db_config else create_backend()
+        self.backend = backend
+        self.errors = backend.errors + (PoolExhaustedError,)
+        self.query_stats = query_stats
+
+        # One shared pool per manager; pass the manager around instead of
+        # creating new ones so every caller draws from the same connections
+        options = dict(POOL_CONFIG)
+        options.update(pool_options)
+        self.pool = ConnectionPool(backend, **options)
+
+        # Reads are spread over replicas (each with its own pool); None
+        # keeps everything on the primary
+        self.replicas = None
+        if replicas:
+            settings = {key: value for key, value in REPLICA_CONFIG.items() if key != 'replicas'}
+            settings.update(replica_options or {})
+            members = []
+            for replica in replicas:
+                if isinstance(replica, dict):
+                    replica = MySQLBackend({**getattr(backend, 'db_config', DB_CONFIG), **replica})
+                members.append(Replica(self._replica_name(replica), replica,
+                                       ConnectionPool(replica, **options)))
+            self.replicas = ReplicaSet(members, **settings)
+
+    @staticmethod
+    def _replica_name(backend):
+        if hasattr(backend, 'path'):
+            return backend.path
+        config = backend.db_config
+        return f"{config.get('host', 'localhost')}:{config.get('port', 3306)}"
+
+    @contextmanager
+    def read_session(self, key):
+        """
+        Treat the block as one patron's session for read-your-writes, e.g. one
+        HTTP request keyed by its session token. Reads right after the
+        session's own writes then come from the primary.
+        """
+        token = _read_session.set(key)
+        try:
+            yield
+        finally:
+            _read_session.reset(token)
+
+    def _routable(self, query):
+        return self.replicas is not None and is_read_only(query)
+
+    def _note_write(self, query=None):
+        if self.replicas is not None and (query is None or not is_read_only(query)):
+            self.replicas.note_write()
+
+    def _checkout_read(self, query):
+        """(replica or None, pool, connection) for a read"""
+        replica = self.replicas.choose() if self._routable(query) else None
+        if replica is not None:
+            try:
+                return replica, replica.pool, replica.pool.get_connection()
+            except PoolExhaustedError:
+                pass  # Busy rather than broken; the primary takes this read
+            except replica.backend.errors as e:
+                self.replicas.eject(replica, e)
+        return None, self.pool, self.pool.get_connection()
+
+    def _read(self, query, params, dictionary=True):
+        """Run a read on a replica when one is usable, else on the primary"""
+        replica, pool, conn = self._checkout_read(query)
+        discard = False
+        try:
+            return self._run(conn, query, params, True, dictionary)
+        except pool.backend.connection_errors as e:
+            discard = True
+            if replica is None:
+                raise
+            self.replicas.eject(replica, e)
+        finally:
+            pool.release(conn, discard)
+        # The replica dropped mid-read: ask the primary instead
+        with self.pool.connection() as conn:
+            return self._run(conn, query, params, True, dictionary)
 
     def execute_query(self, query, params=None, fetch=False):
         """
@@ -36,36 +606,183 @@ class DatabaseManager:
         - query: SQL string  (e.g., "SELECT * FROM users")
         - params: Tuple of parameters for the query (e.g., ("John", "john@email.com"))
         - fetch: If True, returns results. If False, returns last inserted ID ;True for SELECT (get data), False for INSERT/UPDATE/DELETE (change data)
+        A connection is checked out of the pool for this call only.
         """
+        started = time.perf_counter()
+        rows = 0
+        error = None
         try:
-            # Get results as dictionaries
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-
-            if fetch:
-                result = cursor.fetchall()
-                cursor.close()
+            if fetch and self._routable(query):
+                result, rows, _, _ = self._read(query, params)
                 return result
-            else:
-                self.connection.commit()
-                last_id = cursor.lastrowid
-                cursor.close()
-                return last_id
+            with self.pool.connection() as conn:
+                # Get results as dictionaries
+                result, rows, last_id, _ = self._run(conn, query, params, fetch)
+            self._note_write(query)
+            return result if fetch else last_id  # Autocommit already applied it
 
-        except Error as e:
+        except self.errors as e:
+            error = e
             print(f"❌ Database error: {e}")
-            self.connection.rollback()  # Undo changes if error
             return None
+        finally:
+            self._record(query, params, started, rows, error)
+
+    def fetch_rows(self, query, params=None):
+        """
+        Run a SELECT and return (column_names, rows) with rows as plain tuples.
+        Cheaper than dictionary rows; turn them into models with models.RowMapper.
+        """
+        started = time.perf_counter()
+        rows = []
+        error = None
+        try:
+            rows, _, _, columns = self._read(query, params, dictionary=False)
+            return columns, rows
+
+        except self.errors as e:
+            error = e
+            print(f"❌ Database error: {e}")
+            return (), []
+        finally:
+            self._record(query, params, started, len(rows), error)
+
+    def _run(self, conn, query, params, fetch, dictionary=True):
+        """
+        Execute one statement on a checked-out connection, reusing the
+        connection's prepared cursor for this SQL text when the cache is on.
+        Returns (rows or None, rowcount, lastrowid, column_names).
+        """
+        sql = self.backend.translate(query)
+        statements = conn.statements
+        if statements is not None:
+            cursor = statements.cursor_for(sql)
+        else:
+            cursor = self.backend.cursor(conn.raw)
+        try:
+            cursor.execute(sql, params or ())
+            if not fetch:
+                return None, cursor.rowcount, cursor.lastrowid, ()
+            rows = cursor.fetchall()
+            columns = tuple(column[0] for column in cursor.description)
+            if dictionary:
+                rows = [dict(zip(columns, row)) for row in rows]
+            return rows, len(rows), None, columns
+        except Exception:
+            if statements is not None:
+                statements.discard(sql)
+            raise
+        finally:
+            if statements is None:
+                cursor.close()
+
+    def stream_query(self, query, params=None, batch_size=1000, dictionary=True):
+        """
+        Yield rows one by one from an unbuffered (server-side) cursor, so large
+        result sets are never held in memory. Errors are raised, not printed.
+        With dictionary=False rows are tuples in SELECT-list order.
+        The connection stays checked out until the generator is exhausted or closed.
+        """
+        _, pool, conn = self._checkout_read(query)
+        discard = True  # Unread results would poison the connection for the next user
+        started = time.perf_counter()
+        streamed = 0
+        error = None
+        try:
+            cursor = pool.backend.cursor(conn.raw, dictionary=dictionary)
+            cursor.execute(self.backend.translate(query), params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                streamed += len(rows)
+                yield from rows
+            cursor.close()
+            discard = False
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            pool.release(conn, discard)
+            # Duration includes the consumer's time between batches
+            self._record(query, params, started, streamed, error)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run several statements as one transaction with a single commit:
+            with db.transaction() as tx:
+                tx.execute(...)
+        Commits when the block ends, rolls back if it raises.
+        """
+        with self.pool.connection() as conn:
+            self.backend.begin(conn.raw)
+            try:
+                yield DatabaseTransaction(conn, self)
+                conn.raw.commit()
+                self._note_write()
+            except BaseException:
+                try:
+                    conn.raw.rollback()
+                except self.backend.errors:
+                    pass  # Connection is gone, the server discards the transaction
+                raise
+
+    def _record(self, query, params, started, rows, error):
+        """Feed one execution into query_stats; EXPLAIN it if it was slow"""
+        if self.query_stats is None:
+            return
+        needs_explain = self.query_stats.record(
+            query, params, time.perf_counter() - started, rows, error)
+        if needs_explain:
+            self._explain(query, params)
+
+    def _explain(self, query, params):
+        """Capture the plan of a slow SELECT on a separate connection"""
+        try:
+            conn = self.pool.get_connection(timeout=1)
+        except self.errors:
+            return  # Pool is busy; try again next time this statement is slow
+        try:
+            cursor = self.backend.cursor(conn.raw, dictionary=True)
+            try:
+                cursor.execute(self.backend.translate(self.backend.explain_prefix + query),
+                               params or ())
+                plan = cursor.fetchall()
+            finally:
+                cursor.close()
+            self.query_stats.attach_explain(query, plan)
+        except self.backend.errors:
+            pass  # Not every statement can be explained
+        finally:
+            self.pool.release(conn)
+
+    def pool_stats(self):
+        """Connection pool size and wait-time stats"""
+        return self.pool.stats()
+
+    def replica_stats(self):
+        """Per-replica health, lag and read counts (None without replicas)"""
+        return self.replicas.stats() if self.replicas is not None else None
 
     def test_connection(self):
         """Test if database connection works"""
-        if self.connection and self.connection.is_connected():
+        try:
+            with self.pool.connection() as conn:
+                self.backend.ping(conn.raw)
             print("✅ Database connection is active!")
             return True
-        else:
+        except self.errors:
             print("❌ Database connection failed!")
             return False
 
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close()
+        if self.replicas is not None:
+            self.replicas.close()
+        print("✅ Database connection pool closed.")
+
 # Test function
 
 
@@ -82,6 +799,16 @@ def test_database():
             print("✅ Database query test successful!")
         else:
             print("❌ Database query test failed!")
+
+        # Test concurrent use of the pool
+        workers = [threading.Thread(target=db.execute_query,
+                                    args=("SELECT 1",), kwargs={'fetch': True})
+                   for _ in range(20)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        print(f"✅ Pool stats: {db.pool_stats()}")
     else:
         print("❌ Database connection test failed!")
 
@@ -0,0 +1,225 @@
+# db_backends.py
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    import mysql.connector
+    from mysql.connector import Error as MySQLError
+    from mysql.connector.errors import InterfaceError, OperationalError
+except ImportError:  # SQLite-only installs (kiosks, CI) don't need the MySQL driver
+    mysql = None
+    MySQLError = InterfaceError = OperationalError = None
+
+from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG
+
+
+# A backend knows how to open connections for one database engine and how to
+# adapt the application's MySQL-dialect SQL to it. ConnectionPool and
+# DatabaseManager only talk to the backend interface:
+#   connect(), ping(raw), cursor(raw, dictionary), prepared_cursor(raw),
+#   begin(raw), translate(query)
+#   replication_lag(raw): seconds a read replica trails its primary
+#   errors / connection_errors: exception classes to catch
+#   explain_prefix: how to ask this engine for a query plan
+
+
+class MySQLBackend:
+    """MySQL via mysql-connector (the production setup)"""
+
+    name = 'mysql'
+    explain_prefix = "EXPLAIN "
+
+    def __init__(self, db_config=None):
+        if mysql is None:
+            raise ImportError("mysql-connector-python is required for the MySQL backend")
+        self.db_config = db_config or DB_CONFIG
+        self.errors = (MySQLError,)
+        self.connection_errors = (InterfaceError, OperationalError)
+
+    def connect(self):
+        """Open a new connection (autocommit on, transactions are explicit)"""
+        raw = mysql.connector.connect(**self.db_config)
+        raw.autocommit = True
+        return raw
+
+    def ping(self, raw):
+        raw.ping(reconnect=False)
+
+    def cursor(self, raw, dictionary=False):
+        return raw.cursor(dictionary=dictionary)
+
+    def prepared_cursor(self, raw):
+        """Server-side prepared cursor; re-executing the same SQL skips the parse"""
+        return raw.cursor(prepared=True)
+
+    def begin(self, raw):
+        raw.start_transaction()
+
+    def replication_lag(self, raw):
+        """Seconds behind the source: 0.0 if not a replica, None if replication is stopped"""
+        cursor = raw.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except MySQLError:
+                cursor.execute("SHOW SLAVE STATUS")  # Before MySQL 8.0.22
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not rows:
+            return 0.0
+        lag = rows[0].get('Seconds_Behind_Source', rows[0].get('Seconds_Behind_Master'))
+        return None if lag is None else float(lag)
+
+    def translate(self, query):
+        return query  # Application SQL is written for MySQL
+
+
+# ============= SQLITE =============
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def _to_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _datediff(end, start):
+    """MySQL DATEDIFF(end, start): whole days between two dates"""
+    if end is None or start is None:
+        return None
+    return (_to_date(end) - _to_date(start)).days
+
+
+def _greatest(*values):
+    return None if any(v is None for v in values) else max(values)
+
+
+def _least(*values):
+    return None if any(v is None for v in values) else min(values)
+
+
+# Store dates as ISO text and read DATE/DATETIME columns back as Python objects,
+# matching what mysql-connector returns
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+# MySQL-only syntax and its SQLite equivalent, applied in order
+_SQLITE_REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+FOR\s+UPDATE(\s+OF\s+\w+)?(\s+SKIP\s+LOCKED|\s+NOWAIT)?", re.I), ""),
+    (re.compile(r"\s+LOCK\s+IN\s+SHARE\s+MODE", re.I), ""),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+]
+_ON_DUPLICATE_KEY = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I)
+
+
+class SQLiteBackend:
+    """
+    Embedded SQLite database in a single file (branch kiosks, CI, benchmarks).
+    - WAL journal so readers never block the writer
+    - Placeholders and MySQL-only clauses are translated, so the managers'
+      SQL runs unchanged
+    - NOW(), CURDATE(), DATEDIFF(), GREATEST() and LEAST() are provided
+    """
+
+    name = 'sqlite'
+    explain_prefix = "EXPLAIN QUERY PLAN "
+
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',      # Durable at checkpoints, safe with WAL
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+        'cache_size': -64000,         # 64 MB page cache per connection
+        'mmap_size': 268435456,       # 256 MB memory-mapped reads
+        'busy_timeout': 5000,         # ms to wait for the write lock
+    }
+
+    def __init__(self, path=None, pragmas=None, create_schema=True):
+        self.path = path or SQLITE_CONFIG['path']
+        self.pragmas = dict(self.PRAGMAS)
+        self.pragmas.update(pragmas or {})
+        self.errors = (sqlite3.Error,)
+        self.connection_errors = (sqlite3.InterfaceError,)
+        if create_schema:
+            self.create_schema()
+
+    def connect(self):
+        # isolation_level=None: autocommit, transactions are started with begin()
+        raw = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                              detect_types=sqlite3.PARSE_DECLTYPES,
+                              cached_statements=256)
+        for pragma, value in self.pragmas.items():
+            raw.execute(f"PRAGMA {pragma} = {value}")
+        raw.create_function("NOW", 0, lambda: datetime.now().isoformat(" ", "seconds"))
+        raw.create_function("CURDATE", 0, lambda: date.today().isoformat())
+        raw.create_function("DATEDIFF", 2, _datediff)
+        raw.create_function("GREATEST", -1, _greatest)
+        raw.create_function("LEAST", -1, _least)
+        return raw
+
+    def ping(self, raw):
+        raw.execute("SELECT 1")
+
+    def cursor(self, raw, dictionary=False):
+        cursor = raw.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return cursor
+
+    def prepared_cursor(self, raw):
+        # sqlite3 already keeps compiled statements per connection, keyed by
+        # SQL text (cached_statements); reusing the cursor saves the rest
+        return raw.cursor()
+
+    def begin(self, raw):
+        # Take the write lock up front; the closest match to InnoDB row locks
+        raw.execute("BEGIN IMMEDIATE")
+
+    def replication_lag(self, raw):
+        # A replica file is a copy kept in step by the caller (litestream,
+        # rsync of snapshots...); SQLite itself can't tell how far behind it is
+        return 0.0
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def translate(query):
+        for pattern, replacement in _SQLITE_REWRITES:
+            query = pattern.sub(replacement, query)
+        # Upserts: VALUES(col) in the update list becomes excluded.col
+        parts = _ON_DUPLICATE_KEY.split(query, maxsplit=1)
+        if len(parts) == 2:
+            query = parts[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", parts[1])
+        return query
+
+    def create_schema(self):
+        """Create the library tables, or bring an older file up to date"""
+        from schema import migrate  # schema imports this module for its CLI
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        migrate(self)
+
+
+def create_backend(name=None):
+    """Backend selected by config.DB_BACKEND ('mysql' or 'sqlite')"""
+    name = name or DB_BACKEND
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        return SQLiteBackend()
+    raise ValueError(f"Unknown database backend: {name}")
@@ -0,0 +1,293 @@
+# events.py
+import json
+import os
+import socket
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import fcntl  # Serializes appends from several processes (service workers)
+except ImportError:
+    fcntl = None
+
+from config import EVENT_CONFIG
+from models import RowMapper
+from search_index import STORED_FIELDS
+
+
+# Event types, one per committed change
+BOOK_BORROWED = 'borrow'        # user_id, isbn, copy_id, transaction_id, due_date
+BOOK_RETURNED = 'return'        # user_id, isbn, copy_id, transaction_id, fine
+BOOK_ADDED = 'add_book'         # isbn, book (STORED_FIELDS)
+BOOK_UPDATED = 'update_book'    # isbn, changes
+BOOK_DELETED = 'delete_book'    # isbn
+USER_UPDATED = 'update_user'    # user_id, changes (never the password), fields
+
+EVENT_TYPES = (BOOK_BORROWED, BOOK_RETURNED, BOOK_ADDED, BOOK_UPDATED, BOOK_DELETED,
+               USER_UPDATED)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ChangeEvent:
+    """One committed change: its type, payload, when and where it happened"""
+
+    __slots__ = ('type', 'data', 'at', 'source', 'offset')
+
+    def __init__(self, event_type, data, at=None, source=None, offset=None):
+        self.type = event_type
+        self.data = data
+        self.at = at if at is not None else time.time()
+        self.source = source
+        self.offset = offset      # byte position in the EventLog, once appended
+
+    def to_line(self):
+        return json.dumps({'type': self.type, 'at': self.at, 'source': self.source,
+                           'data': self.data}, default=_json_default).encode() + b"\n"
+
+    @classmethod
+    def from_line(cls, line, offset=None):
+        record = json.loads(line)
+        return cls(record['type'], record['data'], record['at'], record['source'], offset)
+
+    def __repr__(self):
+        return f"ChangeEvent({self.type!r}, {self.data!r}, offset={self.offset})"
+
+
+class EventLog:
+    """
+    Append-only JSON-lines file of change events.
+    - An event's offset is the byte position of its line; a consumer keeps
+      the next_offset read() hands back and resumes from it (after a
+      restart too), so nothing is skipped or read twice
+    - Several processes may append to the same file: each line goes out in
+      one write under an exclusive lock
+    - fsync=True makes every append durable before publish() returns
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+
+    def append(self, event):
+        """Write one event; returns its offset"""
+        line = event.to_line()
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = os.lseek(self._fd, 0, os.SEEK_END)
+                os.write(self._fd, line)
+                if self.fsync:
+                    os.fsync(self._fd)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        event.offset = offset
+        return offset
+
+    def read(self, offset=0, limit=1000):
+        """
+        Up to limit events starting at offset.
+        Returns (events, next_offset); a line still being written is left
+        for the next call.
+        """
+        events = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while len(events) < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                events.append(ChangeEvent.from_line(line, offset))
+                offset += len(line)
+        return events, offset
+
+    def end_offset(self):
+        """Where the next event will go; start here to see only new events"""
+        return os.path.getsize(self.path)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class EventBus:
+    """
+    Publishes change events after the database commit that caused them.
+    - publish() appends to the EventLog first (when there is one), so the
+      event subscribers see already carries its offset
+    - subscribe(callback, types) calls callback(event) in the publisher's
+      thread for the given types (None = all). A failing subscriber or log
+      write is reported and counted, never raised: the change is committed
+      whatever its listeners do
+    """
+
+    def __init__(self, log=None, source=None):
+        self.log = log
+        # Tells a process's own events apart when it also follows the log
+        self.source = source or f"{socket.gethostname()}:{os.getpid()}"
+        self._subscribers = ()     # (callback, types); replaced whole, read without the lock
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.delivered = 0
+        self.subscriber_errors = 0
+        self.log_errors = 0
+
+    def subscribe(self, callback, types=None):
+        types = frozenset(types) if types is not None else None
+        with self._lock:
+            self._subscribers += ((callback, types),)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = tuple(entry for entry in self._subscribers
+                                      if entry[0] is not callback)
+
+    def publish(self, event_type, **data):
+        """Record and deliver one event; call only once the change has committed"""
+        event = ChangeEvent(event_type, data, source=self.source)
+        log_failed = False
+        if self.log is not None:
+            try:
+                self.log.append(event)
+            except (OSError, TypeError, ValueError) as e:
+                log_failed = True
+                print(f"❌ Event log append failed ({event_type}): {e}")
+        delivered = failed = 0
+        for callback, types in self._subscribers:
+            if types is not None and event_type not in types:
+                continue
+            try:
+                callback(event)
+                delivered += 1
+            except Exception as e:
+                failed += 1
+                print(f"❌ Event subscriber failed on {event_type}: {e}")
+        # Publishers run on many threads; count under the lock
+        with self._lock:
+            self.published += 1
+            self.log_errors += log_failed
+            self.delivered += delivered
+            self.subscriber_errors += failed
+        return event
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+    def stats(self):
+        with self._lock:
+            counts = {
+                'published': self.published,
+                'delivered': self.delivered,
+                'subscribers': len(self._subscribers),
+                'subscriber_errors': self.subscriber_errors,
+                'log_errors': self.log_errors,
+            }
+        counts['log_offset'] = self.log.end_offset() if self.log is not None else None
+        return counts
+
+
+# ============= CONSUMERS =============
+
+def apply_event(event, search_index=None, cache=None):
+    """Bring a SearchIndex and/or EntityCache up to date with one event"""
+    data = event.data
+    if event.type in (BOOK_BORROWED, BOOK_RETURNED):
+        if cache is not None:
+            cache.invalidate_book(data['isbn'])
+        if search_index is not None:
+            search_index.adjust_available(data['isbn'], -1 if event.type == BOOK_BORROWED else 1)
+    elif event.type == BOOK_ADDED:
+        if cache is not None:
+            cache.invalidate_book(data['isbn'])
+        if search_index is not None:
+            search_index.add_book(RowMapper.for_columns(STORED_FIELDS, by_name=True).book(data['book']))
+    elif event.type == BOOK_UPDATED:
+        if cache is not None:
+            cache.invalidate_book(data['isbn'])
+        if search_index is not None:
+            search_index.update_book(data['isbn'], **data['changes'])
+    elif event.type == BOOK_DELETED:
+        if cache is not None:
+            cache.invalidate_book(data['isbn'])
+        if search_index is not None:
+            search_index.remove_book(data['isbn'])
+    elif event.type == USER_UPDATED:
+        if cache is not None:
+            cache.invalidate_user(data['user_id'])
+
+
+def book_payload(book):
+    """The indexed fields of a Book, as an add_book event carries them"""
+    return {field: getattr(book, field, None) for field in STORED_FIELDS}
+
+
+def user_changes(updates):
+    """update_user payload: what changed, without the password hash"""
+    return {'changes': {key: value for key, value in updates.items() if key != 'password'},
+            'fields': sorted(updates)}
+
+
+_default_bus = None
+_default_lock = threading.Lock()
+
+
+def default_event_bus():
+    """Process-wide bus logging to config.EVENT_CONFIG['log_path'] (no log if None)"""
+    global _default_bus
+    with _default_lock:
+        if _default_bus is None:
+            path = EVENT_CONFIG['log_path']
+            log = EventLog(path, EVENT_CONFIG['fsync']) if path else None
+            _default_bus = EventBus(log)
+        return _default_bus
+
+# Test function
+
+
+def test_events():
+    print("🧪 Testing Change Events...")
+    import tempfile
+    from cache import EntityCache
+    from models import Book
+    from search_index import SearchIndex
+
+    path = os.path.join(tempfile.mkdtemp(), "events.jsonl")
+    bus = EventBus(EventLog(path))
+    index, cache = SearchIndex(), EntityCache()
+    bus.subscribe(lambda event: apply_event(event, index, cache))
+    seen = []
+    bus.subscribe(seen.append, types=[BOOK_BORROWED])
+
+    book = Book("1", "Clean Code", "Robert C. Martin", 2008, 2)
+    bus.publish(BOOK_ADDED, isbn=book.isbn, book=book_payload(book))
+    bus.publish(BOOK_BORROWED, user_id=7, isbn="1", copy_id=1, transaction_id=1,
+                due_date=date.today())
+    print(f"✅ Index follows events: {index.search(title='clean')[0]['available_copies']} available")
+    print(f"✅ Filtered subscriber saw {len(seen)} borrow event")
+
+    events, next_offset = bus.log.read()
+    print(f"✅ Log replay: {[event.type for event in events]}, resume at {next_offset}")
+    print(f"✅ Nothing new after that: {bus.log.read(next_offset)[0]}")
+    print(f"✅ Stats: {bus.stats()}")
+    bus.close()
+
+
+if __name__ == "__main__":
+    test_events()
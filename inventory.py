@@ -0,0 +1,176 @@
+# inventory.py
+from config import WRITE_BEHIND_CONFIG
+from write_behind import WriteBehindBuffer
+
+
+# Re-derive one book's summary counters from its copies (idempotent, so a
+# checkout, a write-behind flush or a repair can run it any number of times)
+REFRESH_BOOK_COUNTERS = """UPDATE books SET
+    available_copies = (SELECT COUNT(*) FROM book_copies c
+                        WHERE c.isbn = books.isbn AND c.status = 'available'),
+    active_loans = (SELECT COUNT(*) FROM book_copies c
+                    WHERE c.isbn = books.isbn AND c.status = 'on_loan')
+    WHERE isbn = %s"""
+
+
+class CopyInventory:
+    """
+    One row per physical copy in book_copies; the authority on what can be lent.
+    A copy is 'available', 'on_loan' or 'withdrawn' (kept for history).
+    - allocate() claims an available copy with FOR UPDATE SKIP LOCKED, so
+      parallel checkouts of one title take different copies instead of
+      queueing on a shared counter row
+    - books.available_copies / books.active_loans are summaries derived
+      from the copies (REFRESH_BOOK_COUNTERS), refreshed by refresh() inside
+      every checkout and return so they are never stale once it commits
+    - sync_copies() adds or withdraws copies to match books.total_copies
+    """
+
+    ALLOCATE_QUERY = """SELECT copy_id, barcode FROM book_copies
+                        WHERE isbn = %s AND status = 'available'
+                        ORDER BY copy_id LIMIT 1
+                        FOR UPDATE SKIP LOCKED"""
+    CLAIM_QUERY = "UPDATE book_copies SET status = 'on_loan' WHERE copy_id = %s"
+    # {placeholders}: one %s per copy_id
+    RELEASE_QUERY = """UPDATE book_copies SET status = 'available'
+                       WHERE copy_id IN ({placeholders}) AND status = 'on_loan'"""
+    ON_LOAN_QUERY = """SELECT COUNT(*) as on_loan FROM book_copies
+                       WHERE isbn = %s AND status = 'on_loan'"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    # ============= CIRCULATION (inside a caller's transaction) =============
+
+    def allocate(self, tx, isbn):
+        """Claim one available copy of isbn; returns its copy_id, or None if none is free"""
+        rows = tx.execute(self.ALLOCATE_QUERY, (isbn,), fetch=True)
+        if not rows:
+            return None
+        copy_id = rows[0]['copy_id']
+        tx.execute(self.CLAIM_QUERY, (copy_id,))
+        return copy_id
+
+    def release(self, tx, copy_ids):
+        """Put returned copies back on the shelf"""
+        copy_ids = [copy_id for copy_id in copy_ids if copy_id is not None]
+        if not copy_ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(copy_ids))
+        tx.execute(self.RELEASE_QUERY.format(placeholders=placeholders), copy_ids)
+        return tx.rowcount
+
+    def refresh(self, tx, isbns):
+        """Re-derive the books' counters from their copies before the caller commits"""
+        isbns = list(dict.fromkeys(isbns))
+        if isbns:
+            tx.executemany(REFRESH_BOOK_COUNTERS, [(isbn,) for isbn in isbns])
+        return len(isbns)
+
+    # ============= STOCK =============
+
+    def available(self, isbn):
+        """Exact number of copies on the shelf right now"""
+        result = self.db.execute_query(
+            "SELECT COUNT(*) as available FROM book_copies WHERE isbn = %s AND status = 'available'",
+            (isbn,), fetch=True)
+        return result[0]['available'] if result else 0
+
+    def on_loan(self, isbn):
+        result = self.db.execute_query(self.ON_LOAN_QUERY, (isbn,), fetch=True)
+        return result[0]['on_loan'] if result else 0
+
+    def copies(self, isbn):
+        """Every copy of a title (including withdrawn ones), oldest first"""
+        return self.db.execute_query(
+            """SELECT copy_id, barcode, status, condition_note, created_at
+               FROM book_copies WHERE isbn = %s ORDER BY copy_id""",
+            (isbn,), fetch=True) or []
+
+    def sync_copies(self, isbns=None):
+        """
+        Add or withdraw copies so each book has total_copies in stock, then
+        refresh its derived counters. Only available copies are withdrawn.
+        Returns {isbn: available_copies} for every book that changed.
+        """
+        query = """SELECT b.isbn, b.total_copies,
+                   SUM(CASE WHEN c.status IS NOT NULL AND c.status <> 'withdrawn' THEN 1 ELSE 0 END) as in_stock,
+                   COUNT(c.copy_id) as numbered
+                   FROM books b LEFT JOIN book_copies c ON c.isbn = b.isbn"""
+        params = []
+        if isbns is not None:
+            if not isbns:
+                return {}
+            query += f" WHERE b.isbn IN ({', '.join(['%s'] * len(isbns))})"
+            params = list(isbns)
+        query += " GROUP BY b.isbn, b.total_copies"
+        drifted = [row for row in self.db.execute_query(query, params, fetch=True) or []
+                   if int(row['in_stock'] or 0) != (row['total_copies'] or 0)]
+        if not drifted:
+            return {}
+
+        with self.db.transaction() as tx:
+            new_copies = []
+            for row in drifted:
+                missing = (row['total_copies'] or 0) - int(row['in_stock'] or 0)
+                numbered = int(row['numbered'] or 0)
+                if missing > 0:
+                    new_copies.extend((row['isbn'], f"{row['isbn']}-{n}")
+                                      for n in range(numbered + 1, numbered + missing + 1))
+                else:
+                    spare = tx.execute("""SELECT copy_id FROM book_copies
+                                         WHERE isbn = %s AND status = 'available'
+                                         ORDER BY copy_id DESC LIMIT %s FOR UPDATE""",
+                                       (row['isbn'], -missing), fetch=True)
+                    if spare:
+                        placeholders = ", ".join(["%s"] * len(spare))
+                        tx.execute(f"""UPDATE book_copies SET status = 'withdrawn'
+                                      WHERE copy_id IN ({placeholders})""",
+                                   [copy['copy_id'] for copy in spare])
+            if new_copies:
+                tx.executemany("""INSERT INTO book_copies (isbn, barcode, status)
+                                  VALUES (%s, %s, 'available')""", new_copies)
+        return self.refresh_counters([row['isbn'] for row in drifted])
+
+    def refresh_counters(self, isbns):
+        """Re-derive books.available_copies/active_loans for isbns; returns {isbn: available}"""
+        if not isbns:
+            return {}
+        with self.db.transaction() as tx:
+            tx.executemany(REFRESH_BOOK_COUNTERS, [(isbn,) for isbn in isbns])
+        placeholders = ", ".join(["%s"] * len(isbns))
+        rows = self.db.execute_query(
+            f"SELECT isbn, available_copies FROM books WHERE isbn IN ({placeholders})",
+            list(isbns), fetch=True) or []
+        return {row['isbn']: row['available_copies'] for row in rows}
+
+
+def book_counter_buffer(db_manager, **options):
+    """
+    Opt-in buffer for bulk jobs that edit many copies outside circulation and
+    can live with books counters lagging until the next flush. Checkouts and
+    returns never use it; they refresh the counters in their own transaction.
+    """
+    settings = dict(WRITE_BEHIND_CONFIG, **options)
+    return WriteBehindBuffer(
+        db_manager, REFRESH_BOOK_COUNTERS, to_params=lambda isbn, _: (isbn,),
+        name="book-counters", **settings)
+
+# Test function
+
+
+def test_inventory():
+    print("🧪 Testing Copy Inventory...")
+    from database import DatabaseManager
+    db = DatabaseManager()
+    inventory = CopyInventory(db)
+
+    changed = inventory.sync_copies()
+    print(f"✅ Books brought in line with total_copies: {len(changed)}")
+    for book in (db.execute_query("SELECT isbn FROM books LIMIT 1", fetch=True) or []):
+        print(f"✅ {book['isbn']}: {inventory.available(book['isbn'])} on the shelf")
+        print(f"   Copies: {[c['barcode'] for c in inventory.copies(book['isbn'])]}")
+
+
+if __name__ == "__main__":
+    test_inventory()
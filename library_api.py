@@ -0,0 +1,421 @@
+# library_api.py
+import asyncio
+import json
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import parse_qs, urlsplit
+
+from async_database import AsyncDatabaseManager
+from async_managers import AsyncAuthentication, AsyncCRUDManager, AsyncLibraryManager
+from cache import EntityCache
+from config import EVENT_CONFIG
+from crud_manager import CRUDManager
+from database import decode_cursor
+from db_backends import SQLiteBackend, create_backend
+from events import apply_event, default_event_bus
+from models import Book
+from search_index import SearchIndex
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'params', 'user', 'token')
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.params = {}
+        self.user = None
+        self.token = None
+
+    def arg(self, name, default=None):
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return data
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(payload):
+    return json.dumps(payload, default=_json_default).encode()
+
+
+def model_dict(model, hidden=('password',)):
+    """A __slots__ model (Book, User, Admin) as a plain dict"""
+    fields = {}
+    for cls in type(model).__mro__:
+        for slot in getattr(cls, '__slots__', ()):
+            if slot not in hidden and hasattr(model, slot):
+                fields[slot] = getattr(model, slot)
+    return fields
+
+
+def _limit(request, default=50, maximum=500):
+    try:
+        return max(1, min(int(request.arg('limit', default)), maximum))
+    except ValueError:
+        raise HTTPError(400, "limit must be a number")
+
+
+def _cursor(request, *fields):
+    """
+    The request's page cursor, checked against the sort key it must decode
+    to (one converter per field), so a bad cursor is a 400, not a 500
+    """
+    cursor = request.arg('cursor')
+    if cursor is None:
+        return None
+    try:
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError("wrong cursor shape")
+        for convert, value in zip(fields, values):
+            convert(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, "Invalid page cursor")
+    return cursor
+
+
+class LibraryService:
+    """
+    The HTTP/JSON API one worker process serves: its own connection pool,
+    entity cache and search index, sharing only the session store (and the
+    database) with the other workers.
+    """
+
+    # Fields a request may change; anything else in the body is rejected
+    BOOK_FIELDS = {'title', 'author', 'publication_year', 'total_copies', 'genre',
+                   'price', 'description'}
+    PROFILE_FIELDS = {'name', 'email', 'phone'}
+    ADMIN_USER_FIELDS = PROFILE_FIELDS | {'role', 'membership_type', 'is_active', 'department'}
+
+    def __init__(self, session_store, settings):
+        self.settings = settings
+        if settings.get('sqlite'):
+            backend = SQLiteBackend(settings['sqlite'], create_schema=False)
+        else:
+            backend = create_backend()
+        self.db = AsyncDatabaseManager(backend=backend, pool_size=settings['pool_size'])
+        self.cache = EntityCache(ttl=settings['cache_ttl'])
+        self.search_index = SearchIndex()
+        # Every worker appends to the same event log and follows it, so one
+        # worker's changes reach the others' caches and indexes within
+        # EVENT_CONFIG['poll_interval'] instead of cache_ttl / search_refresh
+        self.events = default_event_bus()
+        self.auth = AsyncAuthentication(self.db, session_store=session_store)
+        self.crud = AsyncCRUDManager(self.db, self.search_index, self.cache, session_store,
+                                     event_bus=self.events)
+        self.library = AsyncLibraryManager(self.db, self.search_index, self.cache,
+                                           event_bus=self.events)
+        self.ready = False
+        self.draining = False
+        self._refresh_task = None
+        self._follow_task = None
+
+        self.routes = [(method, re.compile(f"^{pattern}$"), handler) for method, pattern, handler in (
+            ('GET', r'/healthz', self.health),
+            ('GET', r'/readyz', self.readiness),
+            ('POST', r'/login', self.login),
+            ('POST', r'/logout', self.logout),
+            ('POST', r'/users', self.register),
+            ('GET', r'/users/(?P<user_id>\d+)', self.get_user),
+            ('PATCH', r'/users/(?P<user_id>\d+)', self.update_user),
+            ('DELETE', r'/users/(?P<user_id>\d+)', self.delete_user),
+            ('GET', r'/users/(?P<user_id>\d+)/transactions', self.user_transactions),
+            ('GET', r'/users/(?P<user_id>\d+)/overdue', self.user_overdue),
+            ('GET', r'/books', self.list_books),
+            ('GET', r'/books/search', self.search_books),
+            ('POST', r'/books', self.add_book),
+            ('GET', r'/books/(?P<isbn>[^/]+)', self.get_book),
+            ('PATCH', r'/books/(?P<isbn>[^/]+)', self.update_book),
+            ('DELETE', r'/books/(?P<isbn>[^/]+)', self.delete_book),
+            ('POST', r'/borrow', self.borrow),
+            ('POST', r'/return', self.return_book),
+        )]
+
+    # ============= LIFECYCLE =============
+
+    async def start(self):
+        """Load the search index, then start taking traffic"""
+        # Follow from before the rebuild: a change landing during it may be
+        # applied twice, which the next full rebuild evens out
+        offset = self.events.log.end_offset() if self.events.log is not None else None
+        await self._rebuild_search_index()
+        self._refresh_task = asyncio.create_task(self._refresh_search_index())
+        if offset is not None:
+            self._follow_task = asyncio.create_task(self._follow_events(offset))
+        self.ready = True
+
+    async def _rebuild_search_index(self):
+        # Built on a thread with the blocking manager, then swapped in whole
+        index = SearchIndex()
+        await asyncio.to_thread(CRUDManager(self.db.background(), index).build_search_index)
+        self.search_index = self.crud.search_index = self.library.search_index = index
+
+    async def _refresh_search_index(self):
+        # Full rebuilds also pick up changes made outside the service
+        # (imports, repairs, other applications)
+        while True:
+            await asyncio.sleep(self.settings['search_refresh'])
+            try:
+                await self._rebuild_search_index()
+            except Exception as e:
+                print(f"❌ Search index refresh failed: {e}")
+
+    async def _follow_events(self, offset):
+        # Apply the other workers' changes; this worker's own are already applied
+        while True:
+            await asyncio.sleep(EVENT_CONFIG['poll_interval'])
+            try:
+                events, offset = await asyncio.to_thread(self.events.log.read, offset)
+            except (OSError, ValueError) as e:
+                print(f"❌ Event log read failed: {e}")
+                continue
+            for event in events:
+                if event.source != self.events.source:
+                    apply_event(event, self.search_index, self.cache)
+
+    async def close(self):
+        for task in (self._refresh_task, self._follow_task):
+            if task is not None:
+                task.cancel()
+        self.library.close()
+        self.auth.close()
+        await self.db.close()
+
+    # ============= DISPATCH =============
+
+    async def dispatch(self, method, target, headers, body):
+        """Route one request; returns (status, payload)"""
+        url = urlsplit(target)
+        request = Request(method, url.path.rstrip('/') or '/', parse_qs(url.query), headers, body)
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            request.params = match.groupdict()
+            try:
+                return await handler(request)
+            except HTTPError as e:
+                return e.status, {'error': e.message}
+            except Exception as e:
+                print(f"❌ {method} {request.path} failed: {e}")
+                return 500, {'error': "Internal server error"}
+        if allowed:
+            return 405, {'error': "Method not allowed"}
+        return 404, {'error': "Not found"}
+
+    async def _session_user(self, token):
+        """
+        validate_session on a worker thread: under service.py the session store
+        is a proxy to another process, and each lookup is a blocking round trip
+        """
+        return await asyncio.to_thread(self.auth.validate_session, token)
+
+    async def _authenticate(self, request):
+        """The session user behind the request's bearer token (401 without one)"""
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        user = await self._session_user(token) if scheme.lower() == 'bearer' else None
+        if user is None:
+            raise HTTPError(401, "Login required")
+        request.user, request.token = user, token
+        return user
+
+    async def _require_admin(self, request):
+        user = await self._authenticate(request)
+        if user.role != 'admin':
+            raise HTTPError(403, "Admin only")
+        return user
+
+    async def _require_self_or_admin(self, request):
+        user = await self._authenticate(request)
+        user_id = int(request.params['user_id'])
+        if user.user_id != user_id and user.role != 'admin':
+            raise HTTPError(403, "Not your account")
+        return user_id
+
+    @staticmethod
+    def _fields(data, allowed):
+        unknown = set(data) - allowed
+        if unknown:
+            raise HTTPError(400, f"Unknown or read-only fields: {', '.join(sorted(unknown))}")
+        return data
+
+    # ============= HEALTH =============
+
+    async def health(self, request):
+        """Liveness: the worker's event loop is answering"""
+        return 200, {'status': 'ok', 'pid': os.getpid()}
+
+    async def readiness(self, request):
+        """Readiness: loaded, not shutting down, and the database answers"""
+        if self.draining or not self.ready:
+            return 503, {'status': 'draining' if self.draining else 'starting'}
+        try:
+            async with self.db.pool.connection(timeout=2) as conn:
+                await conn.ping()
+        except self.db.errors as e:
+            return 503, {'status': 'database unavailable', 'error': str(e)}
+        return 200, {'status': 'ready', 'pid': os.getpid(), 'pool': self.db.pool_stats()}
+
+    # ============= SESSIONS =============
+
+    async def login(self, request):
+        data = request.json()
+        token, message = await self.auth.start_session(data.get('username'), data.get('password'))
+        if token is None:
+            return 401, {'error': message}
+        user = await self._session_user(token)
+        return 200, {'token': token, 'user': model_dict(user), 'message': message}
+
+    async def logout(self, request):
+        await self._authenticate(request)
+        await self.auth.end_session(request.token)
+        return 200, {'message': "Logout successful"}
+
+    # ============= USERS =============
+
+    async def register(self, request):
+        data = request.json()
+        missing = [field for field in ('username', 'password', 'name', 'email') if not data.get(field)]
+        if missing:
+            raise HTTPError(400, f"Missing fields: {', '.join(missing)}")
+        user, message = await self.auth.register_user(
+            data['username'], data['password'], data['name'], data['email'], data.get('phone'))
+        if user is None:
+            return 400, {'error': message}
+        return 201, {'user': model_dict(user), 'message': message}
+
+    async def get_user(self, request):
+        user = await self.crud.get_user(await self._require_self_or_admin(request))
+        if user is None:
+            raise HTTPError(404, "User not found")
+        return 200, {'user': model_dict(user)}
+
+    async def update_user(self, request):
+        user_id = await self._require_self_or_admin(request)
+        allowed = self.ADMIN_USER_FIELDS if request.user.role == 'admin' else self.PROFILE_FIELDS
+        updates = self._fields(request.json(), allowed)
+        if not updates:
+            raise HTTPError(400, "Nothing to update")
+        if await self.crud.update_user(user_id, **updates) is None:
+            return 400, {'error': "Update failed"}
+        return 200, {'message': "User updated"}
+
+    async def delete_user(self, request):
+        await self._require_admin(request)
+        success, message = await self.crud.delete_user(int(request.params['user_id']))
+        return (200, {'message': message}) if success else (409, {'error': message})
+
+    async def user_transactions(self, request):
+        user_id = await self._require_self_or_admin(request)
+        transactions, cursor = await self.library.get_user_transactions_page(
+            user_id, _cursor(request, str, int), _limit(request))
+        return 200, {'transactions': transactions, 'next_cursor': cursor}
+
+    async def user_overdue(self, request):
+        user_id = await self._require_self_or_admin(request)
+        loans, cursor = await self.library.get_overdue_page(
+            _cursor(request, date.fromisoformat, int), _limit(request), user_id)
+        return 200, {'loans': loans, 'next_cursor': cursor}
+
+    # ============= BOOKS =============
+
+    async def list_books(self, request):
+        books, cursor = await self.crud.get_books_page(_cursor(request, str, str),
+                                                       _limit(request))
+        return 200, {'books': [model_dict(book) for book in books], 'next_cursor': cursor}
+
+    async def search_books(self, request):
+        books = await self.crud.search_books(
+            title=request.arg('title'), author=request.arg('author'), genre=request.arg('genre'),
+            available_only=request.arg('available') in ('1', 'true'), text=request.arg('q'))
+        limit = _limit(request)
+        return 200, {'books': [model_dict(book) for book in books[:limit]]}
+
+    async def get_book(self, request):
+        book = await self.crud.get_book(request.params['isbn'])
+        if book is None:
+            raise HTTPError(404, "Book not found")
+        return 200, {'book': model_dict(book)}
+
+    async def add_book(self, request):
+        admin = await self._require_admin(request)
+        data = request.json()
+        if not data.get('isbn') or not data.get('title') or not data.get('author'):
+            raise HTTPError(400, "isbn, title and author are required")
+        fields = self._fields({k: v for k, v in data.items() if k != 'isbn'}, self.BOOK_FIELDS)
+        book = Book(data['isbn'], fields.pop('title'), fields.pop('author'),
+                    fields.pop('publication_year', None), **fields)
+        if await self.crud.add_book(book, added_by=admin.user_id) is None:
+            return 409, {'error': "Book could not be added (duplicate ISBN?)"}
+        return 201, {'book': model_dict(book)}
+
+    async def update_book(self, request):
+        await self._require_admin(request)
+        updates = self._fields(request.json(), self.BOOK_FIELDS)
+        if not updates:
+            raise HTTPError(400, "Nothing to update")
+        if await self.crud.update_book(request.params['isbn'], **updates) is None:
+            return 400, {'error': "Update failed"}
+        return 200, {'message': "Book updated"}
+
+    async def delete_book(self, request):
+        await self._require_admin(request)
+        success, message = await self.crud.delete_book(request.params['isbn'])
+        return (200, {'message': message}) if success else (409, {'error': message})
+
+    # ============= CIRCULATION =============
+
+    async def _patron(self, request, data):
+        """Patrons borrow for themselves; admins may act for any user_id"""
+        user = await self._authenticate(request)
+        user_id = data.get('user_id', user.user_id)
+        if user_id != user.user_id and user.role != 'admin':
+            raise HTTPError(403, "Not your account")
+        if not data.get('isbn'):
+            raise HTTPError(400, "isbn is required")
+        return user_id
+
+    async def borrow(self, request):
+        data = request.json()
+        user_id = await self._patron(request, data)
+        success, message = await self.library.borrow_book(user_id, data['isbn'])
+        return (200, {'message': message}) if success else (409, {'error': message})
+
+    async def return_book(self, request):
+        data = request.json()
+        user_id = await self._patron(request, data)
+        success, message = await self.library.return_book(user_id, data['isbn'])
+        return (200, {'message': message}) if success else (409, {'error': message})
@@ -1,156 +1,501 @@
 # library_manager.py
-from models import Transaction
-from database import DatabaseManager
-from datetime import datetime, timedelta
-
-
-class LibraryManager:
-    def __init__(self, db_manager):
+from models import Transaction, User
+from archive import TransactionArchiver, history_query
+from database import DatabaseManager, encode_cursor, decode_cursor
+from events import BOOK_BORROWED, BOOK_RETURNED
+from fine_accrual import UPSERT_FINES, FineAccrual, FinePolicy
+from inventory import CopyInventory
+from schema import REPAIR_ACTIVE_LOANS, REPAIR_BOOK_COUNTERS
+from datetime import date, datetime, timedelta
+
+
+class Circulation:
+    """
+    What LibraryManager and async_managers.AsyncLibraryManager share: the
+    circulation SQL and the bookkeeping once a borrow or return commits
+    (entity cache, search index, overdue index, events)
+    """
+
+    LOAN_DAYS = 14
+
+    # User, their open-loan counter and the book title in one round trip.
+    # FOR UPDATE locks only the user row, so concurrent borrows by the
+    # same user queue up instead of both passing the limit check.
+    BORROW_CHECK_QUERY = """SELECT u.membership_type, u.active_loans,
+                            (SELECT b.title FROM books b WHERE b.isbn = %s) as title
+                            FROM users u
+                            WHERE u.user_id = %s AND u.is_active = TRUE
+                            FOR UPDATE"""
+
+    INSERT_LOAN = """INSERT INTO transactions 
+                     (user_id, book_isbn, copy_id, transaction_type, due_date, status) 
+                     VALUES (%s, %s, %s, 'borrow', %s, 'active')"""
+
+    # The newest open loan of a book, locked so a second return of the same
+    # loan waits and then finds nothing
+    RETURN_LOOKUP_QUERY = """SELECT t.transaction_id, t.copy_id, t.due_date,
+                             (SELECT b.title FROM books b WHERE b.isbn = t.book_isbn) as title
+                             FROM transactions t
+                             WHERE t.user_id = %s AND t.book_isbn = %s 
+                             AND t.transaction_type = 'borrow' 
+                             AND t.return_date IS NULL 
+                             ORDER BY t.transaction_date DESC LIMIT 1
+                             FOR UPDATE"""
+
+    COMPLETE_LOAN = """UPDATE transactions 
+                       SET return_date = %s, fine_amount = %s, 
+                       status = 'completed' 
+                       WHERE transaction_id = %s"""
+
+    ADJUST_ACTIVE_LOANS = "UPDATE users SET active_loans = active_loans + %s WHERE user_id = %s"
+
+    # borrow_many / return_many: the borrower, the titles of a stack of
+    # books, and the user's open loans of them ({placeholders}: one %s per ISBN)
+    BORROWER_QUERY = """SELECT u.membership_type, u.active_loans
+                        FROM users u
+                        WHERE u.user_id = %s AND u.is_active = TRUE
+                        FOR UPDATE"""
+
+    BOOK_TITLES_QUERY = "SELECT isbn, title FROM books WHERE isbn IN ({placeholders})"
+
+    # executemany doesn't report every new id, so new loans are read back by copy
+    NEW_LOANS_QUERY = """SELECT transaction_id, copy_id FROM transactions
+                         WHERE copy_id IN ({placeholders}) AND return_date IS NULL"""
+
+    # Newest open loan first, so the first row per book is the one returned
+    RETURN_MANY_QUERY = """SELECT t.transaction_id, t.book_isbn, t.copy_id, t.due_date,
+                           (SELECT b.title FROM books b WHERE b.isbn = t.book_isbn) as title
+                           FROM transactions t
+                           WHERE t.user_id = %s AND t.book_isbn IN ({placeholders})
+                           AND t.transaction_type = 'borrow' 
+                           AND t.return_date IS NULL 
+                           ORDER BY t.transaction_date DESC
+                           FOR UPDATE"""
+
+    # {table}: transactions, then transactions_archive
+    LOAN_FINE_QUERY = """SELECT due_date, return_date, fine_amount 
+                         FROM {table} 
+                         WHERE transaction_id = %s"""
+
+    # Open loans with the names the dashboard shows
+    OPEN_LOAN_QUERY = """SELECT t.transaction_id, t.user_id, u.name as user_name, u.email,
+                          t.book_isbn, b.title, t.due_date
+                          FROM transactions t
+                          JOIN users u ON t.user_id = u.user_id
+                          JOIN books b ON t.book_isbn = b.isbn
+                          WHERE t.transaction_type = 'borrow' AND t.return_date IS NULL"""
+
+    @classmethod
+    def _due_date(cls):
+        return (datetime.now() + timedelta(days=cls.LOAN_DAYS)).strftime('%Y-%m-%d')
+
+    def _borrowed(self, user_id, isbn, copy_id, transaction_id, due_date):
+        """Bookkeeping after a borrow commits"""
+        if self.cache is not None:
+            self.cache.invalidate_book(isbn)
+        if self.search_index is not None:
+            self.search_index.adjust_available(isbn, -1)
+        if self.overdue_index is not None:
+            self.overdue_index.add(transaction_id, user_id, due_date)
+        if self.event_bus is not None:
+            self.event_bus.publish(BOOK_BORROWED, user_id=user_id, isbn=isbn,
+                                   copy_id=copy_id, transaction_id=transaction_id,
+                                   due_date=due_date)
+
+    def _returned(self, user_id, isbn, copy_id, transaction_id, fine_amount):
+        """Bookkeeping after a return commits"""
+        if self.cache is not None:
+            self.cache.invalidate_book(isbn)
+        if self.search_index is not None:
+            self.search_index.adjust_available(isbn, 1)
+        if self.overdue_index is not None:
+            self.overdue_index.remove(transaction_id)
+        if self.event_bus is not None:
+            self.event_bus.publish(BOOK_RETURNED, user_id=user_id, isbn=isbn,
+                                   copy_id=copy_id, transaction_id=transaction_id,
+                                   fine=fine_amount)
+
+    @staticmethod
+    def _in_list(query, values):
+        """query with its {placeholders} expanded to one %s per value"""
+        return query.format(placeholders=", ".join(["%s"] * len(values)))
+
+    @staticmethod
+    def _borrow_message(title, due_date):
+        return f"Book '{title}' borrowed successfully. Due date: {due_date}"
+
+    @staticmethod
+    def _borrow_refusal(isbn, books, accepted, slots_left, max_books):
+        """Why isbn can't join a borrow_many stack before a copy is sought, or None"""
+        if isbn in accepted:
+            return "Duplicate ISBN in request"
+        if isbn not in books:
+            return "Book not found or not available"
+        if len(accepted) >= slots_left:
+            return f"Borrowing limit reached. Maximum {max_books} books allowed."
+        return None
+
+    def _plan_returns(self, user_id, isbns, open_loans, return_date):
+        """
+        Price each requested return against the user's open loans (newest per
+        book). Returns (results, returned, fines): returned holds
+        (isbn, copy_id, transaction_id, fine_amount) per loan to complete, and
+        fines the UPSERT_FINES rows.
+        """
+        results, returned, fines = [], [], []
+        returned_isbns = set()
+        for isbn in isbns:
+            transaction = open_loans.get(isbn)
+            if isbn in returned_isbns:
+                results.append((isbn, False, "Duplicate ISBN in request"))
+                continue
+            if not transaction:
+                results.append((isbn, False, "No active borrow transaction found"))
+                continue
+
+            fine_amount = self.fine_policy.fine(transaction['due_date'], return_date)
+            returned_isbns.add(isbn)
+            returned.append((isbn, transaction['copy_id'],
+                             transaction['transaction_id'], fine_amount))
+            if fine_amount > 0:
+                fines.append((user_id, transaction['transaction_id'], fine_amount, return_date))
+            results.append((isbn, True, self._return_message(transaction['title'], fine_amount)))
+        return results, returned, fines
+
+    def _loan_fine(self, loan):
+        """Fine of a calculate_fine row: priced as of today while still borrowed"""
+        if loan['return_date'] is None and loan['due_date']:
+            return self.fine_policy.fine(loan['due_date'])
+        return loan.get('fine_amount', 0.00)
+
+    @staticmethod
+    def _return_message(title, fine_amount):
+        message = f"Book '{title}' returned successfully."
+        if fine_amount > 0:
+            message += f" Overdue fine: ${fine_amount:.2f}"
+        return message
+
+    @classmethod
+    def _open_loans_query(cls, start, end, user_id, after, limit):
+        """(query, params) for open loans due in [start, end), keyset-paged"""
+        query = cls.OPEN_LOAN_QUERY
+        params = []
+        for condition, value in (("t.due_date >= %s", start), ("t.due_date < %s", end),
+                                 ("t.user_id = %s", user_id)):
+            if value is not None:
+                query += f" AND {condition}"
+                params.append(value)
+        if after:
+            query += " AND (t.due_date > %s OR (t.due_date = %s AND t.transaction_id > %s))"
+            params += [after[0], after[0], after[1]]
+        query += " ORDER BY t.due_date, t.transaction_id"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return query, params
+
+    @classmethod
+    def _loan_chunks(cls, transaction_ids, chunk_size=1000):
+        """(query, ids) per chunk of at most chunk_size loans to hydrate by primary key"""
+        for start in range(0, len(transaction_ids), chunk_size):
+            chunk = transaction_ids[start:start + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            yield cls.OPEN_LOAN_QUERY + f" AND t.transaction_id IN ({placeholders})", chunk
+
+    @staticmethod
+    def _history_cursor(transactions, limit):
+        """Cursor for the page after a full page of history, else None"""
+        if len(transactions) < limit:
+            return None
+        last = transactions[-1]
+        return encode_cursor((last['transaction_date'], last['transaction_id']))
+
+    @staticmethod
+    def _loans_page(loans, limit):
+        """Add days_overdue to each loan; returns (loans, next_cursor)"""
+        today = date.today()
+        for loan in loans:
+            loan['days_overdue'] = (today - loan['due_date']).days
+        next_cursor = None
+        if limit is not None and len(loans) == limit:
+            last = loans[-1]
+            next_cursor = encode_cursor((last['due_date'].isoformat(), last['transaction_id']))
+        return loans, next_cursor
+
+
+class LibraryManager(Circulation):
+    def __init__(self, db_manager, search_index=None, cache=None, fine_policy=None,
+                 overdue_index=None, inventory=None, event_bus=None):
         self.db_manager = db_manager
+        # Daily rate, grace period and cap for overdue fines (config.FINE_CONFIG)
+        self.fine_policy = fine_policy or FinePolicy.from_config()
+        # Optional SearchIndex shared with CRUDManager; availability is kept current
+        self.search_index = search_index
+        # Optional EntityCache shared with CRUDManager; books are invalidated
+        # whenever their available_copies change
+        self.cache = cache
+        # Optional OverdueIndex (loaded by the caller); turns overdue and
+        # due-soon lookups into range reads. Updated after every borrow/return
+        self.overdue_index = overdue_index
+        # Copies are allocated one row each; the books row's available_copies
+        # and active_loans are re-derived from them in the same transaction
+        self.inventory = inventory or CopyInventory(db_manager)
+        # Optional EventBus told about every committed borrow and return
+        self.event_bus = event_bus
+
+    def close(self):
+        """Nothing to flush: circulation writes its counters before committing"""
 
     def borrow_book(self, user_id, book_isbn):
-        """Borrow a book for a user"""
+        """Borrow a book for a user (one transaction, one commit)"""
         try:
-            # Check user exists and is active
-            user_query = "SELECT * FROM users WHERE user_id = %s AND is_active = TRUE"
-            user_result = self.db_manager.execute_query(
-                user_query, (user_id,), fetch=True)
-            if not user_result:
-                return False, "User not found or inactive"
-
-            # Check book exists and is available
-            book_query = "SELECT * FROM books WHERE isbn = %s AND available_copies > 0"
-            book_result = self.db_manager.execute_query(
-                book_query, (book_isbn,), fetch=True)
-            if not book_result:
-                return False, "Book not found or not available"
-
-            book = book_result[0]
-
-            # Check user's current borrowings
-            borrow_query = """SELECT COUNT(*) as active_borrows FROM transactions 
-                             WHERE user_id = %s AND transaction_type = 'borrow' 
-                             AND return_date IS NULL"""
-            active_borrows = self.db_manager.execute_query(
-                borrow_query, (user_id,), fetch=True)[0]['active_borrows']
-
-            user = user_result[0]
-            max_books = 5 if user['membership_type'] == 'Premium' else 3
-
-            if active_borrows >= max_books:
-                return False, f"Borrowing limit reached. Maximum {max_books} books allowed."
-
-            # Create transaction
-            due_date = (datetime.now() + timedelta(days=14)
-                        ).strftime('%Y-%m-%d')
-            transaction_query = """INSERT INTO transactions 
-                                  (user_id, book_isbn, transaction_type, due_date, status) 
-                                  VALUES (%s, %s, 'borrow', %s, 'active')"""
-            transaction_id = self.db_manager.execute_query(
-                transaction_query,
-                (user_id, book_isbn, due_date)
-            )
-
-            # Update book availability
-            update_book_query = "UPDATE books SET available_copies = available_copies - 1 WHERE isbn = %s"
-            self.db_manager.execute_query(update_book_query, (book_isbn,))
-
-            return True, f"Book '{book['title']}' borrowed successfully. Due date: {due_date}"
+            with self.db_manager.transaction() as tx:
+                check_result = tx.execute(
+                    self.BORROW_CHECK_QUERY, (book_isbn, user_id), fetch=True)
+                if not check_result:
+                    return False, "User not found or inactive"
+
+                user = check_result[0]
+                if user['title'] is None:
+                    return False, "Book not found or not available"
+
+                max_books = User.loan_limit(user['membership_type'])
+                if user['active_loans'] >= max_books:
+                    return False, f"Borrowing limit reached. Maximum {max_books} books allowed."
+
+                # Claim a free copy; SKIP LOCKED passes over copies other
+                # checkouts are claiming, so the last copy can't be oversold
+                copy_id = self.inventory.allocate(tx, book_isbn)
+                if copy_id is None:
+                    return False, "Book not found or not available"
+
+                # Create transaction
+                due_date = self._due_date()
+                transaction_id = tx.execute(self.INSERT_LOAN,
+                                            (user_id, book_isbn, copy_id, due_date))
+                tx.execute(self.ADJUST_ACTIVE_LOANS, (1, user_id))
+                self.inventory.refresh(tx, [book_isbn])
+
+            self._borrowed(user_id, book_isbn, copy_id, transaction_id, due_date)
+            return True, self._borrow_message(user['title'], due_date)
 
         except Exception as e:
             return False, f"Error borrowing book: {str(e)}"
 
     def return_book(self, user_id, book_isbn):
-        """Return a borrowed book"""
+        """Return a borrowed book (one transaction, one commit)"""
         try:
-            # Find active borrow transaction
-            transaction_query = """SELECT t.*, b.title 
-                                  FROM transactions t
-                                  JOIN books b ON t.book_isbn = b.isbn
-                                  WHERE t.user_id = %s AND t.book_isbn = %s 
-                                  AND t.transaction_type = 'borrow' 
-                                  AND t.return_date IS NULL 
-                                  ORDER BY t.transaction_date DESC LIMIT 1"""
-            transaction_result = self.db_manager.execute_query(
-                transaction_query, (user_id, book_isbn), fetch=True
-            )
-
-            if not transaction_result:
-                return False, "No active borrow transaction found"
-
-            transaction = transaction_result[0]
-            transaction_id = transaction['transaction_id']
-            book_title = transaction['title']
-
-            # Calculate fine if overdue
-            fine_amount = 0.00
-            due_date = transaction['due_date']
-            return_date = datetime.now().date()
-
-            if due_date and return_date > due_date:
-                days_overdue = (return_date - due_date).days
-                fine_amount = days_overdue * 2.00  # $2 per day
-
-            # Update transaction
-            update_transaction = """UPDATE transactions 
-                                   SET return_date = %s, fine_amount = %s, 
-                                   status = 'completed' 
-                                   WHERE transaction_id = %s"""
-            self.db_manager.execute_query(
-                update_transaction,
-                (return_date, fine_amount, transaction_id)
-            )
-
-            # Update book availability
-            update_book = "UPDATE books SET available_copies = available_copies + 1 WHERE isbn = %s"
-            self.db_manager.execute_query(update_book, (book_isbn,))
-
-            # Add to fines table
-            if fine_amount > 0:
-                fine_query = """INSERT INTO fines 
-                               (user_id, transaction_id, amount, issue_date, status) 
-                               VALUES (%s, %s, %s, %s, 'pending')"""
-                self.db_manager.execute_query(
-                    fine_query,
-                    (user_id, transaction_id, fine_amount, return_date)
-                )
-
-            message = f"Book '{book_title}' returned successfully."
-            if fine_amount > 0:
-                message += f" Overdue fine: ${fine_amount:.2f}"
+            with self.db_manager.transaction() as tx:
+                # Find and lock the active borrow transaction
+                transaction_result = tx.execute(
+                    self.RETURN_LOOKUP_QUERY, (user_id, book_isbn), fetch=True)
+
+                if not transaction_result:
+                    return False, "No active borrow transaction found"
+
+                transaction = transaction_result[0]
+                transaction_id = transaction['transaction_id']
+                book_title = transaction['title']
 
-            return True, message
+                # Calculate fine if overdue
+                return_date = datetime.now().date()
+                fine_amount = self.fine_policy.fine(transaction['due_date'], return_date)
+
+                # Update transaction
+                tx.execute(self.COMPLETE_LOAN, (return_date, fine_amount, transaction_id))
+
+                # Shelve the copy and update the user's open-loan counter
+                self.inventory.release(tx, [transaction['copy_id']])
+                self.inventory.refresh(tx, [book_isbn])
+                tx.execute(self.ADJUST_ACTIVE_LOANS, (-1, user_id))
+
+                # Add to fines table (or settle the amount accrued so far)
+                if fine_amount > 0:
+                    tx.execute(UPSERT_FINES,
+                               (user_id, transaction_id, fine_amount, return_date))
+
+            self._returned(user_id, book_isbn, transaction['copy_id'], transaction_id, fine_amount)
+            return True, self._return_message(book_title, fine_amount)
 
         except Exception as e:
             return False, f"Error returning book: {str(e)}"
 
+    def borrow_many(self, user_id, isbns):
+        """
+        Borrow a stack of books for one user in a single transaction.
+        Returns a list of (isbn, success, message), one per requested ISBN.
+        """
+        results = []
+        try:
+            with self.db_manager.transaction() as tx:
+                # Check user and borrowing limit once for the whole stack
+                user_result = tx.execute(self.BORROWER_QUERY, (user_id,), fetch=True)
+                if not user_result:
+                    return [(isbn, False, "User not found or inactive") for isbn in isbns]
+
+                user = user_result[0]
+                max_books = User.loan_limit(user['membership_type'])
+                slots_left = max_books - user['active_loans']
+
+                # Titles for the messages (plain read, no book row locks)
+                unique_isbns = list(dict.fromkeys(isbns))
+                books = {row['isbn']: row['title'] for row in tx.execute(
+                    self._in_list(self.BOOK_TITLES_QUERY, unique_isbns), unique_isbns,
+                    fetch=True)} if unique_isbns else {}
+
+                due_date = self._due_date()
+                accepted = []
+                copy_ids = []
+                for isbn in isbns:
+                    refusal = self._borrow_refusal(isbn, books, accepted, slots_left, max_books)
+                    copy_id = None if refusal else self.inventory.allocate(tx, isbn)
+                    if copy_id is None:
+                        results.append((isbn, False, refusal or "Book not found or not available"))
+                        continue
+                    accepted.append(isbn)
+                    copy_ids.append(copy_id)
+                    results.append((isbn, True, self._borrow_message(books[isbn], due_date)))
+
+                new_loans = []
+                if accepted:
+                    tx.executemany(self.INSERT_LOAN,
+                                   [(user_id, isbn, copy_id, due_date)
+                                    for isbn, copy_id in zip(accepted, copy_ids)])
+                    tx.execute(self.ADJUST_ACTIVE_LOANS, (len(accepted), user_id))
+                    self.inventory.refresh(tx, accepted)
+
+                    if self.overdue_index is not None or self.event_bus is not None:
+                        new_loans = tx.execute(self._in_list(self.NEW_LOANS_QUERY, copy_ids),
+                                               copy_ids, fetch=True)
+
+            loan_ids = {row['copy_id']: row['transaction_id'] for row in new_loans}
+            for isbn, copy_id in zip(accepted, copy_ids):
+                self._borrowed(user_id, isbn, copy_id, loan_ids.get(copy_id), due_date)
+            return results
+
+        except Exception as e:
+            return [(isbn, False, f"Error borrowing book: {str(e)}") for isbn in isbns]
+
+    def return_many(self, user_id, isbns):
+        """
+        Return a stack of books for one user in a single transaction.
+        Returns a list of (isbn, success, message), one per returned ISBN.
+        """
+        try:
+            with self.db_manager.transaction() as tx:
+                unique_isbns = list(dict.fromkeys(isbns))
+                if not unique_isbns:
+                    return []
+
+                # Lock all of the user's open loans for these books at once
+                open_loans = {}
+                for row in tx.execute(self._in_list(self.RETURN_MANY_QUERY, unique_isbns),
+                                      [user_id] + unique_isbns, fetch=True):
+                    open_loans.setdefault(row['book_isbn'], row)  # Newest loan per book
+
+                return_date = datetime.now().date()
+                results, returned, fines = self._plan_returns(user_id, isbns, open_loans,
+                                                              return_date)
+                if returned:
+                    tx.executemany(self.COMPLETE_LOAN,
+                                   [(return_date, fine_amount, transaction_id)
+                                    for _, _, transaction_id, fine_amount in returned])
+
+                    self.inventory.release(tx, [copy_id for _, copy_id, _, _ in returned])
+                    self.inventory.refresh(tx, [isbn for isbn, _, _, _ in returned])
+                    tx.execute(self.ADJUST_ACTIVE_LOANS, (-len(returned), user_id))
+
+                if fines:
+                    tx.executemany(UPSERT_FINES, fines)
+
+            for isbn, copy_id, transaction_id, fine_amount in returned:
+                self._returned(user_id, isbn, copy_id, transaction_id, fine_amount)
+            return results
+
+        except Exception as e:
+            return [(isbn, False, f"Error returning book: {str(e)}") for isbn in isbns]
+
     def get_user_transactions(self, user_id):
-        """Get all transactions for a user"""
-        query = """SELECT t.*, b.title, b.author 
-                  FROM transactions t 
-                  JOIN books b ON t.book_isbn = b.isbn 
-                  WHERE t.user_id = %s 
-                  ORDER BY t.transaction_date DESC"""
-        return self.db_manager.execute_query(query, (user_id,), fetch=True)
-
-    def get_overdue_books(self):
-        """Get all overdue books"""
-        query = """SELECT u.name as user_name, u.email, b.title, 
-                  t.due_date, DATEDIFF(CURDATE(), t.due_date) as days_overdue
-                  FROM transactions t
-                  JOIN users u ON t.user_id = u.user_id
-                  JOIN books b ON t.book_isbn = b.isbn
-                  WHERE t.transaction_type = 'borrow' 
-                  AND t.return_date IS NULL 
-                  AND t.due_date < CURDATE()"""
-        return self.db_manager.execute_query(query, fetch=True)
-
-    def search_books(self, title=None, author=None, genre=None, available_only=False):
-        """Search for books with filters"""
+        """Get all transactions for a user (archived ones included)"""
+        query, params = history_query(user_id)
+        return self.db_manager.execute_query(query, params, fetch=True)
+
+    def get_user_transactions_page(self, user_id, cursor=None, limit=50):
+        """
+        One page of a user's transactions, newest first (keyset pagination),
+        read across the hot and archive tables.
+        Returns (transactions, next_cursor); next_cursor is None on the last page.
+        """
+        query, params = history_query(user_id, decode_cursor(cursor) if cursor else None, limit)
+        transactions = self.db_manager.execute_query(query, params, fetch=True) or []
+        return transactions, self._history_cursor(transactions, limit)
+
+    def iter_user_transactions(self, user_id, page_size=500):
+        """Yield a user's transactions newest first, one page in memory at a time"""
+        cursor = None
+        while True:
+            transactions, cursor = self.get_user_transactions_page(
+                user_id, cursor, page_size)
+            yield from transactions
+            if cursor is None:
+                break
+
+    def get_overdue_books(self, user_id=None):
+        """
+        Get all overdue books (optionally for one user), most overdue first.
+        Same columns and order as get_overdue_page, with or without the index.
+        """
+        loans, _ = self._open_loans_page(None, date.today(), user_id, None, None)
+        return loans
+
+    def get_overdue_page(self, cursor=None, limit=50, user_id=None):
+        """
+        One page of overdue loans, most overdue first (keyset pagination).
+        Returns (loans, next_cursor); next_cursor is None on the last page.
+        """
+        return self._open_loans_page(None, date.today(), user_id, cursor, limit)
+
+    def get_due_soon(self, days=3, cursor=None, limit=50, user_id=None):
+        """One page of open loans due today or within the next days days"""
+        today = date.today()
+        return self._open_loans_page(today, today + timedelta(days=days + 1),
+                                     user_id, cursor, limit)
+
+    def _open_loans_page(self, start, end, user_id, cursor, limit):
+        """
+        Open loans due in [start, end), ordered by (due_date, transaction_id).
+        Reads the range from the overdue index when there is one, otherwise
+        from transactions.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        if self.overdue_index is not None:
+            keys = self.overdue_index.range(start, end, user_id, after, limit)
+            loans = self._loans_by_id([transaction_id for _, transaction_id in keys])
+        else:
+            query, params = self._open_loans_query(start, end, user_id, after, limit)
+            loans = self.db_manager.execute_query(query, params, fetch=True) or []
+        return self._loans_page(loans, limit)
+
+    def _loans_by_id(self, transaction_ids):
+        """Hydrate open loans by primary key, keeping the given order"""
+        found = {}
+        for query, chunk in self._loan_chunks(transaction_ids):
+            for row in self.db_manager.execute_query(query, chunk, fetch=True) or []:
+                found[row['transaction_id']] = row
+        return [found[t] for t in transaction_ids if t in found]
+
+    def search_books(self, title=None, author=None, genre=None, available_only=False, text=None):
+        """Search for books with filters (ranked from the search index when one is loaded)"""
         try:
+            if self.search_index is not None:
+                return self.search_index.search(text, title, author, genre, available_only)
+
             query = "SELECT * FROM books WHERE 1=1"
             params = []
 
+            if text:
+                query += " AND (title LIKE %s OR author LIKE %s OR genre LIKE %s OR description LIKE %s)"
+                params.extend([f"%{text}%"] * 4)
             if title:
                 query += " AND title LIKE %s"
                 params.append(f"%{title}%")
@@ -170,24 +515,35 @@ class LibraryManager:
             print(f"Error searching books: {e}")
             return []
 
+    def repair_loan_counters(self):
+        """
+        Recompute users.active_loans from transactions and the books'
+        available/active-loan counters from their copies (set-based).
+        Returns how many user and book rows had drifted.
+        """
+        repaired = []
+        with self.db_manager.transaction() as tx:
+            for statement in (REPAIR_ACTIVE_LOANS[0], REPAIR_BOOK_COUNTERS):
+                tx.execute(statement)
+                repaired.append(tx.rowcount)
+        if self.cache is not None:
+            self.cache.invalidate_books()
+        return {'users': repaired[0], 'books': repaired[1]}
+
+    def accrue_fines(self, as_of=None):
+        """Nightly job: upsert the current fine of every overdue open loan"""
+        return FineAccrual(self.db_manager, self.fine_policy).run(as_of)
+
+    def archive_history(self, min_age_days=None, as_of=None):
+        """Nightly job: move old completed loans and settled fines to the archive tables"""
+        return TransactionArchiver(self.db_manager, min_age_days).run(as_of)
+
     def calculate_fine(self, transaction_id):
         """Calculate fine for a specific transaction"""
-        query = """SELECT due_date, return_date, fine_amount 
-                  FROM transactions 
-                  WHERE transaction_id = %s"""
-        result = self.db_manager.execute_query(
-            query, (transaction_id,), fetch=True)
-
-        if not result:
-            return 0.00
-
-        transaction = result[0]
-
-        if transaction['return_date'] is None and transaction['due_date']:
-            # Still borrowed, check if overdue
-            if datetime.now().date() > transaction['due_date']:
-                days_overdue = (datetime.now().date() -
-                                transaction['due_date']).days
-                return days_overdue * 2.00
-
-        return transaction.get('fine_amount', 0.00)
+        # Archived loans are all returned, so their fine is final
+        for table in ('transactions', 'transactions_archive'):
+            result = self.db_manager.execute_query(
+                self.LOAN_FINE_QUERY.format(table=table), (transaction_id,), fetch=True)
+            if result:
+                return self._loan_fine(result[0])
+        return 0.00
@@ -1,8 +1,17 @@
 # models.py
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from operator import itemgetter
 
+from fine_accrual import FinePolicy
+
+
+# Models use __slots__: no per-instance __dict__, which keeps large result
+# sets (tens of thousands of books or transactions) small and fast to build.
 
 class Person:
+    __slots__ = ('name', 'email', 'phone')
+
     def __init__(self, name, email, phone):
         self.name = name
         self.email = email
@@ -13,6 +22,9 @@ class Person:
 
 
 class User(Person):
+    __slots__ = ('user_id', 'username', 'role', 'membership_type', 'is_active',
+                 'max_books', 'password')
+
     def __init__(self, user_id, username, name, email, phone, role="user", memebership_type="Standard", is_active=True):
         super().__init__(name, email, phone)
         self.user_id = user_id
@@ -20,7 +32,13 @@ class User(Person):
         self.role = role
         self.membership_type = memebership_type
         self.is_active = is_active           # <-- This enables/disables borrowing
-        self.max_books = 5 if memebership_type == "Premium" else 3
+        self.max_books = User.loan_limit(memebership_type)
+        self.password = None                 # Plain password, only set for CRUDManager.add_user
+
+    @staticmethod
+    def loan_limit(membership_type):
+        """Books a member of this type may have out at once"""
+        return 5 if membership_type == "Premium" else 3
 
     def can_borrow(self, current_borrowed_count):
         return current_borrowed_count < self.max_books and self.is_active
@@ -31,6 +49,8 @@ class User(Person):
 
 
 class Admin(User):
+    __slots__ = ('department',)
+
     def __init__(self, user_id, username, name, email, phone, department="General", is_active=True):
         super().__init__(user_id, username, name, email,
                          phone, "admin", "Premium", is_active)
@@ -42,6 +62,10 @@ class Admin(User):
 
 
 class Book:
+    __slots__ = ('isbn', 'title', 'author', 'publication_year', 'total_copies',
+                 'available_copies', 'genre', 'price', 'description',
+                 'is_available_flag')
+
     def __init__(self, isbn, title, author, publication_year, total_copies=1, genre=None, price=0.00, description=""):
         self.isbn = isbn
         self.title = title
@@ -76,6 +100,10 @@ class Book:
 
 
 class Transaction:
+    __slots__ = ('transaction_id', 'user_id', 'book_isbn', 'transaction_type',
+                 'transaction_date', 'due_date', 'return_date', 'status',
+                 'fine_amount', 'fine_paid')
+
     def __init__(self, transaction_id, user_id, book_isbn, transaction_type):
         # Basic transaction information
         self.transaction_id = transaction_id
@@ -114,8 +142,7 @@ class Transaction:
     def calculate_fine(self):
         """Calculate fine for overdue books"""
         if self.is_overdue():
-            days_overdue = (datetime.now().date() - self.due_date.date()).days
-            self.fine_amount = days_overdue * 2.00  # $2 per day
+            self.fine_amount = FinePolicy.from_config().fine(self.due_date)
             return self.fine_amount
         else:
             self.fine_amount = 0.00  # ← SETS to 0 if not overdue
@@ -216,6 +243,122 @@ class Transaction:
             return max(0, days_left)
         return None  # Not applicable for return transactions
 
+
+# ============= ROW MAPPING =============
+
+def _as_datetime(value):
+    """DATE columns come back as date; Transaction compares against datetime"""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, time())
+    return value
+
+
+class RowMapper:
+    """
+    Builds models from database rows.
+    Column positions are worked out once per result set (from the cursor's
+    column names), so each row is unpacked with one itemgetter call instead
+    of repeated dict lookups. Use RowMapper.for_columns() to share mappers.
+    """
+
+    BOOK_FIELDS = (('isbn', None), ('title', None), ('author', None),
+                   ('publication_year', None), ('total_copies', 1),
+                   ('available_copies', None), ('genre', None),
+                   ('price', 0.00), ('description', ''))
+    USER_FIELDS = (('user_id', None), ('username', None), ('name', None),
+                   ('email', None), ('phone', None), ('role', 'user'),
+                   ('membership_type', 'Standard'), ('is_active', True),
+                   ('department', 'General'))
+    TRANSACTION_FIELDS = (('transaction_id', None), ('user_id', None),
+                          ('book_isbn', None), ('transaction_type', None),
+                          ('transaction_date', None), ('due_date', None),
+                          ('return_date', None), ('status', None),
+                          ('fine_amount', 0.00), ('fine_paid', False))
+
+    def __init__(self, columns, by_name=False):
+        """
+        columns: column names in row order (cursor.column_names)
+        by_name: rows are dicts keyed by column name rather than tuples
+        """
+        self.columns = tuple(columns)
+        self.positions = {name: (name if by_name else i)
+                          for i, name in enumerate(self.columns)}
+        self._book = self._getter(self.BOOK_FIELDS)
+        self._user = self._getter(self.USER_FIELDS)
+        self._transaction = self._getter(self.TRANSACTION_FIELDS)
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def for_columns(columns, by_name=False):
+        """Shared mapper per distinct column list"""
+        return RowMapper(columns, by_name)
+
+    def _getter(self, fields):
+        """Extract fields from a row in one call; missing columns use their defaults"""
+        positions = [self.positions.get(column) for column, _ in fields]
+        if all(p is not None for p in positions):
+            return itemgetter(*positions)
+        defaults = [default for _, default in fields]
+        return lambda row: tuple(row[p] if p is not None else d
+                                 for p, d in zip(positions, defaults))
+
+    def get(self, row, column, default=None):
+        """A single column value from a row"""
+        position = self.positions.get(column)
+        return row[position] if position is not None else default
+
+    def book(self, row):
+        (isbn, title, author, year, total, available,
+         genre, price, description) = self._book(row)
+        book = Book.__new__(Book)  # Skip __init__, every field comes from the row
+        book.isbn = isbn
+        book.title = title
+        book.author = author
+        book.publication_year = year
+        book.total_copies = total
+        book.available_copies = total if available is None else available
+        book.genre = genre
+        book.price = price
+        book.description = description
+        book.is_available_flag = True
+        return book
+
+    def user(self, row):
+        """User or Admin depending on the role column"""
+        (user_id, username, name, email, phone, role,
+         membership_type, is_active, department) = self._user(row)
+        if role == 'admin':
+            return Admin(user_id, username, name, email, phone,
+                         department or 'General', is_active)
+        return User(user_id, username, name, email, phone,
+                    role, membership_type, is_active)
+
+    def transaction(self, row):
+        (transaction_id, user_id, book_isbn, transaction_type, transaction_date,
+         due_date, return_date, status, fine_amount, fine_paid) = self._transaction(row)
+        transaction = Transaction.__new__(Transaction)
+        transaction.transaction_id = transaction_id
+        transaction.user_id = user_id
+        transaction.book_isbn = book_isbn
+        transaction.transaction_type = transaction_type
+        transaction.transaction_date = _as_datetime(transaction_date)
+        transaction.due_date = _as_datetime(due_date)
+        transaction.return_date = _as_datetime(return_date)
+        transaction.status = status
+        transaction.fine_amount = float(fine_amount or 0.00)
+        transaction.fine_paid = bool(fine_paid)
+        return transaction
+
+    def books(self, rows):
+        return [self.book(row) for row in rows]
+
+    def users(self, rows):
+        return [self.user(row) for row in rows]
+
+    def transactions(self, rows):
+        return [self.transaction(row) for row in rows]
+
+
 # Test function
 
 
@@ -254,6 +397,12 @@ def test_models():
     # Should be None
     print(f"✅ Return transaction due date: {return_transaction.due_date}")
 
+    # Test row mapper
+    mapper = RowMapper.for_columns(('isbn', 'title', 'author', 'publication_year',
+                                    'total_copies', 'available_copies'))
+    mapped = mapper.book(("456", "Mapped Book", "Author", 2024, 3, 1))
+    print(f"✅ Mapped book: {mapped.get_book_info()}, copies {mapped.available_copies}/{mapped.total_copies}")
+
 
 if __name__ == "__main__":
     test_models()
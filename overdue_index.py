@@ -0,0 +1,155 @@
+# overdue_index.py
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+
+
+def _ordinal(value):
+    """Day number of a date, datetime or 'YYYY-MM-DD' string"""
+    if isinstance(value, datetime):
+        return value.toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class OverdueIndex:
+    """
+    Open loans kept sorted by due date, so "overdue" and "due soon" are
+    range reads instead of scans of transactions.
+    - Entries are (due day, transaction_id); ties break on the loan id,
+      which also makes a stable keyset cursor
+    - load() fills it once from the database; borrow/return keep it current
+    """
+
+    def __init__(self):
+        self._keys = []        # sorted (due ordinal, transaction_id)
+        self._loans = {}       # transaction_id -> (due ordinal, user_id)
+        self._by_user = {}     # user_id -> set(transaction_id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._loans)
+
+    # ============= INDEX MAINTENANCE =============
+
+    def load(self, db_manager, batch_size=10000):
+        """Rebuild from every open loan (one streamed query)"""
+        query = """SELECT transaction_id, user_id, due_date FROM transactions
+                   WHERE transaction_type = 'borrow' AND return_date IS NULL
+                   AND due_date IS NOT NULL"""
+        keys, loans, by_user = [], {}, {}
+        for transaction_id, user_id, due_date in db_manager.stream_query(
+                query, batch_size=batch_size, dictionary=False):
+            due = _ordinal(due_date)
+            keys.append((due, transaction_id))
+            loans[transaction_id] = (due, user_id)
+            by_user.setdefault(user_id, set()).add(transaction_id)
+        keys.sort()
+        with self._lock:
+            self._keys, self._loans, self._by_user = keys, loans, by_user
+        return len(keys)
+
+    def add(self, transaction_id, user_id, due_date):
+        """Track a new loan (call after the borrow commits)"""
+        due = _ordinal(due_date)
+        with self._lock:
+            if transaction_id in self._loans:
+                self._remove(transaction_id)
+            insort(self._keys, (due, transaction_id))
+            self._loans[transaction_id] = (due, user_id)
+            self._by_user.setdefault(user_id, set()).add(transaction_id)
+
+    def remove(self, transaction_id):
+        """Stop tracking a returned loan; False if it was not tracked"""
+        with self._lock:
+            if transaction_id not in self._loans:
+                return False
+            self._remove(transaction_id)
+            return True
+
+    def change_due_date(self, transaction_id, due_date):
+        """Move a loan after a renewal or due-date correction"""
+        with self._lock:
+            loan = self._loans.get(transaction_id)
+            if loan is None:
+                return False
+            self._remove(transaction_id)
+            due = _ordinal(due_date)
+            insort(self._keys, (due, transaction_id))
+            self._loans[transaction_id] = (due, loan[1])
+            self._by_user.setdefault(loan[1], set()).add(transaction_id)
+            return True
+
+    def _remove(self, transaction_id):
+        due, user_id = self._loans.pop(transaction_id)
+        i = bisect_left(self._keys, (due, transaction_id))
+        del self._keys[i]
+        user_loans = self._by_user[user_id]
+        user_loans.discard(transaction_id)
+        if not user_loans:
+            del self._by_user[user_id]
+
+    # ============= RANGE READS =============
+
+    def range(self, start=None, end=None, user_id=None, after=None, limit=None):
+        """
+        Loans due on or after start and before end (dates, either open),
+        oldest due date first, as (due_date, transaction_id) pairs.
+        after is the (due_date, transaction_id) of the previous page's last row.
+        """
+        with self._lock:
+            if user_id is not None:
+                keys = sorted((self._loans[t][0], t) for t in self._by_user.get(user_id, ()))
+            else:
+                keys = self._keys
+            i = bisect_left(keys, (_ordinal(start), 0)) if start is not None else 0
+            if after is not None:
+                # Keyset cursor is exclusive
+                i = max(i, bisect_right(keys, (_ordinal(after[0]), after[1])))
+            j = bisect_left(keys, (_ordinal(end), 0)) if end is not None else len(keys)
+            if limit is not None:
+                j = min(j, i + limit)
+            return [(date.fromordinal(due), transaction_id) for due, transaction_id in keys[i:j]]
+
+    def count(self, start=None, end=None):
+        """Number of loans due in [start, end)"""
+        with self._lock:
+            i = bisect_left(self._keys, (_ordinal(start), 0)) if start is not None else 0
+            j = bisect_left(self._keys, (_ordinal(end), 0)) if end is not None else len(self._keys)
+            return max(0, j - i)
+
+    def stats(self):
+        with self._lock:
+            today = date.today().toordinal()
+            return {
+                'open_loans': len(self._keys),
+                'users': len(self._by_user),
+                'overdue': bisect_left(self._keys, (today, 0))
+            }
+
+# Test function
+
+
+def test_overdue_index():
+    print("🧪 Testing Overdue Index...")
+    from datetime import timedelta
+
+    today = date.today()
+    index = OverdueIndex()
+    index.add(1, 10, today - timedelta(days=5))
+    index.add(2, 11, today - timedelta(days=1))
+    index.add(3, 10, today + timedelta(days=2))
+    index.add(4, 12, today + timedelta(days=10))
+
+    print(f"✅ Overdue: {index.range(end=today)}")
+    print(f"✅ Due in 3 days: {index.range(start=today, end=today + timedelta(days=4))}")
+    print(f"✅ User 10: {index.range(user_id=10)}")
+    first = index.range(limit=2)
+    print(f"✅ Page 2: {index.range(after=first[-1], limit=2)}")
+    index.remove(1)
+    print(f"✅ Stats after return: {index.stats()}")
+
+
+if __name__ == "__main__":
+    test_overdue_index()
@@ -0,0 +1,233 @@
+# password_hasher.py
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from config import AUTH_CONFIG
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing queue stays full for the whole queue timeout"""
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a bounded worker pool.
+    - bcrypt releases the GIL, so the workers hash in parallel while the
+      rest of the process keeps serving circulation requests
+    - At most workers + queue_size requests are admitted; beyond that
+      callers wait up to queue_timeout, then get HasherBusyError
+    - rounds is the cost for new hashes; needs_rehash() spots older ones
+    """
+
+    def __init__(self, rounds=12, workers=4, queue_size=32, queue_timeout=2):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._async_waiters = deque()   # (loop, future) woken as slots free up
+
+        self._admitted = 0     # submitted and not finished
+        self._running = 0
+        self._peak = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_work = 0.0
+
+    # ============= SYNC API =============
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost"""
+        return self.submit_hash(password).result()
+
+    def verify(self, password, hashed):
+        """True if password matches hashed; False on mismatch or a malformed hash"""
+        return self.submit_verify(password, hashed).result()
+
+    def needs_rehash(self, hashed):
+        """True when hashed was made with a different cost than self.rounds"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    # ============= ASYNC API =============
+
+    def submit_hash(self, password):
+        """Queue a hash; returns a Future of the hash string"""
+        return self._submit(self._hash, password)
+
+    def submit_verify(self, password, hashed):
+        """Queue a verification; returns a Future of bool"""
+        return self._submit(self._verify, password, hashed)
+
+    async def hash_async(self, password):
+        """hash() for asyncio code; waits for a queue slot without blocking the loop"""
+        return await self._submit_async(self._hash, password)
+
+    async def verify_async(self, password, hashed):
+        """verify() for asyncio code; waits for a queue slot without blocking the loop"""
+        return await self._submit_async(self._verify, password, hashed)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._reject()
+        return self._start(fn, *args)
+
+    async def _submit_async(self, fn, *args):
+        deadline = time.monotonic() + self.queue_timeout
+        loop = asyncio.get_running_loop()
+        while not self._slots.acquire(blocking=False):
+            # Park on a future _finished() resolves, instead of blocking the
+            # loop on the semaphore; re-check, as a sync caller may win the slot
+            waiter = loop.create_future()
+            entry = (loop, waiter)
+            with self._lock:
+                self._async_waiters.append(entry)
+            try:
+                await asyncio.wait_for(waiter, max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self._reject()
+            finally:
+                with self._lock:
+                    if entry in self._async_waiters:
+                        self._async_waiters.remove(entry)
+        return await asyncio.wrap_future(self._start(fn, *args))
+
+    def _reject(self):
+        with self._lock:
+            self._rejected += 1
+        raise HasherBusyError(f"Password hashing queue full "
+                              f"({self.workers + self.queue_size} requests in flight)")
+
+    def _start(self, fn, *args):
+        """Hand an admitted request (queue slot already taken) to the workers"""
+        with self._lock:
+            self._admitted += 1
+            self._peak = max(self._peak, self._admitted)
+        try:
+            return self._executor.submit(self._run, fn, time.perf_counter(), *args)
+        except Exception:
+            self._finished()
+            raise
+
+    def _run(self, fn, queued_at, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._total_wait += started - queued_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._total_work += time.perf_counter() - started
+            self._finished()
+
+    def _finished(self):
+        with self._lock:
+            self._admitted -= 1
+            self._completed += 1
+        self._slots.release()
+        self._wake_async_waiter()
+
+    def _wake_async_waiter(self):
+        """Tell the longest-waiting asyncio caller a slot is free"""
+        while True:
+            with self._lock:
+                if not self._async_waiters:
+                    return
+                loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._resolve_waiter, waiter)
+                return
+            except RuntimeError:   # Its loop is closed; try the next one
+                continue
+
+    def _resolve_waiter(self, waiter):
+        if waiter.done():          # Timed out meanwhile; pass the slot on
+            self._wake_async_waiter()
+        else:
+            waiter.set_result(None)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'),
+                             bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    def _verify(self, password, hashed):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except (ValueError, AttributeError) as e:
+            print(f"Password verification error: {e}")
+            return False
+
+    # ============= METRICS =============
+
+    def stats(self):
+        """Queue depth and timing, for capping login concurrency"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'rounds': self.rounds,
+                'running': self._running,
+                'queued': self._admitted - self._running,
+                'peak_in_flight': self._peak,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': (self._total_wait / self._completed * 1000) if self._completed else 0.0,
+                'avg_work_ms': (self._total_work / self._completed * 1000) if self._completed else 0.0,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+_default_hasher = None
+_default_lock = threading.Lock()
+
+
+def default_hasher():
+    """Process-wide hasher built from config.AUTH_CONFIG, shared by auth and CRUD"""
+    global _default_hasher
+    with _default_lock:
+        if _default_hasher is None:
+            _default_hasher = PasswordHasher(
+                rounds=AUTH_CONFIG['bcrypt_rounds'],
+                workers=AUTH_CONFIG['hash_workers'],
+                queue_size=AUTH_CONFIG['hash_queue_size'],
+                queue_timeout=AUTH_CONFIG['hash_queue_timeout'])
+        return _default_hasher
+
+# Test function
+
+
+def test_password_hasher():
+    print("🧪 Testing Password Hasher...")
+    hasher = PasswordHasher(rounds=4, workers=2, queue_size=2)
+
+    hashed = hasher.hash("secret")
+    print(f"✅ Verify correct: {hasher.verify('secret', hashed)}")
+    print(f"✅ Verify wrong rejected: {not hasher.verify('nope', hashed)}")
+
+    stronger = PasswordHasher(rounds=5, workers=1, queue_size=0)
+    print(f"✅ Needs rehash at new cost: {stronger.needs_rehash(hashed)}")
+
+    futures = [hasher.submit_verify("secret", hashed) for _ in range(4)]
+    print(f"✅ Parallel verifies: {[f.result() for f in futures]}")
+    print(f"✅ Stats: {hasher.stats()}")
+    hasher.close()
+    stronger.close()
+
+
+if __name__ == "__main__":
+    test_password_hasher()
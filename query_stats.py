@@ -0,0 +1,208 @@
+# query_stats.py
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+
+# Latency histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize(query):
+    """
+    Reduce a statement to its shape so calls with different values group together:
+    literals and placeholders become ?, IN lists collapse to IN (...)
+    """
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    query = _PLACEHOLDER.sub("?", query)
+    query = _IN_LIST.sub("IN (...)", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class StatementStats:
+    """Counters and latency histogram for one normalized statement"""
+
+    __slots__ = ('statement', 'calls', 'errors', 'rows', 'total_ms', 'min_ms',
+                 'max_ms', 'buckets')
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.min_ms = math.inf
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def record(self, elapsed_ms, rows, error):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.rows += rows or 0
+        self.total_ms += elapsed_ms
+        self.min_ms = min(self.min_ms, elapsed_ms)
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            'statement': self.statement,
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'min_ms': self.min_ms if self.calls else 0.0,
+            'max_ms': self.max_ms,
+            'histogram': {('+Inf' if bound == math.inf else str(bound)): count
+                          for bound, count in zip(BUCKETS_MS, self.buckets)},
+        }
+
+
+class QueryStats:
+    """
+    Per-statement instrumentation for DatabaseManager.
+    - Call counts, errors, rows and a latency histogram per normalized statement
+    - A bounded slow-query log (optionally with the EXPLAIN plan)
+    - export('json' | 'openmetrics') for whatever scrapes the numbers
+    """
+
+    def __init__(self, slow_query_ms=100, slow_log_size=200, explain_slow=False,
+                 max_statements=500, log_params=False):
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow = explain_slow
+        self.max_statements = max_statements  # Beyond this, shapes share one bucket
+        self.log_params = log_params          # Off by default: params can hold passwords
+        self._statements = {}
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._explained = {}                  # statement -> plan, explained once each
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self, query, params, elapsed_s, rows=0, error=None):
+        """
+        Record one execution. Returns True when the statement was slow and
+        still needs an EXPLAIN plan (see attach_explain).
+        """
+        statement = normalize(query)
+        elapsed_ms = elapsed_s * 1000
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    statement = '(other statements)'
+                    stats = self._statements.get(statement)
+                if stats is None:
+                    stats = self._statements[statement] = StatementStats(statement)
+            stats.record(elapsed_ms, rows, error)
+
+            if elapsed_ms < self.slow_query_ms:
+                return False
+            self._slow_log.append({
+                'statement': statement,
+                'query': query if len(query) <= 2000 else query[:2000] + "...",
+                'params': repr(params)[:500] if self.log_params else None,
+                'duration_ms': elapsed_ms,
+                'rows': rows,
+                'error': str(error) if error else None,
+                'at': time.time(),
+                'explain': self._explained.get(statement),
+            })
+            return (self.explain_slow and not error and statement not in self._explained
+                    and query.lstrip()[:6].upper() == 'SELECT')
+
+    def attach_explain(self, query, plan):
+        """Store the plan for a slow statement and add it to its latest log entry"""
+        statement = normalize(query)
+        with self._lock:
+            self._explained[statement] = plan
+            for entry in reversed(self._slow_log):
+                if entry['statement'] == statement:
+                    entry['explain'] = plan
+                    break
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow_log.clear()
+            self._explained.clear()
+            self.started_at = time.time()
+
+    # ============= EXPORT =============
+
+    def snapshot(self, top=None):
+        """All counters as plain data, busiest statements (by total time) first"""
+        with self._lock:
+            statements = sorted((s.as_dict() for s in self._statements.values()),
+                                key=lambda s: s['total_ms'], reverse=True)
+            slow_log = [dict(entry) for entry in self._slow_log]
+        if top is not None:
+            statements = statements[:top]
+        return {
+            'since': self.started_at,
+            'slow_query_ms': self.slow_query_ms,
+            'statements': statements,
+            'slow_queries': slow_log,
+        }
+
+    def to_json(self, top=None):
+        return json.dumps(self.snapshot(top), default=str, indent=2)
+
+    def to_openmetrics(self):
+        """Prometheus/OpenMetrics text exposition of the per-statement counters"""
+        lines = [
+            "# TYPE library_db_query_duration_milliseconds histogram",
+            "# HELP library_db_query_duration_milliseconds Statement latency",
+        ]
+        snapshot = self.snapshot()
+        for stats in snapshot['statements']:
+            label = _label(stats['statement'])
+            cumulative = 0
+            for bound, count in stats['histogram'].items():
+                cumulative += count
+                lines.append(f'library_db_query_duration_milliseconds_bucket'
+                             f'{{statement="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'library_db_query_duration_milliseconds_sum'
+                         f'{{statement="{label}"}} {stats["total_ms"]}')
+            lines.append(f'library_db_query_duration_milliseconds_count'
+                         f'{{statement="{label}"}} {stats["calls"]}')
+        for name, key, help_text in (('errors', 'errors', 'Failed executions'),
+                                     ('rows', 'rows', 'Rows returned or affected')):
+            lines.append(f"# TYPE library_db_query_{name} counter")
+            lines.append(f"# HELP library_db_query_{name} {help_text}")
+            for stats in snapshot['statements']:
+                lines.append(f'library_db_query_{name}_total'
+                             f'{{statement="{_label(stats["statement"])}"}} {stats[key]}')
+        lines.append("# TYPE library_db_slow_queries gauge")
+        lines.append(f"library_db_slow_queries {len(snapshot['slow_queries'])}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def export(self, fmt='json'):
+        """Exporter hook: pull the current snapshot as 'json' or 'openmetrics' text"""
+        if fmt == 'json':
+            return self.to_json()
+        if fmt == 'openmetrics':
+            return self.to_openmetrics()
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def _label(statement):
+    """Escape a statement for use as an OpenMetrics label value"""
+    return statement.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")[:200]
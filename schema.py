@@ -0,0 +1,604 @@
+# schema.py
+"""
+Owns the library schema: table DDL for MySQL and SQLite, the indexes the hot
+queries rely on, versioned migrations and an EXPLAIN-based check that those
+queries really use them.
+
+    python schema.py status
+    python schema.py migrate
+    python schema.py verify            # exit code 1 if a hot query scans or sorts
+    python schema.py verify --backend sqlite --db library.db
+"""
+import argparse
+import sys
+from datetime import datetime
+
+
+# ============= TABLES =============
+
+TABLES = {
+    'mysql': [
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) NOT NULL UNIQUE,
+            password VARCHAR(255) NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(100) NOT NULL UNIQUE,
+            phone VARCHAR(20),
+            role VARCHAR(20) NOT NULL DEFAULT 'user',
+            membership_type VARCHAR(20) NOT NULL DEFAULT 'Standard',
+            is_active BOOLEAN NOT NULL DEFAULT TRUE,
+            department VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login DATETIME NULL
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS books (
+            isbn VARCHAR(20) PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            author VARCHAR(255) NOT NULL,
+            publication_year INT,
+            total_copies INT NOT NULL DEFAULT 1,
+            available_copies INT NOT NULL DEFAULT 1,
+            genre VARCHAR(50),
+            price DECIMAL(10, 2) DEFAULT 0.00,
+            description TEXT,
+            added_by INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (added_by) REFERENCES users(user_id)
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            book_isbn VARCHAR(20) NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            transaction_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            due_date DATE,
+            return_date DATE,
+            status VARCHAR(20) NOT NULL DEFAULT 'active',
+            fine_amount DECIMAL(10, 2) DEFAULT 0.00,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (book_isbn) REFERENCES books(isbn)
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS fines (
+            fine_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            transaction_id INT NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            issue_date DATE NOT NULL,
+            paid_date DATE,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (transaction_id) REFERENCES transactions(transaction_id)
+        ) ENGINE=InnoDB""",
+    ],
+    'sqlite': [
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT,
+            role TEXT NOT NULL DEFAULT 'user',
+            membership_type TEXT NOT NULL DEFAULT 'Standard',
+            is_active BOOLEAN NOT NULL DEFAULT 1,
+            department TEXT,
+            created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            last_login DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS books (
+            isbn TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            publication_year INTEGER,
+            total_copies INTEGER NOT NULL DEFAULT 1,
+            available_copies INTEGER NOT NULL DEFAULT 1,
+            genre TEXT,
+            price REAL DEFAULT 0.00,
+            description TEXT,
+            added_by INTEGER REFERENCES users(user_id),
+            created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )""",
+        """CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(user_id),
+            book_isbn TEXT NOT NULL REFERENCES books(isbn),
+            transaction_type TEXT NOT NULL,
+            transaction_date DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+            due_date DATE,
+            return_date DATE,
+            status TEXT NOT NULL DEFAULT 'active',
+            fine_amount REAL DEFAULT 0.00
+        )""",
+        """CREATE TABLE IF NOT EXISTS fines (
+            fine_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(user_id),
+            transaction_id INTEGER NOT NULL REFERENCES transactions(transaction_id),
+            amount REAL NOT NULL,
+            issue_date DATE NOT NULL,
+            paid_date DATE,
+            status TEXT NOT NULL DEFAULT 'pending'
+        )""",
+    ],
+}
+
+VERSION_TABLE = {
+    'mysql': """CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at DATETIME NOT NULL
+                ) ENGINE=InnoDB""",
+    'sqlite': """CREATE TABLE IF NOT EXISTS schema_version (
+                     version INTEGER PRIMARY KEY,
+                     description TEXT NOT NULL,
+                     applied_at DATETIME NOT NULL
+                 )""",
+}
+
+
+# ============= MIGRATION STEPS =============
+# Each step is a function(cursor, dialect). They check before they change, so
+# databases created before migrations existed can be brought under version control.
+
+def create_tables(cursor, dialect):
+    for ddl in TABLES[dialect]:
+        cursor.execute(ddl)
+
+
+def add_column(table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    def step(cursor, dialect):
+        cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+        existing = [d[0] for d in cursor.description]
+        cursor.fetchall()
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition[dialect]}")
+    return step
+
+
+def create_index(name, table, columns, unique=False):
+    """CREATE [UNIQUE] INDEX unless an index of that name already exists"""
+    def step(cursor, dialect):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        column_list = ", ".join(columns)
+        if dialect == 'sqlite':
+            cursor.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({column_list})")
+            return
+        cursor.execute("""SELECT COUNT(*) FROM information_schema.statistics
+                          WHERE table_schema = DATABASE() AND table_name = %s
+                          AND index_name = %s""", (table, name))
+        if not cursor.fetchall()[0][0]:
+            cursor.execute(f"CREATE {kind} {name} ON {table} ({column_list})")
+    return step
+
+
+# Recompute the denormalized open-loan counters from transactions (set-based;
+# only rows that drifted are written, so rowcount is the number repaired)
+REPAIR_ACTIVE_LOANS = [
+    """UPDATE users SET active_loans =
+           (SELECT COUNT(*) FROM transactions t WHERE t.user_id = users.user_id
+            AND t.transaction_type = 'borrow' AND t.return_date IS NULL)
+       WHERE active_loans <>
+           (SELECT COUNT(*) FROM transactions t WHERE t.user_id = users.user_id
+            AND t.transaction_type = 'borrow' AND t.return_date IS NULL)""",
+    """UPDATE books SET active_loans =
+           (SELECT COUNT(*) FROM transactions t WHERE t.book_isbn = books.isbn
+            AND t.transaction_type = 'borrow' AND t.return_date IS NULL)
+       WHERE active_loans <>
+           (SELECT COUNT(*) FROM transactions t WHERE t.book_isbn = books.isbn
+            AND t.transaction_type = 'borrow' AND t.return_date IS NULL)""",
+]
+
+
+# Books' derived counters from their copies (set-based, drifted rows only)
+REPAIR_BOOK_COUNTERS = """UPDATE books SET
+    available_copies = (SELECT COUNT(*) FROM book_copies c
+                        WHERE c.isbn = books.isbn AND c.status = 'available'),
+    active_loans = (SELECT COUNT(*) FROM book_copies c
+                    WHERE c.isbn = books.isbn AND c.status = 'on_loan')
+    WHERE available_copies <> (SELECT COUNT(*) FROM book_copies c
+                               WHERE c.isbn = books.isbn AND c.status = 'available')
+    OR active_loans <> (SELECT COUNT(*) FROM book_copies c
+                        WHERE c.isbn = books.isbn AND c.status = 'on_loan')"""
+
+
+def repair_active_loans(cursor, dialect):
+    for statement in REPAIR_ACTIVE_LOANS:
+        cursor.execute(statement)
+
+
+COPIES_TABLE = {
+    'mysql': """CREATE TABLE IF NOT EXISTS book_copies (
+                    copy_id INT AUTO_INCREMENT PRIMARY KEY,
+                    isbn VARCHAR(20) NOT NULL,
+                    barcode VARCHAR(64) NOT NULL UNIQUE,
+                    status VARCHAR(20) NOT NULL DEFAULT 'available',
+                    condition_note VARCHAR(255),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (isbn) REFERENCES books(isbn)
+                ) ENGINE=InnoDB""",
+    'sqlite': """CREATE TABLE IF NOT EXISTS book_copies (
+                     copy_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     isbn TEXT NOT NULL REFERENCES books(isbn),
+                     barcode TEXT NOT NULL UNIQUE,
+                     status TEXT NOT NULL DEFAULT 'available',
+                     condition_note TEXT,
+                     created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+                 )""",
+}
+
+
+def _params(dialect, query):
+    """Migration steps run on raw cursors, so use the driver's placeholder"""
+    return query.replace("%s", "?") if dialect == 'sqlite' else query
+
+
+def create_copies_table(cursor, dialect):
+    cursor.execute(COPIES_TABLE[dialect])
+
+
+def backfill_copies(cursor, dialect):
+    """
+    One copy row per books.total_copies for books that have none yet, then
+    attach every open loan to one of its book's copies
+    """
+    cursor.execute("""SELECT isbn, total_copies FROM books b WHERE NOT EXISTS
+                      (SELECT 1 FROM book_copies c WHERE c.isbn = b.isbn)""")
+    copies = [(isbn, f"{isbn}-{n}") for isbn, total in cursor.fetchall()
+              for n in range(1, (total or 0) + 1)]
+    insert = _params(dialect, "INSERT INTO book_copies (isbn, barcode, status) "
+                              "VALUES (%s, %s, 'available')")
+    if copies:
+        cursor.executemany(insert, copies)
+
+    cursor.execute("""SELECT transaction_id, book_isbn FROM transactions
+                      WHERE transaction_type = 'borrow' AND return_date IS NULL
+                      AND copy_id IS NULL ORDER BY book_isbn""")
+    loans = cursor.fetchall()
+    cursor.execute("SELECT copy_id, isbn FROM book_copies WHERE status = 'available' "
+                   "ORDER BY copy_id")
+    shelf = {}
+    for copy_id, isbn in cursor.fetchall():
+        shelf.setdefault(isbn, []).append(copy_id)
+    cursor.execute("SELECT isbn, COUNT(*) FROM book_copies GROUP BY isbn")
+    numbered = dict(cursor.fetchall())
+
+    assignments = []
+    for transaction_id, isbn in loans:
+        if shelf.get(isbn):
+            copy_id = shelf[isbn].pop(0)
+        else:
+            # More open loans than copies on record: the copy exists somewhere
+            numbered[isbn] = numbered.get(isbn, 0) + 1
+            cursor.execute(insert, (isbn, f"{isbn}-{numbered[isbn]}"))
+            copy_id = cursor.lastrowid
+        assignments.append((copy_id, transaction_id))
+    if assignments:
+        cursor.executemany(_params(dialect, "UPDATE transactions SET copy_id = %s "
+                                            "WHERE transaction_id = %s"), assignments)
+        cursor.executemany(_params(dialect, "UPDATE book_copies SET status = 'on_loan' "
+                                            "WHERE copy_id = %s"),
+                           [(copy_id,) for copy_id, _ in assignments])
+    cursor.execute(REPAIR_BOOK_COUNTERS)
+
+
+# Completed loans and their settled fines, moved out of the hot tables by
+# archive.TransactionArchiver. No foreign keys: history outlives the rows it
+# points at, and the archive never takes locks on users or books.
+ARCHIVE_TABLES = {
+    'mysql': [
+        """CREATE TABLE IF NOT EXISTS transactions_archive (
+            transaction_id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            book_isbn VARCHAR(20) NOT NULL,
+            copy_id INT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            transaction_date DATETIME NOT NULL,
+            due_date DATE,
+            return_date DATE,
+            status VARCHAR(20) NOT NULL,
+            fine_amount DECIMAL(10, 2) DEFAULT 0.00,
+            archived_at DATETIME NOT NULL
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS fines_archive (
+            fine_id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            transaction_id INT NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            issue_date DATE NOT NULL,
+            paid_date DATE,
+            status VARCHAR(20) NOT NULL,
+            archived_at DATETIME NOT NULL
+        ) ENGINE=InnoDB""",
+    ],
+    'sqlite': [
+        """CREATE TABLE IF NOT EXISTS transactions_archive (
+            transaction_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            book_isbn TEXT NOT NULL,
+            copy_id INTEGER,
+            transaction_type TEXT NOT NULL,
+            transaction_date DATETIME NOT NULL,
+            due_date DATE,
+            return_date DATE,
+            status TEXT NOT NULL,
+            fine_amount REAL DEFAULT 0.00,
+            archived_at DATETIME NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS fines_archive (
+            fine_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            transaction_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            issue_date DATE NOT NULL,
+            paid_date DATE,
+            status TEXT NOT NULL,
+            archived_at DATETIME NOT NULL
+        )""",
+    ],
+}
+
+
+def create_archive_tables(cursor, dialect):
+    for ddl in ARCHIVE_TABLES[dialect]:
+        cursor.execute(ddl)
+
+
+# (version, description, steps), applied in order and recorded in schema_version
+MIGRATIONS = [
+    (1, "Base tables", [create_tables]),
+    (2, "books.view_count for buffered view counting", [
+        add_column('books', 'view_count',
+                   {'mysql': "INT NOT NULL DEFAULT 0", 'sqlite': "INTEGER NOT NULL DEFAULT 0"}),
+    ]),
+    (3, "One fine per loan, so accrual can upsert", [
+        create_index('idx_fines_transaction', 'fines', ('transaction_id',), unique=True),
+    ]),
+    (4, "Indexes for the circulation, history and listing queries", [
+        # Open-loan counts per user (repair_active_loans)
+        create_index('idx_transactions_user_open', 'transactions',
+                     ('user_id', 'transaction_type', 'return_date')),
+        # Open loans of a book (repair_active_loans)
+        create_index('idx_transactions_book_open', 'transactions', ('book_isbn', 'return_date')),
+        # return_book/return_many: a user's open loan of a book, newest first
+        create_index('idx_transactions_user_book', 'transactions',
+                     ('user_id', 'book_isbn', 'return_date', 'transaction_date')),
+        # get_user_transactions[_page]: newest first per user
+        create_index('idx_transactions_user_date', 'transactions',
+                     ('user_id', 'transaction_date', 'transaction_id')),
+        # Overdue / due-soon ranges, fine accrual, OverdueIndex.load
+        create_index('idx_transactions_open_due', 'transactions', ('return_date', 'due_date')),
+        # get_all_users / get_users_page
+        create_index('idx_users_name', 'users', ('name', 'user_id')),
+        # get_all_books / get_books_page
+        create_index('idx_books_title', 'books', ('title', 'isbn')),
+        # A user's outstanding fines
+        create_index('idx_fines_user_status', 'fines', ('user_id', 'status')),
+    ]),
+    (5, "Open-loan counters on users and books", [
+        add_column('users', 'active_loans',
+                   {'mysql': "INT NOT NULL DEFAULT 0", 'sqlite': "INTEGER NOT NULL DEFAULT 0"}),
+        add_column('books', 'active_loans',
+                   {'mysql': "INT NOT NULL DEFAULT 0", 'sqlite': "INTEGER NOT NULL DEFAULT 0"}),
+        repair_active_loans,
+    ]),
+    (6, "Copy-level inventory (book_copies) and the copy each loan holds", [
+        create_copies_table,
+        add_column('transactions', 'copy_id', {'mysql': "INT NULL", 'sqlite': "INTEGER"}),
+        # allocate(): first available copy of a title
+        create_index('idx_copies_isbn_status', 'book_copies', ('isbn', 'status', 'copy_id')),
+        backfill_copies,
+    ]),
+    (7, "Archive tables for old completed loans and settled fines", [
+        create_archive_tables,
+        # get_user_transactions[_page] over the archive, newest first per user
+        create_index('idx_transactions_archive_user_date', 'transactions_archive',
+                     ('user_id', 'transaction_date', 'transaction_id')),
+        create_index('idx_fines_archive_user', 'fines_archive', ('user_id',)),
+        # The archiver's candidates: completed loans by return date
+        create_index('idx_transactions_completed', 'transactions',
+                     ('status', 'return_date', 'transaction_id')),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ============= MIGRATIONS =============
+
+def current_version(backend, raw=None):
+    """Highest applied migration (0 for an unversioned database)"""
+    own = raw is None
+    raw = raw or backend.connect()
+    cursor = backend.cursor(raw)
+    try:
+        cursor.execute(VERSION_TABLE[backend.name])
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        version = cursor.fetchall()[0][0]
+        return version or 0
+    finally:
+        cursor.close()
+        if own:
+            raw.close()
+
+
+def migrate(backend, target=None, verbose=False):
+    """
+    Apply pending migrations up to target (default: latest).
+    Returns the list of versions applied. Each migration commits on its own;
+    MySQL commits DDL implicitly, SQLite rolls a failed migration back.
+    """
+    target = target or LATEST_VERSION
+    raw = backend.connect()
+    applied = []
+    try:
+        version = current_version(backend, raw)
+        for number, description, steps in MIGRATIONS:
+            if number <= version or number > target:
+                continue
+            cursor = backend.cursor(raw)
+            backend.begin(raw)
+            try:
+                for step in steps:
+                    step(cursor, backend.name)
+                cursor.execute(backend.translate(
+                    "INSERT INTO schema_version (version, description, applied_at) "
+                    "VALUES (%s, %s, %s)"),
+                    (number, description, datetime.now().replace(microsecond=0)))
+                raw.commit()
+            except Exception:
+                raw.rollback()
+                raise
+            finally:
+                cursor.close()
+            applied.append(number)
+            if verbose:
+                print(f"✅ Migration {number}: {description}")
+    finally:
+        raw.close()
+    return applied
+
+
+# ============= EXPLAIN VERIFICATION =============
+
+def hot_statements():
+    """
+    The statements on the hot paths, built from the query constants the
+    managers run, with representative parameters: (name, query, params).
+    Imported here rather than at module level because library_manager
+    imports this module for its repair statements.
+    """
+    from archive import TransactionArchiver, history_query
+    from crud_manager import Catalog
+    from database import encode_cursor
+    from fine_accrual import FineAccrual
+    from inventory import REFRESH_BOOK_COUNTERS, CopyInventory
+    from library_manager import Circulation
+
+    statements = [
+        ("borrow_book: user + active loans", Circulation.BORROW_CHECK_QUERY, ('isbn', 1)),
+        ("borrow_book: allocate a copy", CopyInventory.ALLOCATE_QUERY, ('isbn',)),
+        ("borrow_book/return_book: refresh book counters", REFRESH_BOOK_COUNTERS, ('isbn',)),
+        ("return_book: open loan", Circulation.RETURN_LOOKUP_QUERY, (1, 'isbn')),
+        ("delete_book: copies on loan", CopyInventory.ON_LOAN_QUERY, ('isbn',)),
+        ("login: user by username", "SELECT * FROM users WHERE username = %s", ('admin',)),
+        ("accrual: overdue open loans", FineAccrual.OVERDUE_QUERY,
+         ('2024-01-01', '2023-01-01', 0, 1000)),
+        ("archive: completed loans past the cutoff", TransactionArchiver.CANDIDATES_QUERY,
+         ('2024-01-01', '2023-01-01', 0, 1000)),
+    ]
+    for name, (query, params) in (
+            ("get_user_transactions_page", history_query(1, None, 50)),
+            ("get_user_transactions_page: next page",
+             history_query(1, ('2024-01-01 00:00:00', 1000), 50)),
+            ("get_overdue_page",
+             Circulation._open_loans_query(None, '2024-01-01', None, None, 50)),
+            ("get_due_soon: one user",
+             Circulation._open_loans_query('2024-01-01', '2024-01-04', 1, None, 50)),
+            ("get_books_page", Catalog._books_page_query(encode_cursor(('m', '0')), 50)),
+            ("get_users_page", Catalog._users_page_query(None, 50))):
+        statements.append((name, query, tuple(params)))
+    return statements
+
+
+def plan_problems(dialect, plan):
+    """Full scans and sorts in an EXPLAIN result (rows as dicts)"""
+    problems = []
+    # Scanning or sorting a derived table (history_query's UNION ALL
+    # branches) only touches the rows its own, separately planned, LIMITed
+    # query produced, so those are not table scans
+    derived, merges = set(), set()
+    if dialect == 'sqlite':
+        derived = {row['detail'].split()[-1] for row in plan
+                   if row['detail'].startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+        merges = {row['parent'] for row in plan
+                  if row['detail'].startswith('SCAN ') and row['detail'].split()[-1] in derived}
+    for row in plan:
+        if dialect == 'sqlite':
+            detail = row['detail']
+            if detail.startswith('SCAN ') and 'INDEX' not in detail \
+                    and detail.split()[-1] not in derived:
+                problems.append(f"full scan: {detail}")
+            if 'TEMP B-TREE' in detail and row['parent'] not in merges:
+                problems.append(f"sort: {detail}")
+        else:
+            extra = row.get('Extra') or ''
+            if str(row.get('table') or '').startswith(('<derived', '<union')):
+                continue
+            if row.get('type') == 'ALL':
+                problems.append(f"full scan of {row.get('table')}")
+            if 'filesort' in extra:
+                problems.append(f"filesort on {row.get('table')}")
+            if 'temporary' in extra:
+                problems.append(f"temporary table for {row.get('table')}")
+    return problems
+
+
+def verify(backend, statements=None):
+    """
+    EXPLAIN every hot statement. Returns one dict per statement:
+    {'name', 'plan', 'problems'}; an empty problems list means it is indexed.
+    MySQL may prefer a scan on near-empty tables, so verify against real data.
+    """
+    raw = backend.connect()
+    results = []
+    try:
+        for name, query, params in statements or hot_statements():
+            cursor = backend.cursor(raw, dictionary=True)
+            try:
+                cursor.execute(backend.explain_prefix + backend.translate(query), params)
+                plan = cursor.fetchall()
+            finally:
+                cursor.close()
+            results.append({'name': name, 'plan': plan,
+                            'problems': plan_problems(backend.name, plan)})
+    finally:
+        raw.close()
+    return results
+
+
+def main(argv=None):
+    from db_backends import SQLiteBackend, create_backend
+
+    parser = argparse.ArgumentParser(description="Library schema migrations and checks")
+    parser.add_argument('command', choices=['status', 'migrate', 'verify'])
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'],
+                        help="Defaults to config.DB_BACKEND")
+    parser.add_argument('--db', help="SQLite file (defaults to config.SQLITE_CONFIG)")
+    parser.add_argument('--target', type=int, help="Migrate up to this version")
+    args = parser.parse_args(argv)
+
+    if args.backend == 'sqlite' or args.db:
+        backend = SQLiteBackend(args.db, create_schema=False)
+    else:
+        backend = create_backend(args.backend)
+
+    if args.command == 'status':
+        version = current_version(backend)
+        print(f"📋 Schema version {version} of {LATEST_VERSION}")
+        for number, description, _ in MIGRATIONS:
+            print(f"   {'✅' if number <= version else '⏳'} {number}: {description}")
+        return 0
+
+    if args.command == 'migrate':
+        applied = migrate(backend, args.target, verbose=True)
+        print(f"✅ Schema at version {current_version(backend)}"
+              f" ({len(applied)} migration(s) applied)")
+        return 0
+
+    failures = 0
+    for result in verify(backend):
+        if result['problems']:
+            failures += 1
+            print(f"❌ {result['name']}: {'; '.join(result['problems'])}")
+        else:
+            print(f"✅ {result['name']}")
+    if failures:
+        print(f"❌ {failures} hot statement(s) scan or sort; run 'python schema.py migrate'?")
+        return 1
+    print("✅ Every hot statement uses an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
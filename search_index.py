@@ -0,0 +1,308 @@
+# search_index.py
+import math
+import re
+import threading
+from bisect import bisect_left
+
+
+# Words too common to help ranking
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with'
+}
+
+# Weight of a term hit in each field (a title match beats a description match)
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'author': 2.0,
+    'genre': 1.5,
+    'description': 1.0,
+}
+
+# Score multiplier for terms reached only by prefix-expanding the last token
+PREFIX_MATCH_WEIGHT = 0.5
+
+# Columns kept per document so results can be served without a query
+STORED_FIELDS = ('isbn', 'title', 'author', 'publication_year', 'total_copies',
+                 'available_copies', 'genre', 'price', 'description')
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def stem(word):
+    """Light suffix-stripping stemmer (programming -> program, libraries -> library)"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    for suffix in ('ational', 'ization', 'fulness', 'ousness', 'iveness',
+                   'ments', 'ment', 'ings', 'ing', 'edly', 'ed', 'ly'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    else:
+        # 'es' is only a suffix after a sibilant (classes, boxes, churches);
+        # games, notes and houses just drop the 's'
+        if word.endswith(('sses', 'xes', 'zzes', 'ches', 'shes')) and len(word) >= 5:
+            word = word[:-2]
+        elif word.endswith('s') and word[-2] not in 'su' and len(word) >= 4:
+            word = word[:-1]  # but not glass, status
+    # programm -> program, stopp -> stop
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercase, split on non-alphanumerics, drop stopwords, stem"""
+    if not text:
+        return []
+    return [stem(t) for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over the books catalog with BM25 ranking.
+    - add_book/update_book/remove_book keep it in step with the books table
+    - search() never touches the database
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings = {}      # term -> {isbn: weighted term frequency}
+        self._field_terms = {}   # isbn -> {field: set(terms)}, for field filters
+        self._doc_lengths = {}   # isbn -> weighted document length
+        self._docs = {}          # isbn -> stored fields
+        self._total_length = 0.0
+        self._vocabulary = []    # sorted terms, for prefix matching
+        self._vocabulary_dirty = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ============= INDEX MAINTENANCE =============
+
+    def add_book(self, book):
+        """Index a Book object (or a books row dict), replacing any older version"""
+        if isinstance(book, dict):
+            doc = {field: book.get(field) for field in STORED_FIELDS}
+        else:
+            doc = {field: getattr(book, field, None) for field in STORED_FIELDS}
+
+        with self._lock:
+            self._remove(doc['isbn'])
+            field_terms = {}
+            frequencies = {}
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                terms = tokenize(doc[field])
+                field_terms[field] = set(terms)
+                length += weight * len(terms)
+                for term in terms:
+                    frequencies[term] = frequencies.get(term, 0.0) + weight
+
+            isbn = doc['isbn']
+            for term, frequency in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._vocabulary_dirty = True
+                postings[isbn] = frequency
+
+            self._docs[isbn] = doc
+            self._field_terms[isbn] = field_terms
+            self._doc_lengths[isbn] = length
+            self._total_length += length
+
+    def update_book(self, isbn, **updates):
+        """Apply column updates (same kwargs as CRUDManager.update_book)"""
+        with self._lock:
+            doc = self._docs.get(isbn)
+            if doc is None:
+                return False
+            doc = dict(doc)
+            doc.update({k: v for k, v in updates.items() if k in STORED_FIELDS})
+            if doc['isbn'] != isbn:
+                self._remove(isbn)
+            if set(updates) & set(FIELD_WEIGHTS) or doc['isbn'] != isbn:
+                self.add_book(doc)
+            else:
+                self._docs[isbn] = doc  # Only stored fields changed
+            return True
+
+    def adjust_available(self, isbn, delta):
+        """Track a checkout (-1) or return (+1) without reindexing"""
+        with self._lock:
+            doc = self._docs.get(isbn)
+            if doc is not None:
+                doc['available_copies'] = (doc['available_copies'] or 0) + delta
+
+    def remove_book(self, isbn):
+        with self._lock:
+            self._remove(isbn)
+
+    def _remove(self, isbn):
+        if isbn not in self._docs:
+            return
+        for terms in self._field_terms.pop(isbn).values():
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(isbn, None)
+                    if not postings:
+                        del self._postings[term]
+                        self._vocabulary_dirty = True
+        self._total_length -= self._doc_lengths.pop(isbn)
+        del self._docs[isbn]
+
+    def build(self, books):
+        """Bulk-load from an iterable of Book objects or row dicts"""
+        with self._lock:
+            for book in books:
+                self.add_book(book)
+
+    # ============= SEARCH =============
+
+    def _expand(self, term, prefix):
+        """Terms matching a query token, using prefix match for the last token"""
+        if not prefix:
+            return [term] if term in self._postings else []
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        matches = []
+        i = bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            matches.append(self._vocabulary[i])
+            i += 1
+        return matches
+
+    def _idf(self, term):
+        df = len(self._postings.get(term, ()))
+        n = len(self._docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _candidates(self, text, field=None, prefix_last=True):
+        """
+        ISBNs matching every token of text (in field, if given) and the
+        (term, weight) pairs each token expanded to, for scoring.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return None, []
+        matched = None
+        scored_terms = []
+        for position, token in enumerate(tokens):
+            expansions = self._expand(token, prefix_last and position == len(tokens) - 1)
+            isbns = set()
+            for term in expansions:
+                if field is None:
+                    isbns.update(self._postings[term])
+                else:
+                    isbns.update(isbn for isbn in self._postings[term]
+                                 if term in self._field_terms[isbn][field])
+            matched = isbns if matched is None else matched & isbns
+            scored_terms.extend((term, 1.0 if term == token else PREFIX_MATCH_WEIGHT)
+                                for term in expansions)
+            if not matched:
+                return set(), []
+        return matched, scored_terms
+
+    def search(self, query=None, title=None, author=None, genre=None,
+               available_only=False, limit=None):
+        """
+        Ranked search. query matches any indexed field; title/author restrict
+        to that field. Returns stored book dicts, best match first.
+        """
+        with self._lock:
+            candidates = None
+            scored_terms = []
+            for text, field in ((query, None), (title, 'title'), (author, 'author')):
+                if not text:
+                    continue
+                matched, terms = self._candidates(text, field)
+                if matched is None:
+                    continue  # Only stopwords, ignore this filter
+                candidates = matched if candidates is None else candidates & matched
+                scored_terms.extend(terms)
+
+            if candidates is None:
+                candidates = set(self._docs)
+
+            results = []
+            for isbn in candidates:
+                doc = self._docs[isbn]
+                if genre and (doc['genre'] or '').lower() != genre.lower():
+                    continue
+                if available_only and not (doc['available_copies'] or 0) > 0:
+                    continue
+                results.append(doc)
+
+            if scored_terms:
+                scores = self._score(scored_terms, [doc['isbn'] for doc in results])
+                results.sort(key=lambda doc: (-scores[doc['isbn']], doc['title'] or ''))
+            else:
+                results.sort(key=lambda doc: doc['title'] or '')
+
+            if limit is not None:
+                results = results[:limit]
+            return [dict(doc) for doc in results]
+
+    def _score(self, terms, isbns):
+        """BM25 score of each document for the given (term, weight) pairs"""
+        average_length = (self._total_length / len(self._docs)) if self._docs else 1.0
+        average_length = average_length or 1.0
+        scores = dict.fromkeys(isbns, 0.0)
+        for term, weight in dict(terms).items():
+            postings = self._postings.get(term, {})
+            idf = weight * self._idf(term)
+            for isbn in isbns:
+                frequency = postings.get(isbn)
+                if not frequency:
+                    continue
+                norm = 1 - self.b + self.b * self._doc_lengths[isbn] / average_length
+                scores[isbn] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        return scores
+
+# Test function
+
+
+def test_search_index():
+    print("🧪 Testing Search Index...")
+    from models import Book
+
+    index = SearchIndex()
+    index.build([
+        Book("1", "Clean Code", "Robert C. Martin", 2008, 5, "Programming",
+             45.99, "Software craftsmanship"),
+        Book("2", "The Clean Coder", "Robert C. Martin", 2011, 2, "Programming"),
+        Book("3", "Programming Pearls", "Jon Bentley", 1986, 1, "Programming"),
+        Book("4", "Gardening Basics", "Ann Green", 2015, 1, "Hobby",
+             description="Clean soil and programmed watering"),
+    ])
+
+    results = index.search("clean code")
+    print(f"✅ 'clean code' -> {[r['title'] for r in results]}")
+    results = index.search(author="martin")
+    print(f"✅ author 'martin' -> {[r['title'] for r in results]}")
+    results = index.search("program")
+    print(f"✅ 'program' -> {[r['title'] for r in results]}")
+
+    index.update_book("3", title="More Programming Pearls")
+    index.remove_book("2")
+    print(f"✅ After update/remove: {[r['title'] for r in index.search('pearls')]}")
+
+    for word in ('game', 'note', 'table', 'house', 'box', 'class', 'church'):
+        plural = word + ('es' if word[-1] in 'sx' or word.endswith('ch') else 's')
+        assert stem(word) == stem(plural), (word, plural)
+    index.add_book(Book("5", "The Hunger Games", "Suzanne Collins", 2008, 1, "Fiction"))
+    index.add_book(Book("6", "Database Design Notes", "Ann Green", 2020, 1, "Computing"))
+    assert [r['title'] for r in index.search("game")] == ["The Hunger Games"]
+    assert [r['title'] for r in index.search("note")] == ["Database Design Notes"]
+    print("✅ Singular and plural forms stem alike")
+
+
+if __name__ == "__main__":
+    test_search_index()
@@ -0,0 +1,363 @@
+# service.py
+"""
+HTTP/JSON entry point: a master process and N worker processes.
+
+    python service.py --port 8080 --workers 8
+
+- The master binds the port once and forks the workers, which all accept
+  on that socket. Each worker runs one asyncio event loop over its own
+  connection pool, caches and search index (library_api.LibraryService).
+- Sessions live in a small manager process every worker talks to, so a
+  token works on any worker and survives reloads.
+- SIGHUP: graceful reload. Config and application code are re-read, a new
+  generation of workers starts, and the old one finishes in-flight
+  requests, then exits.
+- SIGTERM / SIGINT: graceful shutdown.
+- GET /healthz (liveness) and GET /readyz (database reachable, not
+  draining) are answered by every worker.
+The master imports nothing from the application, so a reload's workers
+load the code that is on disk then. Apply schema migrations before
+starting (python schema.py migrate).
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from http import HTTPStatus
+from multiprocessing.managers import BaseManager
+
+import config
+
+
+# ============= SHARED SESSIONS =============
+
+class SessionManager(BaseManager):
+    """Serves one SessionStore to every worker process"""
+
+
+def _session_store():
+    from session_store import default_session_store  # Runs in the manager process only
+    return default_session_store()
+
+
+SessionManager.register('session_store', callable=_session_store)
+
+
+def _ignore_signals():
+    """Manager process initializer: reloads and Ctrl-C are the master's business"""
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# ============= HTTP =============
+
+class BadRequest(Exception):
+    pass
+
+
+async def _readline(reader):
+    """One line, or BadRequest if it is longer than the stream's buffer limit"""
+    try:
+        return await reader.readline()
+    except ValueError:    # LimitOverrunError, re-raised by readline
+        raise BadRequest("Request line or header too long")
+
+
+async def _read_request(reader, max_body):
+    """(method, target, headers, body) of the next request, or None at EOF"""
+    line = await _readline(reader)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise BadRequest("Malformed request line")
+    headers = {}
+    while True:
+        line = await _readline(reader)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+        if len(headers) > 100:
+            raise BadRequest("Too many headers")
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise BadRequest("Chunked request bodies are not supported")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise BadRequest("Bad Content-Length")
+    if length > max_body:
+        raise BadRequest("Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    if version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+        headers['connection'] = 'close'
+    return method.upper(), target, headers, body
+
+
+def _response(status, body, keep_alive):
+    reason = HTTPStatus(status).phrase
+    head = (f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+class Worker:
+    """One worker process: serves HTTP on the shared socket until told to stop"""
+
+    def __init__(self, sock, session_address, authkey, settings, ready_fd):
+        self.sock = sock
+        self.session_address = session_address
+        self.authkey = authkey
+        self.settings = settings
+        self.ready_fd = ready_fd
+        self.app = None
+        self.api = None
+        self.busy = {}        # connection task -> handling a request right now
+        self.stopping = False
+
+    async def run(self):
+        sessions = SessionManager(self.session_address, self.authkey)
+        sessions.connect()
+        # Imported here, after the fork, so every generation runs the code on disk
+        self.api = importlib.import_module('library_api')
+        self.app = self.api.LibraryService(sessions.session_store(), self.settings)
+        await self.app.start()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        server = await asyncio.start_server(self._serve, sock=self.sock)
+        os.write(self.ready_fd, f"{os.getpid()}\n".encode())
+        print(f"✅ Worker {os.getpid()} serving")
+        await stop.wait()
+
+        # Drain: stop accepting, let requests in flight finish (up to
+        # graceful_timeout). Idle keep-alive connections get a moment to send
+        # one more request, answered with Connection: close, before they are
+        # dropped, so clients rarely see a reset mid-reload.
+        self.stopping = True
+        self.app.draining = True
+        server.close()
+        now = time.monotonic()
+        idle_grace, deadline = now + 0.5, now + self.settings['graceful_timeout']
+        while True:
+            if time.monotonic() >= idle_grace:
+                for task, busy in list(self.busy.items()):
+                    if not busy:
+                        task.cancel()
+            if not self.busy or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.05)
+        for task in list(self.busy):
+            task.cancel()
+        await self.app.close()
+        print(f"✅ Worker {os.getpid()} stopped")
+
+    async def _serve(self, reader, writer):
+        task = asyncio.current_task()
+        self.busy[task] = False
+        try:
+            while not self.stopping:
+                try:
+                    request = await asyncio.wait_for(
+                        _read_request(reader, self.settings['max_body']),
+                        self.settings['keepalive_timeout'])
+                except BadRequest as e:
+                    writer.write(_response(400, self.api.to_json({'error': str(e)}), False))
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.busy[task] = True
+                try:
+                    status, payload = await self.app.dispatch(method, target, headers, body)
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and not self.stopping)
+                    try:
+                        data = self.api.to_json(payload)
+                    except (TypeError, ValueError) as e:
+                        print(f"❌ {method} {target}: response not serializable: {e}")
+                        status, data = 500, self.api.to_json({'error': "Internal server error"})
+                    writer.write(_response(status, data, keep_alive))
+                    await writer.drain()
+                finally:
+                    self.busy[task] = False
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            # Never let a connection task die with the client left waiting
+            print(f"❌ Worker {os.getpid()} connection failed: {e}")
+            if not writer.is_closing():
+                writer.write(_response(500, self.api.to_json({'error': "Internal server error"}),
+                                       False))
+        finally:
+            self.busy.pop(task, None)
+            writer.close()
+
+
+# ============= MASTER =============
+
+def load_settings(overrides=None):
+    settings = dict(config.SERVICE_CONFIG)
+    settings.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    if not settings['workers']:
+        settings['workers'] = os.cpu_count() or 1
+    return settings
+
+
+class Master:
+    """Binds the port, keeps the worker processes running, handles reloads"""
+
+    def __init__(self, overrides=None):
+        self.overrides = overrides or {}
+        self.settings = load_settings(self.overrides)
+        self.workers = {}          # pid -> (generation, started at)
+        self.generation = 0
+        self.ready = set()         # pids that are accepting connections
+        self.retiring = []         # previous generation, stopped once the new one is ready
+        self.retire_by = 0
+        self._ready_r, self._ready_w = os.pipe()
+        os.set_blocking(self._ready_r, False)
+        self._reload = False
+        self._stop = False
+
+    def run(self):
+        authkey = os.urandom(16)
+        sessions = SessionManager(authkey=authkey)
+        sessions.start(_ignore_signals)
+        sock = socket.create_server((self.settings['host'], self.settings['port']),
+                                    backlog=2048)
+        print(f"✅ Listening on {self.settings['host']}:{self.settings['port']} "
+              f"with {self.settings['workers']} workers (master {os.getpid()})")
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, '_reload', True))
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: setattr(self, '_stop', True))
+
+        self._spawn_generation(sock, sessions.address, authkey)
+        while not self._stop:
+            time.sleep(0.2)
+            self._reap(sock, sessions.address, authkey)
+            self._retire_workers()
+            if self._reload:
+                self._reload = False
+                self._reload_workers(sock, sessions.address, authkey)
+
+        print("⏳ Shutting down workers...")
+        self._stop_workers(list(self.workers))
+        sock.close()
+        sessions.shutdown()
+        print("✅ Service stopped")
+
+    def _spawn(self, sock, address, authkey):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = (self.generation, time.monotonic())
+            return pid
+        # Worker: default signal handling, the event loop installs its own
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        code = 0
+        try:
+            asyncio.run(Worker(sock, address, authkey, self.settings, self._ready_w).run())
+        except Exception as e:
+            print(f"❌ Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    def _spawn_generation(self, sock, address, authkey):
+        self.generation += 1
+        for _ in range(self.settings['workers']):
+            self._spawn(sock, address, authkey)
+
+    def _reap(self, sock, address, authkey):
+        """Collect exited workers; replace crashed ones of the current generation"""
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            generation, started = self.workers.pop(pid, (None, 0))
+            self.ready.discard(pid)
+            if generation == self.generation and not self._stop:
+                print(f"❌ Worker {pid} exited (status {status}), restarting")
+                if time.monotonic() - started < 1:
+                    time.sleep(1)  # Failing at startup: don't spin
+                self._spawn(sock, address, authkey)
+
+    def _reload_workers(self, sock, address, authkey):
+        """New config and code in fresh workers, then retire the old ones"""
+        importlib.reload(config)
+        self.settings = load_settings(self.overrides)
+        old = list(self.workers)
+        print(f"🔄 Reloading: {len(old)} old workers out, {self.settings['workers']} new in")
+        self._spawn_generation(sock, address, authkey)
+        self.retiring.extend(pid for pid in old if pid not in self.retiring)
+        self.retire_by = time.monotonic() + self.settings['graceful_timeout']
+
+    def _retire_workers(self):
+        """Stop the previous generation once every new worker is accepting"""
+        try:
+            self.ready.update(int(pid) for pid in os.read(self._ready_r, 65536).split())
+        except BlockingIOError:
+            pass
+        if not self.retiring:
+            return
+        current = [pid for pid, (generation, _) in self.workers.items()
+                   if generation == self.generation]
+        if all(pid in self.ready for pid in current) or time.monotonic() >= self.retire_by:
+            self._stop_workers(self.retiring, wait=False)
+            self.retiring = []
+
+    def _stop_workers(self, pids, wait=True):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+        if not wait:
+            return  # Reaped by the main loop as they finish
+        deadline = time.monotonic() + self.settings['graceful_timeout'] + 5
+        while any(pid in self.workers for pid in pids) and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.workers.pop(pid, None)
+            else:
+                time.sleep(0.05)
+        for pid in pids:
+            if pid in self.workers:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                self.workers.pop(pid, None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Library HTTP/JSON service")
+    parser.add_argument('--host', help="Defaults to config.SERVICE_CONFIG")
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int, help="Worker processes (0 = one per core)")
+    parser.add_argument('--pool-size', type=int, dest='pool_size',
+                        help="Database connections per worker")
+    parser.add_argument('--sqlite', help="Serve this SQLite file instead of config.DB_BACKEND")
+    args = parser.parse_args(argv)
+    Master(vars(args)).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
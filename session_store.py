@@ -0,0 +1,212 @@
+# session_store.py
+import base64
+import copy
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from config import SESSION_CONFIG
+
+
+class Session:
+    """One logged-in user: a snapshot of the User/Admin plus its timestamps"""
+
+    __slots__ = ('session_id', 'user', 'created_at', 'last_seen')
+
+    def __init__(self, session_id, user, now):
+        self.session_id = session_id
+        self.user = user
+        self.created_at = now
+        self.last_seen = now
+
+
+class SessionStore:
+    """
+    In-memory session table behind signed tokens.
+    - Tokens are "<session id>.<HMAC-SHA256 signature>"; forged or mangled
+      tokens are rejected before the table is even consulted
+    - Sliding expiry: each validation pushes idle_timeout forward, up to
+      absolute_timeout after login
+    - Bounded: beyond max_sessions the least recently used session is evicted
+    - revoke_user() ends every session of an account in one call
+    """
+
+    def __init__(self, secret=None, idle_timeout=1800, absolute_timeout=43200,
+                 max_sessions=10000):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        self._secret = secret or secrets.token_bytes(32)
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()   # session_id -> Session, least recent first
+        self._by_user = {}               # user_id -> set(session_id)
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.revoked = 0
+        self.rejected = 0
+
+    # ============= TOKENS =============
+
+    def _sign(self, session_id):
+        digest = hmac.new(self._secret, session_id.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def _session_id(self, token):
+        """The session id inside a well-signed token, or None"""
+        if not token or not isinstance(token, str):
+            return None
+        session_id, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._sign(session_id)):
+            return None
+        return session_id
+
+    # ============= SESSIONS =============
+
+    def create(self, user):
+        """Start a session for an authenticated user and return its token"""
+        session_id = secrets.token_urlsafe(24)
+        session = Session(session_id, copy.copy(user), time.monotonic())
+        with self._lock:
+            self._sessions[session_id] = session
+            self._by_user.setdefault(user.user_id, set()).add(session_id)
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+                self.evicted += 1
+        return f"{session_id}.{self._sign(session_id)}"
+
+    def get(self, token):
+        """
+        The user behind a token (a copy), or None if the token is forged,
+        expired or revoked. Slides the session's idle expiry forward.
+        """
+        session_id = self._session_id(token)
+        if session_id is None:
+            with self._lock:
+                self.rejected += 1
+            return None
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if (now - session.last_seen > self.idle_timeout or
+                    now - session.created_at > self.absolute_timeout):
+                self._drop(session_id)
+                self.expired += 1
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return copy.copy(session.user)
+
+    def revoke(self, token):
+        """End one session (logout); False if it was not active"""
+        session_id = self._session_id(token)
+        with self._lock:
+            if session_id is None or session_id not in self._sessions:
+                return False
+            self._drop(session_id)
+            self.revoked += 1
+            return True
+
+    def revoke_user(self, user_id):
+        """End every session of a user; returns how many were ended"""
+        with self._lock:
+            session_ids = list(self._by_user.get(user_id, ()))
+            for session_id in session_ids:
+                self._drop(session_id)
+            self.revoked += len(session_ids)
+            return len(session_ids)
+
+    def update_user(self, user_id, **fields):
+        """Apply profile changes to the user snapshot held by live sessions"""
+        with self._lock:
+            for session_id in self._by_user.get(user_id, ()):
+                user = self._sessions[session_id].user
+                for field, value in fields.items():
+                    if hasattr(user, field):
+                        setattr(user, field, value)
+                if 'membership_type' in fields and hasattr(user, 'max_books'):
+                    # Derived from the membership type, so recompute it too
+                    user.max_books = user.loan_limit(user.membership_type)
+
+    def purge_expired(self):
+        """Drop expired sessions now instead of on their next lookup"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [session_id for session_id, session in self._sessions.items()
+                     if now - session.last_seen > self.idle_timeout or
+                     now - session.created_at > self.absolute_timeout]
+            for session_id in stale:
+                self._drop(session_id)
+            self.expired += len(stale)
+            return len(stale)
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        user_sessions = self._by_user.get(session.user.user_id)
+        if user_sessions is not None:
+            user_sessions.discard(session_id)
+            if not user_sessions:
+                del self._by_user[session.user.user_id]
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'users': len(self._by_user),
+                'max_sessions': self.max_sessions,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'revoked': self.revoked,
+                'rejected': self.rejected
+            }
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_session_store():
+    """Process-wide store built from config.SESSION_CONFIG, shared by auth and CRUD"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = SessionStore(**SESSION_CONFIG)
+        return _default_store
+
+# Test function
+
+
+def test_session_store():
+    print("🧪 Testing Session Store...")
+    from models import User
+
+    store = SessionStore(idle_timeout=60, max_sessions=2)
+    alice = User(1, "alice", "Alice", "alice@example.com", "555-0101")
+    token = store.create(alice)
+    print(f"✅ Valid token: {store.get(token).username}")
+    print(f"✅ Forged token rejected: {store.get(token[:-2] + 'xx') is None}")
+
+    store.create(User(2, "bob", "Bob", "bob@example.com", "555-0102"))
+    store.create(User(3, "carol", "Carol", "carol@example.com", "555-0103"))
+    print(f"✅ Oldest evicted at max_sessions: {store.get(token) is None}")
+
+    token = store.create(alice)
+    print(f"✅ Revoked sessions for user 1: {store.revoke_user(1)}")
+    print(f"✅ Stats: {store.stats()}")
+
+
+if __name__ == "__main__":
+    test_session_store()
@@ -0,0 +1,184 @@
+# write_behind.py
+import atexit
+import operator
+import threading
+from datetime import datetime
+
+from config import WRITE_BEHIND_CONFIG
+
+
+def _keep_latest(old, new):
+    return new
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces low-value updates in memory and writes them in batches.
+    - add(key, value) merges into any pending value for key via combine
+      (default: the latest value wins; operator.add turns it into a counter)
+    - A background thread flushes every flush_interval seconds, or sooner
+      once max_pending keys are waiting; close() (also run at exit) flushes
+      what is left
+    - Each flush is one executemany of query with to_params(key, value)
+    Values still pending when the process dies are lost, so only use it for
+    data that can tolerate that (timestamps, counters).
+    """
+
+    def __init__(self, db_manager, query, to_params, combine=None, name="write-behind",
+                 flush_interval=2.0, max_pending=500, on_flush=None):
+        self.db = db_manager
+        self.query = query
+        self.to_params = to_params
+        self.combine = combine or _keep_latest
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_flush = on_flush       # called with the written keys after each flush
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # one flush at a time, in order
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.added = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, key, value):
+        """Queue an update; returns immediately"""
+        with self._lock:
+            if self._closed:
+                return False
+            self.added += 1
+            if key in self._pending:
+                self._pending[key] = self.combine(self._pending[key], value)
+                self.coalesced += 1
+            else:
+                self._pending[key] = value
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """Write everything pending now; returns the number of rows sent"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            params = [self.to_params(key, value) for key, value in batch.items()]
+            try:
+                with self.db.transaction() as tx:
+                    tx.executemany(self.query, params)
+            except self.db.errors as e:
+                with self._lock:
+                    self.dropped += len(params)
+                print(f"❌ {self.name} flush failed, {len(params)} updates dropped: {e}")
+                return 0
+            with self._lock:
+                self.flushes += 1
+                self.written += len(params)
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(list(batch))
+                except Exception as e:
+                    # The rows are written; keep the flush thread alive
+                    print(f"❌ {self.name} on_flush callback failed: {e}")
+            return len(params)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        atexit.unregister(self.close)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'added': self.added,
+                'coalesced': self.coalesced,
+                'flushes': self.flushes,
+                'written': self.written,
+                'dropped': self.dropped
+            }
+
+
+# ============= LIBRARY BUFFERS =============
+
+def last_login_buffer(db_manager, **options):
+    """users.last_login, one write per user per flush (latest login wins)"""
+    settings = dict(WRITE_BEHIND_CONFIG, **options)
+    return WriteBehindBuffer(
+        db_manager, "UPDATE users SET last_login = %s WHERE user_id = %s",
+        to_params=lambda user_id, at: (at, user_id), name="last-login", **settings)
+
+
+_last_login_buffers = {}   # DatabaseManager -> its shared last_login buffer
+_buffers_lock = threading.Lock()
+
+
+def default_last_login_buffer(db_manager):
+    """
+    The one last_login buffer for db_manager, built on first use and shared
+    by every Authentication on it (each would otherwise run its own flush
+    thread); it is flushed and stopped at exit
+    """
+    with _buffers_lock:
+        buffer = _last_login_buffers.get(db_manager)
+        if buffer is None:
+            buffer = _last_login_buffers[db_manager] = last_login_buffer(db_manager)
+        return buffer
+
+
+def view_count_buffer(db_manager, **options):
+    """books.view_count increments, summed per book between flushes"""
+    settings = dict(WRITE_BEHIND_CONFIG, **options)
+    return WriteBehindBuffer(
+        db_manager, "UPDATE books SET view_count = view_count + %s WHERE isbn = %s",
+        to_params=lambda isbn, views: (views, isbn), combine=operator.add,
+        name="view-count", **settings)
+
+# Test function
+
+
+def test_write_behind():
+    print("🧪 Testing Write-Behind Buffer...")
+    from database import DatabaseManager
+    db = DatabaseManager()
+
+    logins = last_login_buffer(db, flush_interval=60)
+    for _ in range(3):
+        logins.add(1, datetime.now())
+    print(f"✅ Three logins coalesced into {len(logins)} pending update")
+    print(f"✅ Flushed rows: {logins.flush()}")
+    logins.close()
+    print(f"✅ Stats: {logins.stats()}")
+
+    shared = default_last_login_buffer(db)
+    print(f"✅ One shared last_login buffer per database: {shared is default_last_login_buffer(db)}")
+
+
+if __name__ == "__main__":
+    test_write_behind()